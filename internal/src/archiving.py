@@ -0,0 +1,171 @@
+################################################################################
+#                                                                              #
+#  archiving.py                                                                #
+#  pack bulky run products into compressed archives and unpack them on demand  #
+#                                                                              #
+#  $HeadURL$                                                                   #
+#  $Id$                                                                        #
+#                                                                              #
+#  --------------------------------------------------------------------------- #
+#  Part of HPCToolkit (hpctoolkit.org)                                         #
+#                                                                              #
+#  Information about sources of support for research and development of        #
+#  HPCToolkit is at 'hpctoolkit.org' and in 'README.Acknowledgments'.          #
+#  --------------------------------------------------------------------------- #
+#                                                                              #
+#  Copyright ((c)) 2002-2017, Rice University                                  #
+#  All rights reserved.                                                        #
+#                                                                              #
+#  Redistribution and use in source and binary forms, with or without          #
+#  modification, are permitted provided that the following conditions are      #
+#  met:                                                                        #
+#                                                                              #
+#  * Redistributions of source code must retain the above copyright            #
+#    notice, this list of conditions and the following disclaimer.             #
+#                                                                              #
+#  * Redistributions in binary form must reproduce the above copyright         #
+#    notice, this list of conditions and the following disclaimer in the       #
+#    documentation and/or other materials provided with the distribution.      #
+#                                                                              #
+#  * Neither the name of Rice University (RICE) nor the names of its           #
+#    contributors may be used to endorse or promote products derived from      #
+#    this software without specific prior written permission.                  #
+#                                                                              #
+#  This software is provided by RICE and contributors "as is" and any          #
+#  express or implied warranties, including, but not limited to, the           #
+#  implied warranties of merchantability and fitness for a particular          #
+#  purpose are disclaimed. In no event shall RICE or contributors be           #
+#  liable for any direct, indirect, incidental, special, exemplary, or         #
+#  consequential damages (including, but not limited to, procurement of        #
+#  substitute goods or services; loss of use, data, or profits; or             #
+#  business interruption) however caused and on any theory of liability,       #
+#  whether in contract, strict liability, or tort (including negligence        #
+#  or otherwise) arising in any way out of the use of this software, even      #
+#  if advised of the possibility of such damage.                               #
+#                                                                              #
+################################################################################
+
+
+
+
+# Compressors in order of preference: (name, archive suffix, tar option)
+# The first one whose program is on $PATH is used; gzip is always available.
+
+_compressors = [
+    ("zstd", ".tar.zst", "--use-compress-program=zstd -T0 -q"),
+    ("xz",   ".tar.xz",  "--xz"),
+    ("gzip", ".tar.gz",  "--gzip"),
+]
+
+_suffixes = [ suffix for _, suffix, _ in _compressors ]
+
+
+# patterns for names of a run's bulky raw products, which are safe to pack or delete
+rawPatterns = [ "*hpctoolkit-*-measurements", "*hpctoolkit-*-database", "*.hpcstruct" ]
+
+
+def compressor():     # returns (name, suffix, tarOption)
+
+    from common import whichDir
+
+    for name, suffix, option in _compressors:
+        if whichDir(name):
+            return name, suffix, option
+    return _compressors[-1]
+
+
+def isArchive(path):
+
+    return any(path.endswith(suffix) for suffix in _suffixes)
+
+
+def rawItems(dir):     # returns names of raw products in 'dir', sorted
+
+    from os import listdir
+    from fnmatch import fnmatch
+
+    return sorted( name for name in listdir(dir)
+                        if any(fnmatch(name, pattern) for pattern in rawPatterns) )
+
+
+def pack(srcdir, names, archivePath, remove=False):
+
+    # 'archivePath' should not have a suffix; the chosen compressor's is appended
+    # returns path of archive created
+
+    from shutil import rmtree
+    from os import remove as removeFile
+    from os.path import isdir, join
+
+    _, suffix, option = compressor()
+    archivePath += suffix
+    _tar([option, "-cf", archivePath, "-C", srcdir] + list(names))
+
+    if remove:
+        for name in names:
+            path = join(srcdir, name)
+            if isdir(path):
+                rmtree(path)
+            else:
+                removeFile(path)
+
+    return archivePath
+
+
+def members(archivePath):     # returns top-level names in archive
+
+    out = _tar([_optionFor(archivePath), "-tf", archivePath])
+    return sorted({ line.split("/")[0] for line in out.splitlines() if line })
+
+
+def unpack(archivePath, destdir, names=None):
+
+    _tar([_optionFor(archivePath), "-xf", archivePath, "-C", destdir] + (list(names) if names else []))
+
+
+def ensureExtracted(path):     # returns 'path', or None if neither it nor an archive containing it exists
+
+    # extract one packed product from an archive beside it, eg when '--resume' skips a phase;
+    # nothing else reads packed products, which need 'hpctest unpack' first
+
+    from os import listdir
+    from os.path import basename, dirname, exists, join
+
+    if exists(path):
+        return path
+
+    dir, name = dirname(path), basename(path)
+    if exists(dir):
+        for item in sorted(listdir(dir)):
+            if isArchive(item):
+                archivePath = join(dir, item)
+                if name in members(archivePath):
+                    unpack(archivePath, dir, [name])
+                    return path
+
+    return None
+
+
+def _optionFor(archivePath):
+
+    from common import HPCTestError
+
+    for name, suffix, option in _compressors:
+        if archivePath.endswith(suffix):
+            return option
+    raise HPCTestError("not a recognized archive: {}".format(archivePath))
+
+
+def _tar(args):     # returns stdout, raises HPCTestError
+
+    from subprocess import Popen, PIPE
+    from common import HPCTestError
+
+    proc = Popen(["tar"] + args, stdout=PIPE, stderr=PIPE)
+    out, err = proc.communicate()
+    if proc.returncode:
+        raise HPCTestError("tar {} failed: {}".format(" ".join(args), err.strip()), proc.returncode)
+
+    return out
+
+
@@ -0,0 +1,383 @@
+################################################################################
+#                                                                              #
+#  benchmark.py                                                                #
+#  micro-benchmarks of hpctest's own overheads                                 #
+#                                                                              #
+#  $HeadURL$                                                                   #
+#  $Id$                                                                        #
+#                                                                              #
+#  --------------------------------------------------------------------------- #
+#  Part of HPCToolkit (hpctoolkit.org)                                         #
+#                                                                              #
+#  Information about sources of support for research and development of        #
+#  HPCToolkit is at 'hpctoolkit.org' and in 'README.Acknowledgments'.          #
+#  --------------------------------------------------------------------------- #
+#                                                                              #
+#  Copyright ((c)) 2002-2017, Rice University                                  #
+#  All rights reserved.                                                        #
+#                                                                              #
+#  Redistribution and use in source and binary forms, with or without          #
+#  modification, are permitted provided that the following conditions are      #
+#  met:                                                                        #
+#                                                                              #
+#  * Redistributions of source code must retain the above copyright            #
+#    notice, this list of conditions and the following disclaimer.             #
+#                                                                              #
+#  * Redistributions in binary form must reproduce the above copyright         #
+#    notice, this list of conditions and the following disclaimer in the       #
+#    documentation and/or other materials provided with the distribution.      #
+#                                                                              #
+#  * Neither the name of Rice University (RICE) nor the names of its           #
+#    contributors may be used to endorse or promote products derived from      #
+#    this software without specific prior written permission.                  #
+#                                                                              #
+#  This software is provided by RICE and contributors "as is" and any          #
+#  express or implied warranties, including, but not limited to, the           #
+#  implied warranties of merchantability and fitness for a particular          #
+#  purpose are disclaimed. In no event shall RICE or contributors be           #
+#  liable for any direct, indirect, incidental, special, exemplary, or         #
+#  consequential damages (including, but not limited to, procurement of        #
+#  substitute goods or services; loss of use, data, or profits; or             #
+#  business interruption) however caused and on any theory of liability,       #
+#  whether in contract, strict liability, or tort (including negligence        #
+#  or otherwise) arising in any way out of the use of this software, even      #
+#  if advised of the possibility of such damage.                               #
+#                                                                              #
+################################################################################
+
+
+def yamlBenchmark(numRuns=10000):
+
+    # Load/dump throughput of the serialization layer on a synthetic study of
+    # 'numRuns' OUT.yaml files, for the YAML implementation in use and for JSON sidecars.
+
+    import tempfile, time
+    from os import makedirs
+    from os.path import getsize, join
+    from shutil import rmtree
+    from common import infomsg
+    from util import yaml as yamlio
+
+    def timed(label, paths, func):
+        start = time.time()
+        for path in paths:
+            func(path)
+        secs  = max(time.time() - start, 1e-6)
+        size  = sum(getsize(p) for p in sizePaths[label])
+        infomsg("    {:24} {:8.2f} s  {:9.0f} files/s  {:7.2f} MB/s".format(
+                    label, secs, len(paths) / secs, size / secs / 2**20))
+
+    result = _syntheticResult()
+    tmpdir = tempfile.mkdtemp(prefix="hpctest-benchmark-")
+    try:
+        paths = []
+        for i in range(numRuns):
+            dir = join(tmpdir, "run-{:05d}".format(i), "OUT")
+            makedirs(dir)
+            paths.append(join(dir, "OUT.yaml"))
+        jsonPaths = [ yamlio.sidecarPath(p) for p in paths ]
+        sizePaths = { "dump yaml": paths, "load yaml": paths, "dump json sidecar": jsonPaths, "load json sidecar": jsonPaths }
+
+        infomsg("serialization of {} synthetic run results using {}:".format(numRuns, yamlio.implementation()[3]))
+        timed("dump yaml",         paths, lambda p: yamlio.writeYamlFile(p, result))
+        timed("load yaml",         paths, lambda p: yamlio.readYamlFile(p))
+        timed("dump json sidecar", paths, lambda p: yamlio._writeSidecar(p, result))
+        timed("load json sidecar", paths, lambda p: yamlio.readYamlFile(p, jsonSidecar=True))
+    finally:
+        rmtree(tmpdir, ignore_errors=True)
+
+
+def startupBenchmark(numRuns=10):     # returns number of commands whose median time is over budget
+
+    # Wall time of lightweight commands in fresh processes, which is mostly startup
+    # cost. 'report' is run on an empty study, so it measures no reporting work.
+
+    import subprocess, sys, tempfile, time
+    from os import devnull, makedirs
+    from os.path import join
+    from shutil import rmtree
+    import configuration
+    from common import homepath, infomsg
+    from stats import median
+
+    budget   = float(configuration.get("benchmark.startup budget", 0.2))
+    mainPath = join(homepath, "internal", "src", "main.py")
+
+    tmpdir = tempfile.mkdtemp(prefix="hpctest-benchmark-")
+    try:
+        studyPath = join(tmpdir, "study-2000-01-01--00-00-00")
+        makedirs(studyPath)
+        commands = [ ["--version"], ["--help"], ["report", studyPath] ]
+
+        infomsg("startup time of {} runs of each command, budget {:.3f} s:".format(numRuns, budget))
+        numSlow = 0
+        with open(devnull, "w") as null:
+            for args in commands:
+                times = []
+                for _ in range(numRuns):
+                    start = time.time()
+                    subprocess.call([sys.executable, "-B", mainPath] + args, stdout=null, stderr=null)
+                    times.append(time.time() - start)
+                slow = median(times) > budget
+                numSlow += 1 if slow else 0
+                infomsg("    {:12} median {:6.3f} s  max {:6.3f} s  {}".format(
+                            args[0], median(times), max(times), "OVER BUDGET" if slow else "ok"))
+    finally:
+        rmtree(tmpdir, ignore_errors=True)
+
+    return numSlow
+
+
+def harnessBenchmark(numRuns=100):     # returns number of runs that did not pass
+
+    # Throughput of the whole run pipeline -- staging, execution, output checks, results --
+    # on 'numRuns' synthetic tests that need no build, profiled by a mock HPCToolkit whose
+    # tools write outputs of realistic shape and configurable size. Driver costs are for
+    # this process, so the tests and mock tools, which are child processes, don't count.
+
+    import resource, sys, tempfile, time
+    from os import devnull, walk
+    from os.path import join
+    from shutil import rmtree
+    import common, configuration
+    from common import infomsg, sizeInBytes
+    from dimension import TestDim, BuildDim, HPCTkitDim, ProfileDim
+    from executor import Executor
+    from iterate import Iterate
+    from study import Study
+
+    def setting(name, default):
+        return configuration.get("benchmark.harness." + name, default)
+
+    tmpdir    = tempfile.mkdtemp(prefix="hpctest-benchmark-")
+    testspath = common.testspath
+    try:
+        common.testspath = join(tmpdir, "tests")
+        _makeSyntheticTests(common.testspath, numRuns, int(setting("test work", 10000)))
+        hpctkPath = _makeMockHpctoolkit(join(tmpdir, "hpctoolkit"),
+                                        int(setting("measurement files", 2)),
+                                        sizeInBytes(setting("measurement size", "256K")),
+                                        int(setting("structure lines", 2000)),
+                                        sizeInBytes(setting("database size", "1M")),
+                                        float(setting("tool delay", 0)))
+
+        dims = { "tests":      TestDim("all"),
+                 "build":      BuildDim(BuildDim.default()),
+                 "hpctoolkit": HPCTkitDim(hpctkPath),
+                 "profile":    ProfileDim(ProfileDim.default()) }
+        study     = Study(tmpdir)
+        wantBatch = Executor.defaultToBackground()
+
+        infomsg("harness throughput on {} synthetic runs{}:".format(numRuns, " in batch" if wantBatch else ""))
+        usage, io = resource.getrusage(resource.RUSAGE_SELF), _processIO()
+        start = time.time()
+        stdout = sys.stdout
+        with open(devnull, "w") as null:
+            try:
+                sys.stdout = null       # per-run console output is still written, as to a terminal
+                Iterate.doForAll(dims, 1, study, wantBatch)
+            finally:
+                sys.stdout = stdout
+        secs = max(time.time() - start, 1e-6)
+        usageAfter, ioAfter = resource.getrusage(resource.RUSAGE_SELF), _processIO()
+
+        runDirs   = study.runDirs()
+        numPassed = len([ rundir for rundir in runDirs if Study.runPassed(rundir) ])
+        numFiles  = sum( len(files) for _, _, files in walk(study.path) )
+        cpu       = (usageAfter.ru_utime + usageAfter.ru_stime) - (usage.ru_utime + usage.ru_stime)
+
+        infomsg("    {:24} {:8d} of {}".format("runs passed", numPassed, numRuns))
+        infomsg("    {:24} {:8.2f} s  {:9.1f} runs/min".format("wall time", secs, len(runDirs) * 60 / secs))
+        infomsg("    {:24} {:8.2f} s  {:9.1f} ms/run".format("driver cpu time", cpu, 1000 * cpu / max(len(runDirs), 1)))
+        infomsg("    {:24} {:8.1f} MB".format("driver peak memory", usageAfter.ru_maxrss / 1024.0))
+        if io and ioAfter:
+            for key, label in ("syscr", "driver read calls"), ("syscw", "driver write calls"):
+                count = ioAfter[key] - io[key]
+                infomsg("    {:24} {:8d}    {:9.1f} per run".format(label, count, count / float(max(len(runDirs), 1))))
+        infomsg("    {:24} {:8d}    {:9.1f} per run".format("files in study", numFiles, numFiles / float(max(len(runDirs), 1))))
+    finally:
+        common.testspath = testspath
+        rmtree(tmpdir, ignore_errors=True)
+
+    return numRuns - numPassed
+
+
+#-------------------#
+# Private functions #
+#-------------------#
+
+def _syntheticResult():     # returns OUT.yaml contents typical of a profiled run
+
+    from collections import OrderedDict as D
+
+    summary = D([ ("samples", 51234), ("recorded", 51100), ("blocked", 12), ("errant", 3), ("trolled", 119),
+                  ("yielded", 0), ("frames", 612345), ("intervals", 40211), ("suspicious", 0) ])
+    hpctkParams = D([ ("hpcrun", "-e REALTIME@10000"), ("hpcstruct", ""), ("hpcprof", "") ])
+
+    def phase(command, cputime):
+        return D([ ("command", command), ("cpu time", cputime), ("status", "OK"), ("status msg", None) ])
+
+    result = D()
+    result["input"] = D([ ("date", "2020-06-01 18:29"), ("test", "app/amgmk"), ("build spec", "%gcc@8.3.0"),
+                          ("hpctoolkit", "/opt/hpctoolkit/bin"), ("hpctoolkit params", hpctkParams),
+                          ("num repeats", 1), ("study dir", "/home/user/hpctest/work/study-2020-06-01--18-29-59"),
+                          ("wantProfiling", "True"), ("spack spec", "amgmk@1.0%gcc@8.3.0 arch=linux-rhel7-x86_64") ])
+    result["build"] = D([ ("staging", "hardlink"), ("prefix", "/home/user/hpctest/internal/spack/opt/amgmk"),
+                          ("cpu time", 12.34), ("status", "OK"), ("status msg", None) ])
+    profiled = phase("hpcrun -e REALTIME@10000 ./AMGMk", 21.09)
+    profiled["hpcrun"] = D([ ("overhead %", "12.3"), ("summary", summary) ])
+    profiled["hpcstruct"] = phase("hpcstruct ./AMGMk", 3.2)
+    profiled["hpcprof"]   = phase("hpcprof -S AMGMk.hpcstruct hpctoolkit-AMGMk-measurements", 4.7)
+    result["run"] = D([ ("normal", phase("./AMGMk", 18.78)), ("profiled", profiled) ])
+    result["summary"] = D([ ("status", "OK"), ("status msg", None), ("elapsed time", 61.02) ])
+
+    return result
+
+
+def _makeSyntheticTests(path, numTests, work):
+
+    # 'numTests' tests with nothing to build, each running a shell loop of 'work' iterations
+
+    import os, stat
+    from os.path import join
+
+    yamlText = ( "info:\n"
+                 "  name: synthetic-{:05d}\n"
+                 "  version: 1.0\n"
+                 "  description: synthetic test made by 'hpctest benchmark harness'\n"
+                 "build:\n"
+                 "  kind: none\n"
+                 "run:\n"
+                 "  cmd: synthetic\n" )
+    exeText  = ( "#!/bin/sh\n"
+                 "i=0\n"
+                 "while [ $i -lt {} ]; do i=$((i+1)); done\n"
+                 "echo \"synthetic test did $i iterations\"\n" ).format(work)
+
+    for i in range(numTests):
+        testdir = join(path, "synthetic", "{:05d}".format(i))
+        os.makedirs(join(testdir, "bin"))
+        with open(join(testdir, "hpctest.yaml"), "w") as f:
+            f.write(yamlText.format(i))
+        exePath = join(testdir, "bin", "synthetic")
+        with open(exePath, "w") as f:
+            f.write(exeText)
+        os.chmod(exePath, os.stat(exePath).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+
+def _makeMockHpctoolkit(path, numFiles, fileSize, structLines, dbSize, delay):     # returns install path
+
+    # Shell scripts standing in for hpcrun, hpcstruct, and hpcprof: each takes the real tool's
+    # command line and writes outputs that pass hpctest's checks, after sleeping 'delay' seconds.
+    # hpcrun also runs its command; the XML outputs are copied from files made here once.
+
+    import os, stat
+    from os.path import join
+
+    sleep = "sleep {}\n".format(delay) if delay > 0 else ""
+    scripts = dict()
+    scripts["hpcrun"] = (
+        "#!/bin/sh\n"
+        "while [ $# -gt 0 ]; do\n"
+        "  case \"$1\" in\n"
+        "    -o|--output) out=\"$2\"; shift 2 ;;\n"
+        "    -e|--event|-c|--count|-f|-fp|--fnbounds) shift 2 ;;\n"
+        "    -*) shift ;;\n"
+        "    *) break ;;\n"
+        "  esac\n"
+        "done\n"
+        "\"$@\"; status=$?\n"
+        + sleep +
+        "mkdir -p \"$out\"\n"
+        "i=0\n"
+        "while [ $i -lt {files} ]; do\n"
+        "  name=\"$out/$(basename \"$1\")-$(printf %06d $i)-000-mockhost-$$-0\"\n"
+        "  head -c {size} /dev/zero > \"$name.hpcrun\"\n"
+        "  printf 'mock hpcrun log\\n"
+        "SUMMARY: samples: 1000 (recorded: 990, blocked: 4, errant: 2, trolled: 4, yielded: 0),\\n"
+        "         frames: 12000 (trolled: 4)\\n"
+        "         intervals: 800 (suspicious: 0)\\n' > \"$name.log\"\n"
+        "  i=$((i+1))\n"
+        "done\n"
+        "exit $status\n" ).format(files=numFiles, size=fileSize)
+    scripts["hpcstruct"] = (
+        "#!/bin/sh\n"
+        "while [ $# -gt 0 ]; do\n"
+        "  case \"$1\" in\n"
+        "    -o|--output) out=\"$2\"; shift 2 ;;\n"
+        "    -I|--include|-j|--jobs) shift 2 ;;\n"
+        "    *) shift ;;\n"
+        "  esac\n"
+        "done\n"
+        + sleep +
+        "cp \"$(dirname \"$0\")/../share/mock/structure.xml\" \"$out\"\n" )
+    scripts["hpcprof"] = (
+        "#!/bin/sh\n"
+        "while [ $# -gt 0 ]; do\n"
+        "  case \"$1\" in\n"
+        "    -o|--output) out=\"$2\"; shift 2 ;;\n"
+        "    -S|--structure|-I|--include|-M|--metric|-j) shift 2 ;;\n"
+        "    *) shift ;;\n"
+        "  esac\n"
+        "done\n"
+        + sleep +
+        "mkdir -p \"$out\"\n"
+        "cp \"$(dirname \"$0\")/../share/mock/experiment.xml\" \"$out\"\n"
+        "head -c {size} /dev/zero > \"$out/experiment.mdb\"\n" ).format(size=dbSize)
+
+    os.makedirs(join(path, "bin"))
+    for name, text in scripts.items():
+        scriptPath = join(path, "bin", name)
+        with open(scriptPath, "w") as f:
+            f.write(text)
+        os.chmod(scriptPath, os.stat(scriptPath).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+    os.makedirs(join(path, "share", "mock"))
+    with open(join(path, "share", "mock", "structure.xml"), "w") as f:
+        f.write('<?xml version="1.0"?>\n'
+                '<!DOCTYPE HPCToolkitStructure [\n'
+                '<!ELEMENT HPCToolkitStructure (LM)*>\n'
+                '<!ATTLIST HPCToolkitStructure version CDATA #REQUIRED i CDATA #REQUIRED n CDATA #IMPLIED>\n'
+                ']>\n'
+                '<HPCToolkitStructure i="0" version="4.7" n="">\n'
+                '<LM i="2" n="synthetic" v="{}">\n'
+                '<F i="3" n="synthetic.c">\n'
+                '<P i="4" n="main" l="1" v="{}">\n')
+        for i in range(structLines):
+            f.write('<S i="{}" l="{}" v="{{[0x{:x}-0x{:x})}}"/>\n'.format(i + 5, i + 2, 0x400000 + 8*i, 0x400008 + 8*i))
+        f.write('</P>\n'
+                '</F>\n'
+                '</LM>\n'
+                '</HPCToolkitStructure>\n')
+    with open(join(path, "share", "mock", "experiment.xml"), "w") as f:
+        f.write('<?xml version="1.0"?>\n'
+                '<!DOCTYPE HPCToolkitExperiment [\n'
+                '<!ELEMENT HPCToolkitExperiment (Header, (Info)*, (SecCallPathProfile|SecFlatProfile)*)>\n'
+                ']>\n'
+                '<HPCToolkitExperiment version="2.2">\n'
+                '<Header n="synthetic">\n'
+                '</Header>\n'
+                '<SecCallPathProfile i="0" n="synthetic">\n'
+                '<SecHeader>\n'
+                '<MetricTable>\n'
+                '<Metric i="0" n="REALTIME (usec):Sum (I)" v="derived-incr" t="inclusive" show="1" show-percent="1"/>\n'
+                '</MetricTable>\n'
+                '</SecHeader>\n'
+                '<SecCallPathProfileData>\n'
+                '<PF i="2" n="main" lm="2" f="3" l="1" s="4">\n'
+                '<M n="0" v="1000"/>\n'
+                '</PF>\n'
+                '</SecCallPathProfileData>\n'
+                '</SecCallPathProfile>\n'
+                '</HPCToolkitExperiment>\n')
+
+    return path
+
+
+def _processIO():     # returns dict of this process's I/O counters, or None if not on Linux
+
+    try:
+        with open("/proc/self/io") as f:
+            return { key: int(value) for key, value in (line.split(":") for line in f) }
+    except (IOError, OSError, ValueError):
+        return None
@@ -83,10 +83,26 @@ def percent(a, b):
 
 
 def percentDelta(a, b):
-    
+
     return percent(a-b, b)
 
 
+def sizeInBytes(value):     # returns int, or None if 'value' is None
+
+    # 'value' is a number or a string with optional units modifier, e.g. '256M' or '1.5G'
+
+    unitsDict = {"k": 2**10, "K": 2**10, "m": 2**20, "M": 2**20, "g": 2**30, "G": 2**30, "t": 2**40, "T": 2**40}
+
+    if value is None:
+        return None
+    value = str(value).strip()
+    lastChar = value[-1]
+    if lastChar in unitsDict:
+        return int(float(value[:-1]) * unitsDict[lastChar])
+    else:
+        return int(float(value))
+
+
 # Options
   
 def optionsArgString(options=None):
@@ -0,0 +1,194 @@
+################################################################################
+#                                                                              #
+#  compare.py                                                                  #
+#  compare the results of two studies point by point                           #
+#                                                                              #
+#  $HeadURL$                                                                   #
+#  $Id$                                                                        #
+#                                                                              #
+#  --------------------------------------------------------------------------- #
+#  Part of HPCToolkit (hpctoolkit.org)                                         #
+#                                                                              #
+#  Information about sources of support for research and development of        #
+#  HPCToolkit is at 'hpctoolkit.org' and in 'README.Acknowledgments'.          #
+#  --------------------------------------------------------------------------- #
+#                                                                              #
+#  Copyright ((c)) 2002-2017, Rice University                                  #
+#  All rights reserved.                                                        #
+#                                                                              #
+#  Redistribution and use in source and binary forms, with or without          #
+#  modification, are permitted provided that the following conditions are      #
+#  met:                                                                        #
+#                                                                              #
+#  * Redistributions of source code must retain the above copyright            #
+#    notice, this list of conditions and the following disclaimer.             #
+#                                                                              #
+#  * Redistributions in binary form must reproduce the above copyright         #
+#    notice, this list of conditions and the following disclaimer in the       #
+#    documentation and/or other materials provided with the distribution.      #
+#                                                                              #
+#  * Neither the name of Rice University (RICE) nor the names of its           #
+#    contributors may be used to endorse or promote products derived from      #
+#    this software without specific prior written permission.                  #
+#                                                                              #
+#  This software is provided by RICE and contributors "as is" and any          #
+#  express or implied warranties, including, but not limited to, the           #
+#  implied warranties of merchantability and fitness for a particular          #
+#  purpose are disclaimed. In no event shall RICE or contributors be           #
+#  liable for any direct, indirect, incidental, special, exemplary, or         #
+#  consequential damages (including, but not limited to, procurement of        #
+#  substitute goods or services; loss of use, data, or profits; or             #
+#  business interruption) however caused and on any theory of liability,       #
+#  whether in contract, strict liability, or tort (including negligence        #
+#  or otherwise) arising in any way out of the use of this software, even      #
+#  if advised of the possibility of such damage.                               #
+#                                                                              #
+################################################################################
+
+
+class Comparison(object):
+
+    # Matrix points of two studies are joined by (test, build spec, profile params).
+    # A point may have several runs in either study (eg repeated matrices or merged
+    # studies); then a metric's change is called a regression only if Welch's t-test
+    # finds it significant, so that run-to-run noise doesn't fail a nightly gate. If one
+    # side has a single run, it is tested against the other side's distribution; if both
+    # do, a change beyond threshold can't be tested and is reported as untested.
+
+    pointColumns = [ "test", "buildSpec", "hpcrunParams" ]
+
+    # label, index column, how delta is measured, sign of a worse change, threshold config key
+    _metrics = [
+        ("cpu time",       "normalTime",      "relative", +1, "cpu time"),
+        ("overhead",       "overheadPercent", "absolute", +1, "overhead"),
+        ("samples",        "samples",         "relative", -1, "samples"),
+        ("hpcstruct time", "hpcstructTime",   "relative", +1, "hpcstruct time"),
+        ("hpcprof time",   "hpcprofTime",     "relative", +1, "hpcprof time"),
+    ]
+
+
+    def __init__(self, studyA, studyB):
+
+        self.studyA = studyA
+        self.studyB = studyB
+
+
+    def points(self):     # returns list of (point, rows in A, rows in B), sorted by point
+
+        from collections import defaultdict
+
+        def byPoint(study):
+            index = study.index()
+            index.refresh()
+            points = defaultdict(list)
+            for row in index.select("all"):
+                points[ tuple(row[c] or "" for c in Comparison.pointColumns) ].append(row)
+            return points
+
+        a, b = byPoint(self.studyA), byPoint(self.studyB)
+        return [ (point, a.get(point, []), b.get(point, [])) for point in sorted(set(a) | set(b)) ]
+
+
+    def compare(self, rowsA, rowsB):     # returns list of dicts, one per metric with values in both
+
+        import configuration
+        from stats import mean, oneSample, welch
+
+        maxP = float(configuration.get("compare.significance", 0.05))
+
+        deltas = []
+        for label, column, kind, worse, thresholdKey in Comparison._metrics:
+
+            xs = [ r[column] for r in rowsA if r["status"] == "OK" and r[column] is not None ]
+            ys = [ r[column] for r in rowsB if r["status"] == "OK" and r[column] is not None ]
+            if not xs or not ys: continue
+
+            before, after = mean(xs), mean(ys)
+            if kind == "relative":
+                delta = (after - before) / before * 100.0 if before else None
+            else:
+                delta = after - before
+            if len(xs) == 1:
+                test = oneSample(xs[0], ys)
+            elif len(ys) == 1:
+                test = oneSample(ys[0], xs)
+            else:
+                test = welch(xs, ys)
+            p = test[2] if test else None
+
+            threshold = configuration.get("compare.thresholds." + thresholdKey, None)
+            beyond    = ( delta is not None and threshold is not None
+                          and delta * worse > float(threshold) )
+            regressed = beyond and p is not None and p <= maxP
+            untested  = beyond and p is None
+            noise     = p is not None and p > maxP
+
+            deltas.append( { "label": label, "kind": kind, "before": before, "after": after, "delta": delta,
+                             "p": p, "regressed": regressed, "untested": untested, "noise": noise } )
+
+        return deltas
+
+
+    def printComparison(self):     # returns number of regressions
+
+        from common import infomsg, verbosemsg, sepmsg
+
+        def status(rows):
+            passed = sum(1 for r in rows if r["status"] == "OK")
+            return "OK" if passed == len(rows) else "FAILED" if passed == 0 else "{}/{} OK".format(passed, len(rows))
+
+        def formatValue(value, kind):
+            return "{:.1f}%".format(value) if kind == "absolute" else "{:.4g}".format(value)
+
+        def formatDelta(delta, kind):
+            return "    ---" if delta is None else "{:+.1f}{}".format(delta, "" if kind == "absolute" else "%")
+
+        infomsg("comparing {}\n"
+                "     with {}".format(self.studyA.path, self.studyB.path))
+
+        numCompared = numOnlyA = numOnlyB = numRegressions = numUntested = 0
+        for point, rowsA, rowsB in self.points():
+
+            label = "{} with {} and {}".format(point[0].upper(), point[1].upper(), point[2])
+            if not rowsB:
+                numOnlyA += 1
+                verbosemsg("only in first study: {}".format(label))
+                continue
+            if not rowsA:
+                numOnlyB += 1
+                verbosemsg("only in second study: {}".format(label))
+                continue
+            numCompared += 1
+
+            lines = []
+            statusA, statusB = status(rowsA), status(rowsB)
+            if statusA != statusB:
+                regressed = statusA == "OK"
+                numRegressions += 1 if regressed else 0
+                lines.append("    {:15} {} -> {}{}".format("status", statusA, statusB, "   REGRESSION" if regressed else ""))
+
+            for d in self.compare(rowsA, rowsB):
+                numRegressions += 1 if d["regressed"] else 0
+                numUntested    += 1 if d["untested"] else 0
+                pvalue = "  p = {:.3g}".format(d["p"]) if d["p"] is not None else ""
+                mark   = ( "   REGRESSION" if d["regressed"] else "   UNTESTED (one run each)" if d["untested"]
+                           else "   (noise)" if d["noise"] else "" )
+                lines.append("    {:15} {:>9} -> {:<9} {:>8}{}{}".format(
+                                d["label"], formatValue(d["before"], d["kind"]), formatValue(d["after"], d["kind"]),
+                                formatDelta(d["delta"], d["kind"]), pvalue, mark))
+
+            print
+            infomsg(label)
+            for line in lines:
+                infomsg(line)
+
+        print
+        sepmsg(True)
+        infomsg("POINTS COMPARED:    {}".format(numCompared))
+        infomsg("ONLY IN FIRST:      {}".format(numOnlyA))
+        infomsg("ONLY IN SECOND:     {}".format(numOnlyB))
+        infomsg("REGRESSIONS:        {}".format(numRegressions))
+        infomsg("UNTESTED CHANGES:   {}".format(numUntested))
+        print
+
+        return numRegressions
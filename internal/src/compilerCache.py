@@ -0,0 +1,133 @@
+################################################################################
+#                                                                              #
+#  compilerCache.py                                                            #
+#  optional caching of test builds' compilations by ccache                     #
+#                                                                              #
+#  $HeadURL$                                                                   #
+#  $Id$                                                                        #
+#                                                                              #
+#  --------------------------------------------------------------------------- #
+#  Part of HPCToolkit (hpctoolkit.org)                                         #
+#                                                                              #
+#  Information about sources of support for research and development of        #
+#  HPCToolkit is at 'hpctoolkit.org' and in 'README.Acknowledgments'.          #
+#  --------------------------------------------------------------------------- #
+#                                                                              #
+#  Copyright ((c)) 2002-2017, Rice University                                  #
+#  All rights reserved.                                                        #
+#                                                                              #
+#  Redistribution and use in source and binary forms, with or without          #
+#  modification, are permitted provided that the following conditions are      #
+#  met:                                                                        #
+#                                                                              #
+#  * Redistributions of source code must retain the above copyright            #
+#    notice, this list of conditions and the following disclaimer.             #
+#                                                                              #
+#  * Redistributions in binary form must reproduce the above copyright         #
+#    notice, this list of conditions and the following disclaimer in the       #
+#    documentation and/or other materials provided with the distribution.      #
+#                                                                              #
+#  * Neither the name of Rice University (RICE) nor the names of its           #
+#    contributors may be used to endorse or promote products derived from      #
+#    this software without specific prior written permission.                  #
+#                                                                              #
+#  This software is provided by RICE and contributors "as is" and any          #
+#  express or implied warranties, including, but not limited to, the           #
+#  implied warranties of merchantability and fitness for a particular          #
+#  purpose are disclaimed. In no event shall RICE or contributors be           #
+#  liable for any direct, indirect, incidental, special, exemplary, or         #
+#  consequential damages (including, but not limited to, procurement of        #
+#  substitute goods or services; loss of use, data, or profits; or             #
+#  business interruption) however caused and on any theory of liability,       #
+#  whether in contract, strict liability, or tort (including negligence        #
+#  or otherwise) arising in any way out of the use of this software, even      #
+#  if advised of the possibility of such damage.                               #
+#                                                                              #
+################################################################################
+
+
+# Test builds' C and C++ compilations may be cached by ccache (ccache.dev), per config
+# 'build.ccache'. Spack's compiler wrappers put ccache in front of each compile when Spack's
+# 'config:ccache' is on, which hpctest turns on for its own build commands only, through a
+# configuration scope of its own. ccache caches each compile under the compiler and its full
+# command line, so by compiler spec and flags; with paths under the study made relative, a
+# rebuild after a test is edited recompiles only what changed. The cache is in
+# hpctest/.hpctest/ccache, bounded by 'build.ccache.max size', and ccache itself evicts
+# the least recently used results.
+
+
+_scopeName = "spack-ccache"
+_warned    = False
+
+
+def environment(baseDir):     # returns dict of environment settings for a cached build, or None if caching is off
+    
+    # 'baseDir' holds the build dirs, eg the study dir; paths under it don't affect ccache's keys
+    
+    import configuration
+    from common import whichDir, warnmsg
+    global _warned
+    
+    if not configuration.get("build.ccache.enabled", False):
+        return None
+    if not whichDir("ccache"):
+        if not _warned:
+            warnmsg("config build.ccache is enabled but ccache is not on $PATH, so builds are not cached")
+            _warned = True
+        return None
+    
+    return { "CCACHE_DIR":       cacheDir(),
+             "CCACHE_MAXSIZE":   str(configuration.get("build.ccache.max size", "5G")),
+             "CCACHE_BASEDIR":   baseDir,
+             "CCACHE_NOHASHDIR": "1",
+           }
+
+
+def cacheDir():
+    
+    from os.path import join
+    import common
+    
+    return join(common.homepath, ".hpctest", "ccache")
+
+
+def spackScope():     # returns path of Spack configuration scope that turns ccache on, made if missing
+    
+    from os import makedirs
+    from os.path import isdir, isfile, join
+    import common
+    
+    path = join(common.homepath, ".hpctest", _scopeName)
+    if not isfile(join(path, "config.yaml")):
+        if not isdir(path): makedirs(path)
+        with open(join(path, "config.yaml"), "w") as f:
+            f.write("config:\n  ccache: true\n")
+    return path
+
+
+def stats(environment):     # returns (hits, misses) so far, or None if ccache can't say
+    
+    # concurrent builds sharing the cache are counted too, so differences are approximate then
+    
+    import os, subprocess
+    from common import debugmsg
+    
+    env = os.environ.copy()
+    env.update(environment)
+    try:
+        with open(os.devnull, "w") as null:
+            out = subprocess.check_output(["ccache", "--print-stats"], env=env, stderr=null)
+    except (OSError, subprocess.CalledProcessError) as e:
+        debugmsg("ccache statistics unavailable: {}".format(e))
+        return None
+    
+    counts = dict()
+    for line in out.splitlines():
+        fields = line.split("\t")
+        if len(fields) == 2 and fields[1].strip().isdigit():
+            counts[fields[0]] = int(fields[1])
+    
+    # names differ between ccache 3.7+ and 4.x
+    hits = sum( counts.get(name, 0) for name in ("cache_hit_direct", "cache_hit_preprocessed",
+                                                 "direct_cache_hit", "preprocessed_cache_hit") )
+    return hits, counts.get("cache_miss", 0)
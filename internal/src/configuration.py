@@ -51,6 +51,9 @@
 # current configuration as an OrderedDict
 currentConfig = None
 
+# merged configuration is cached here, b/c parsing yaml is most of a light command's startup time
+_cacheName = "config-cache.json"
+
 
 def initConfig():
     
@@ -66,20 +69,32 @@ def initConfig():
     install = join(homepath, "config.yaml")
     configFileLocations = [ builtin, user, install ]
 
+    # reuse cached merged config if no config file has changed
+    signature = _signature(configFileLocations)
+    currentConfig = _readCache(signature)
+    if currentConfig is not None:
+        return
+
     # gather config info from layered yaml files w/ most local == highest priority
     currentConfig = {}
+    valid = True
     for path in configFileLocations:
         if isfile(path):
             config, msg = readYamlFile(path)
             if msg:
                 errormsg("ignoring invalid config file {}".format(path))
+                valid = False
             else:
                 _overrideDictByDict(currentConfig, config)
+    
+    if valid:
+        _writeCache(signature, currentConfig)
 
 
 def has(keypath):
     
     global currentConfig
+    _ensureConfig()
 
     keys = keypath.split(".")
     
@@ -94,6 +109,7 @@ def has(keypath):
 def get(keypath, default=None):
     
     global currentConfig
+    _ensureConfig()
 
     keys = keypath.split(".")
     
@@ -105,12 +121,83 @@ def get(keypath, default=None):
     return default if value is None else value
 
 
+def freeze():     # returns current configuration, for 'thaw' in another process
+    
+    _ensureConfig()
+    return currentConfig
+
+
+def thaw(config):
+    
+    # use 'config' from 'freeze' instead of loading configuration from files
+    
+    global currentConfig
+    currentConfig = config
+
+
 def set(key, value):
     
     from common import notimplemented
     notimplemented("configuration.set")
 
 
+def _signature(paths):     # returns list of [path, mtime, size], with None for missing files
+    
+    import os
+    
+    signature = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            signature.append( [path, st.st_mtime, st.st_size] )
+        except OSError:
+            signature.append( [path, None, None] )
+    return signature
+
+
+def _cachePath():
+    
+    from os.path import join
+    from common import homepath
+    return join(homepath, ".hpctest", _cacheName)
+
+
+def _readCache(signature):     # returns cached config, or None if missing or stale
+    
+    from util.yaml import readJsonFile
+    
+    try:
+        cache = readJsonFile(_cachePath())
+        return cache["config"] if cache["signature"] == signature else None
+    except (IOError, OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _writeCache(signature, config):
+    
+    # best effort, and only if hpctest has made its hidden dir
+    
+    from collections import OrderedDict
+    from os.path import dirname, isdir
+    from util.yaml import writeJsonFile
+    
+    path = _cachePath()
+    if isdir(dirname(path)):
+        try:
+            writeJsonFile(path, OrderedDict([ ("signature", signature), ("config", config) ]))
+        except (IOError, OSError, TypeError, ValueError):
+            pass
+
+
+def _ensureConfig():
+    
+    # configuration is loaded on first use
+    
+    import services
+    if currentConfig is None:
+        services.config()
+
+
 def _overrideDictByDict(dict1, dict2):
 
     from collections import Mapping, MutableMapping
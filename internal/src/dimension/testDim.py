@@ -75,16 +75,16 @@ class TestDim(StringDim):
 
     
     def __init__(self, spec, selftest=False):
-        # 'spec' is a comma-separated list of Unix pathname patterns relative to $HPCTEST_HOME/tests
+        # 'spec' is a comma-separated list of Unix pathname patterns relative to the tests tree, usually $HPCTEST_HOME/tests
         
         from os.path import join, relpath                                                                                                                                                                                            
         from util.glob2 import iglob
-        from common import options, homepath, infomsg
+        from common import options, testspath, infomsg
         from test import Test
         
         self.spec = spec
         
-        testsPath    = join(homepath,  "tests")
+        testsPath    = testspath
         selftestPath = join(testsPath, "selftest")
         pendingPath  = join(testsPath, "pending")
         chosenTestsPath = selftestPath if selftest else testsPath
@@ -125,7 +125,7 @@ class TestDim(StringDim):
     def _makeTest(path):
         
         from test import Test
-        return Test(path)
+        return Test.forPath(path)
 
 
 
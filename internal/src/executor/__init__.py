@@ -51,6 +51,8 @@
 
 
 from executor       import Executor
+from fileQueueExecutor import FileQueueExecutor
+from localQueueExecutor import LocalQueueExecutor
 from lsfExecutor import LSFExecutor
 from shellExecutor  import ShellExecutor
 from slurmExecutor  import SlurmExecutor
@@ -182,28 +182,58 @@ class Executor(object):
 
     # Programming model support
     
-    def wrap(self, cmd, runPath, binPath, numRanks, numThreads, spackMPIBin):
+    def wrap(self, cmd, runPath, binPath, numRanks, numThreads, spackMPIBin, memory=None):
         
         # numRanks == 0 means don't use MPI
         # numThreads == 0 means don't use OpenMP
+        # memory is bytes needed per rank, or None if not known (see resources.py)
         
         subclassResponsibility("Executor", "wrap")
 
 
     # Scheduling operations
     
+    def useStudy(self, study):
+        
+        # jobs submitted from now on are for 'study'; nothing to do for most executors
+        
+        pass
+    
+    
     def run(self, cmd, runPath, binPath, numRanks, numThreads, outPath, description):
         
         from common import subclassResponsibility
         subclassResponsibility("Executor", "run")
 
     
-    def submitJob(self, cmd, prelude, numRanks, numThreads, name, description):   # returns jobID, out, err
+    def submitJob(self, cmd, prelude, numRanks, numThreads, name, description, memory=None):   # returns jobID, out, err
 
         from common import subclassResponsibility
         subclassResponsibility("Executor", "submitJob")
 
     
+    def submitArray(self, cmds, prelude, numRanks, numThreads, name, descriptions, memory=None):   # returns jobIDs, out, err
+        
+        # a job per command, all with the same resources; an executor with job arrays may override;
+        # on error, 'jobIDs' are those of the commands submitted before it
+        
+        jobIDs = []
+        for cmd, description in zip(cmds, descriptions):
+            jobID, out, err = self.submitJob(cmd, prelude, numRanks, numThreads, name, description, memory)
+            if err: return jobIDs, out, err
+            jobIDs.append(jobID)
+        
+        return jobIDs, "", 0
+
+    
+    def submitAllocation(self, cmd, prelude, numNodes, name, description):   # returns jobID, out, err
+        
+        # a job holding 'numNodes' whole nodes, in which 'cmd' launches job steps of its own
+        # (see packer.py); by default an ordinary job, which suits a single-node executor
+        
+        return self.submitJob(cmd, prelude, 0, 0, name, description)
+
+    
     def description(self, jobID):
         return self.jobDescriptions[jobID]
 
@@ -0,0 +1,479 @@
+################################################################################
+#                                                                              #
+#  fileQueueExecutor.py                                                        #
+#  runs batch jobs from a work queue in a shared directory                     #
+#                                                                              #
+#  $HeadURL$                                                                   #
+#  $Id$                                                                        #
+#                                                                              #
+#  --------------------------------------------------------------------------- #
+#  Part of HPCToolkit (hpctoolkit.org)                                         #
+#                                                                              #
+#  Information about sources of support for research and development of        #
+#  HPCToolkit is at 'hpctoolkit.org' and in 'README.Acknowledgments'.          #
+#  --------------------------------------------------------------------------- #
+#                                                                              #
+#  Copyright ((c)) 2002-2017, Rice University                                  #
+#  All rights reserved.                                                        #
+#                                                                              #
+#  Redistribution and use in source and binary forms, with or without          #
+#  modification, are permitted provided that the following conditions are      #
+#  met:                                                                        #
+#                                                                              #
+#  * Redistributions of source code must retain the above copyright            #
+#    notice, this list of conditions and the following disclaimer.             #
+#                                                                              #
+#  * Redistributions in binary form must reproduce the above copyright         #
+#    notice, this list of conditions and the following disclaimer in the       #
+#    documentation and/or other materials provided with the distribution.      #
+#                                                                              #
+#  * Neither the name of Rice University (RICE) nor the names of its           #
+#    contributors may be used to endorse or promote products derived from      #
+#    this software without specific prior written permission.                  #
+#                                                                              #
+#  This software is provided by RICE and contributors "as is" and any          #
+#  express or implied warranties, including, but not limited to, the           #
+#  implied warranties of merchantability and fitness for a particular          #
+#  purpose are disclaimed. In no event shall RICE or contributors be           #
+#  liable for any direct, indirect, incidental, special, exemplary, or         #
+#  consequential damages (including, but not limited to, procurement of        #
+#  substitute goods or services; loss of use, data, or profits; or             #
+#  business interruption) however caused and on any theory of liability,       #
+#  whether in contract, strict liability, or tort (including negligence        #
+#  or otherwise) arising in any way out of the use of this software, even      #
+#  if advised of the possibility of such damage.                               #
+#                                                                              #
+################################################################################
+
+
+
+from executor import Executor
+from shellExecutor import ShellExecutor
+
+
+# A queue is a directory holding a JSON file per job in one of three subdirectories:
+#   pending/JOB.json          waiting for a worker
+#   leased/JOB@WORKER.json    being run by WORKER, which touches the file as a heartbeat
+#   done/JOB.json             finished, with the job's exit status
+# Every change of state is a 'rename', which is atomic on a shared filesystem, so
+# any number of workers on any nodes can take jobs without locks. A lease whose
+# heartbeat stops (eg its worker died) expires and its job goes back to pending.
+# A leased job is cancelled by an empty marker, cancelled/JOB, which its worker
+# watches for; it then kills the job and completes it with status 'cancelled'.
+_queueDirName = ".queue"
+_states       = ["pending", "leased", "done", "cancelled"]
+
+
+class FileQueueExecutor(ShellExecutor):
+    
+    # Jobs are put in a queue in the study directory, to be run by 'hpctest worker'
+    # processes started separately on any nodes that see it. Commands within a job
+    # are run as by ShellExecutor.
+    
+    def __init__(self):
+        
+        super(FileQueueExecutor, self).__init__()
+        self.queue = None
+        self.numSubmitted = 0
+    
+    
+    # System inquiries
+
+    @classmethod
+    def name(cls):
+        
+        return "FileQueue"
+
+
+    @classmethod
+    def isAvailable(cls):
+        
+        return True, None
+
+
+    @classmethod
+    def defaultToBackground(cls):
+        
+        return True
+    
+    
+    # Scheduling operations
+    
+    def useStudy(self, study):
+        
+        self.queue = FileQueue.forStudy(study.path)
+    
+    
+    def submitJob(self, cmd, prelude, numRanks, numThreads, name, description, memory=None):   # returns jobID, out, err
+        
+        from common import assertmsg
+        
+        assertmsg(self.queue, "FileQueueExecutor.submitJob called before useStudy")
+        
+        jobID = self._newJobID(name)
+        self._enqueueJob(jobID, cmd, prelude, numRanks, numThreads, description)
+        return jobID, "", 0
+    
+    
+    def submitAllocation(self, cmd, prelude, numNodes, name, description):   # returns jobID, out, err
+        
+        # a worker runs the packer like any job, but alone, as it places runs on a whole node
+        
+        from resources import NodeShape
+        return self.submitJob(cmd, prelude, numNodes * NodeShape.local().cores, 0, name, description)
+    
+    
+    def isFinished(self, jobID):
+        
+        return self.queue.isDone(jobID)
+    
+    
+    def pollForFinishedJobs(self):
+        
+        import time
+        
+        # jobs of dead workers go back in the queue for live ones
+        self.queue.requeueExpired()
+        time.sleep(FileQueue.pollInterval())
+        
+        return super(FileQueueExecutor, self).pollForFinishedJobs()
+    
+    
+    def kill(self, jobID):
+        
+        self.queue.cancel(jobID)
+        self._removeJob(jobID)
+    
+    
+    def killAll(self):
+        
+        for jobID in list(self.runningJobs):
+            self.kill(jobID)
+    
+    
+    #-----------------#
+    # Private methods #
+    #-----------------#
+    
+    def _newJobID(self, name):
+        
+        # job ids sort in order of submission, and differ between drivers sharing a queue
+        
+        import os, time
+        
+        self.numSubmitted += 1
+        return "{}-{}-{:05d}-{}".format(time.strftime("%Y%m%d%H%M%S"), os.getpid(), self.numSubmitted, name)
+    
+    
+    def _enqueueJob(self, jobID, cmd, prelude, numRanks, numThreads, description):
+        
+        import time
+        from collections import OrderedDict
+        from common import verbosemsg
+        
+        # add the prelude commands if any
+        if type(prelude) is not list: prelude = [prelude]
+        cmd = "\n".join(prelude) + ("\n" if len(prelude) else "") + cmd
+        
+        job = OrderedDict()
+        job["cmd"]         = cmd
+        job["ranks"]       = numRanks
+        job["threads"]     = numThreads
+        job["description"] = description
+        job["submitted"]   = time.time()
+        self.queue.enqueue(jobID, job)
+        verbosemsg("queued job {} in {}".format(jobID, self.queue.path))
+        
+        self._addJob(jobID, description)
+
+
+
+class FileQueue(object):
+    
+    def __init__(self, path):
+        
+        from os import makedirs
+        from os.path import isdir, join
+        
+        self.path = path
+        for state in _states:
+            if not isdir(join(path, state)):
+                try:
+                    makedirs(join(path, state))
+                except OSError:
+                    pass    # made meanwhile by another process
+    
+    
+    @classmethod
+    def forStudy(cls, studyPath):
+        
+        from os.path import join
+        return FileQueue(join(studyPath, _queueDirName))
+    
+    
+    @classmethod
+    def pollInterval(cls):
+        
+        import configuration
+        return float(configuration.get("config.batch.queue.poll interval", 2))
+    
+    
+    def enqueue(self, jobID, job):
+        
+        from util.yaml import writeJsonFile
+        writeJsonFile(self._jobPath("pending", jobID), job)     # atomic, see util.yaml
+    
+    
+    def pendingJobs(self):     # returns list of (jobID, job) in order of submission
+        
+        from os import listdir
+        from util.yaml import readJsonFile
+        
+        jobs = []
+        for filename in sorted(listdir(self._dir("pending"))):
+            if not filename.endswith(".json"): continue
+            try:
+                jobs.append( (filename[:-len(".json")], readJsonFile(self._jobPath("pending", filename[:-len(".json")]))) )
+            except (IOError, OSError, ValueError):
+                pass    # claimed meanwhile by another worker
+        return jobs
+    
+    
+    def leasedJobs(self):     # returns list of (jobID, workerID, job)
+        
+        from os import listdir
+        from os.path import join
+        from util.yaml import readJsonFile
+        
+        jobs = []
+        for filename in sorted(listdir(self._dir("leased"))):
+            if not filename.endswith(".json"): continue
+            jobID, workerID = filename[:-len(".json")].split("@")
+            try:
+                jobs.append( (jobID, workerID, readJsonFile(join(self._dir("leased"), filename))) )
+            except (IOError, OSError, ValueError):
+                pass    # completed or requeued meanwhile
+        return jobs
+    
+    
+    def claim(self, jobID, workerID):     # returns True iff this worker now holds the job's lease
+        
+        import os
+        
+        try:
+            leasePath = self._leasePath(jobID, workerID)
+            os.rename(self._jobPath("pending", jobID), leasePath)
+            os.utime(leasePath, None)
+            return True
+        except OSError:
+            return False    # another worker got it first
+    
+    
+    def heartbeat(self, jobID, workerID):
+        
+        import os
+        
+        try:
+            os.utime(self._leasePath(jobID, workerID), None)
+        except OSError:
+            pass    # lease expired and job was requeued, so it may be run again, in a run dir of its own
+    
+    
+    def complete(self, jobID, workerID, status):
+        
+        import os
+        from util.yaml import readJsonFile, writeJsonFile
+        
+        leasePath = self._leasePath(jobID, workerID)
+        try:
+            job = readJsonFile(leasePath)
+        except (IOError, OSError, ValueError):
+            job = dict()
+        job["status"] = status
+        job["worker"] = workerID
+        writeJsonFile(self._jobPath("done", jobID), job)
+        for path in leasePath, self._cancelPath(jobID):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    
+    
+    def requeueExpired(self):     # returns list of jobIDs put back in pending
+        
+        import os, time
+        from os import listdir
+        from os.path import getmtime, join
+        import configuration
+        
+        lease    = float(configuration.get("config.batch.queue.lease", 300))
+        requeued = []
+        for filename in listdir(self._dir("leased")):
+            leasePath = join(self._dir("leased"), filename)
+            jobID, workerID = filename[:-len(".json")].split("@")
+            try:
+                if time.time() - getmtime(leasePath) > lease and self.isCancelled(jobID):
+                    self.complete(jobID, workerID, "cancelled")
+                elif time.time() - getmtime(leasePath) > lease:
+                    os.rename(leasePath, self._jobPath("pending", jobID))
+                    requeued.append(jobID)
+            except OSError:
+                pass    # completed or requeued meanwhile
+        return requeued
+    
+    
+    def withdraw(self, jobID):
+        
+        import os
+        
+        try:
+            os.remove(self._jobPath("pending", jobID))
+        except OSError:
+            pass
+    
+    
+    def cancel(self, jobID):
+        
+        # a pending job is just withdrawn; a leased one is marked for its worker to kill
+        
+        import os
+        from os.path import lexists
+        
+        try:
+            os.remove(self._jobPath("pending", jobID))
+        except OSError:
+            if not lexists(self._jobPath("done", jobID)):
+                open(self._cancelPath(jobID), "w").close()
+    
+    
+    def isCancelled(self, jobID):
+        
+        from os.path import isfile
+        return isfile(self._cancelPath(jobID))
+    
+    
+    def isDone(self, jobID):
+        
+        from os.path import isfile
+        return isfile(self._jobPath("done", jobID))
+    
+    
+    def forget(self, jobID):
+        
+        # drop a done job's record once its submitter has seen it finish
+        
+        import os
+        
+        try:
+            os.remove(self._jobPath("done", jobID))
+        except OSError:
+            pass
+    
+    
+    def isIdle(self):     # returns True if no job is pending or leased
+        
+        from os import listdir
+        return not listdir(self._dir("pending")) and not listdir(self._dir("leased"))
+    
+    
+    def work(self, numCores, workerID):     # returns number of jobs run
+        
+        # Run jobs from the queue as a worker with 'numCores' cores, as many at once as
+        # fit, until the queue has been idle for config.batch.queue.idle timeout seconds.
+        
+        import os, signal, time
+        from subprocess import Popen
+        import configuration
+        from common import infomsg, verbosemsg
+        from packer import Packer
+        
+        heartbeat   = float(configuration.get("config.batch.queue.heartbeat", 30))
+        idleTimeout = float(configuration.get("config.batch.queue.idle timeout", 60))
+        
+        running   = dict()      # process -> (jobID, cores)
+        numRun    = 0
+        lastBeat  = time.time()
+        idleSince = time.time()
+        while True:
+            
+            # take whatever pending jobs fit in the free cores, in order of submission
+            self.requeueExpired()
+            free = numCores - sum(cores for _, cores in running.values())
+            for jobID, job in self.pendingJobs():
+                cores = min(Packer.coresFor(job), numCores)     # one too big runs alone
+                if (cores <= free or not running) and free > 0 and self.claim(jobID, workerID):
+                    infomsg("running {}".format(job["description"]))
+                    env = os.environ.copy()
+                    env["OMP_NUM_THREADS"] = str(max(job["threads"], 1))
+                    env["HPCTEST_WORKER"]  = workerID     # recorded in run's results, see 'report --timeline'
+                    # ... in a process group of its own, so cancelling kills all of the job's processes
+                    running[Popen(job["cmd"], shell=True, env=env, preexec_fn=os.setsid)] = (jobID, cores)
+                    free -= cores
+                    numRun += 1
+            
+            # keep leases of running jobs alive
+            if time.time() - lastBeat >= heartbeat:
+                for jobID, _ in running.values():
+                    self.heartbeat(jobID, workerID)
+                lastBeat = time.time()
+            
+            # kill jobs that were cancelled
+            for process, (jobID, _) in running.items():
+                if self.isCancelled(jobID) and process.poll() is None:
+                    try:
+                        os.killpg(process.pid, signal.SIGKILL)
+                    except OSError:
+                        pass    # finished meanwhile
+                    process.wait()
+                    running.pop(process)
+                    self.complete(jobID, workerID, "cancelled")
+                    infomsg("cancelled {}".format(jobID))
+            
+            # finish up jobs that are done
+            for process in [ p for p in running if p.poll() is not None ]:
+                jobID, _ = running.pop(process)
+                self.complete(jobID, workerID, process.returncode)
+                verbosemsg("finished {} with status {}".format(jobID, process.returncode))
+            
+            # stop when nothing has been left to do for a while
+            if running or not self.isIdle():
+                idleSince = time.time()
+            elif time.time() - idleSince >= idleTimeout:
+                break
+            time.sleep(1)
+        
+        return numRun
+    
+    
+    #-----------------#
+    # Private methods #
+    #-----------------#
+    
+    def _dir(self, state):
+        
+        from os.path import join
+        return join(self.path, state)
+    
+    
+    def _jobPath(self, state, jobID):
+        
+        from os.path import join
+        return join(self._dir(state), jobID + ".json")
+    
+    
+    def _leasePath(self, jobID, workerID):
+        
+        from os.path import join
+        return join(self._dir("leased"), "{}@{}.json".format(jobID, workerID))
+    
+    
+    def _cancelPath(self, jobID):
+        
+        from os.path import join
+        return join(self._dir("cancelled"), jobID)
+
+
+
+# register this executor class by name
+Executor.register(FileQueueExecutor.name(), FileQueueExecutor)
+
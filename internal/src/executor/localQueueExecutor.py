@@ -0,0 +1,194 @@
+################################################################################
+#                                                                              #
+#  localQueueExecutor.py                                                       #
+#  stand-in for a batch manager, queueing jobs on this machine                 #
+#                                                                              #
+#  $HeadURL$                                                                   #
+#  $Id$                                                                        #
+#                                                                              #
+#  --------------------------------------------------------------------------- #
+#  Part of HPCToolkit (hpctoolkit.org)                                         #
+#                                                                              #
+#  Information about sources of support for research and development of        #
+#  HPCToolkit is at 'hpctoolkit.org' and in 'README.Acknowledgments'.          #
+#  --------------------------------------------------------------------------- #
+#                                                                              #
+#  Copyright ((c)) 2002-2017, Rice University                                  #
+#  All rights reserved.                                                        #
+#                                                                              #
+#  Redistribution and use in source and binary forms, with or without          #
+#  modification, are permitted provided that the following conditions are      #
+#  met:                                                                        #
+#                                                                              #
+#  * Redistributions of source code must retain the above copyright            #
+#    notice, this list of conditions and the following disclaimer.             #
+#                                                                              #
+#  * Redistributions in binary form must reproduce the above copyright         #
+#    notice, this list of conditions and the following disclaimer in the       #
+#    documentation and/or other materials provided with the distribution.      #
+#                                                                              #
+#  * Neither the name of Rice University (RICE) nor the names of its           #
+#    contributors may be used to endorse or promote products derived from      #
+#    this software without specific prior written permission.                  #
+#                                                                              #
+#  This software is provided by RICE and contributors "as is" and any          #
+#  express or implied warranties, including, but not limited to, the           #
+#  implied warranties of merchantability and fitness for a particular          #
+#  purpose are disclaimed. In no event shall RICE or contributors be           #
+#  liable for any direct, indirect, incidental, special, exemplary, or         #
+#  consequential damages (including, but not limited to, procurement of        #
+#  substitute goods or services; loss of use, data, or profits; or             #
+#  business interruption) however caused and on any theory of liability,       #
+#  whether in contract, strict liability, or tort (including negligence        #
+#  or otherwise) arising in any way out of the use of this software, even      #
+#  if advised of the possibility of such damage.                               #
+#                                                                              #
+################################################################################
+
+
+
+from executor import Executor
+from fileQueueExecutor import FileQueueExecutor, FileQueue
+
+
+class LocalQueueExecutor(FileQueueExecutor):
+    
+    # Behaves like a batch manager but needs none, so that batch mode can be tried out
+    # and measured on one machine. Jobs wait in a spool directory, in a FileQueue, and
+    # the driver's own polls dispatch them (there is no daemon): a job starts once it
+    # has waited its simulated queue delay and cores are free under the spool's core
+    # limit, counting jobs of every driver that shares the spool. Cancelling and job
+    # arrays work as in a batch manager.
+    
+    def __init__(self):
+        
+        import os
+        from os.path import join
+        import common, configuration
+        
+        super(LocalQueueExecutor, self).__init__()
+        spool = configuration.get("config.batch.local queue.spool") or join(common.homepath, ".hpctest", "local-queue")
+        self.queue    = FileQueue(os.path.expanduser(spool))
+        self.workerID = "driver-{}".format(os.getpid())
+        self.running  = dict()     # jobID -> process, for jobs this driver dispatched
+    
+    
+    # System inquiries
+
+    @classmethod
+    def name(cls):
+        
+        return "LocalQueue"
+    
+    
+    # Scheduling operations
+    
+    def useStudy(self, study):
+        
+        pass    # all studies share the spool
+    
+    
+    def submitArray(self, cmds, prelude, numRanks, numThreads, name, descriptions, memory=None):   # returns jobIDs, out, err
+        
+        # tasks of an array share its id, as in ARRAYID_INDEX
+        
+        arrayID = self._newJobID(name)
+        jobIDs  = []
+        for index, (cmd, description) in enumerate(zip(cmds, descriptions)):
+            jobID = "{}_{:04d}".format(arrayID, index)
+            self._enqueueJob(jobID, cmd, prelude, numRanks, numThreads, description)
+            jobIDs.append(jobID)
+        
+        return jobIDs, "", 0
+    
+    
+    def pollForFinishedJobs(self):
+        
+        import time
+        
+        self._reap()
+        self.queue.requeueExpired()
+        self._dispatch()
+        time.sleep(FileQueue.pollInterval())
+        
+        # the spool is shared and long-lived, so reported jobs leave nothing behind
+        finished = Executor.pollForFinishedJobs(self)
+        for jobID in finished:
+            self.queue.forget(jobID)
+        return finished
+    
+    
+    def kill(self, jobID):
+        
+        import os, signal
+        
+        if jobID in self.running:
+            try:
+                os.killpg(self.running.pop(jobID).pid, signal.SIGKILL)
+            except OSError:
+                pass    # finished meanwhile
+            self.queue.complete(jobID, self.workerID, "cancelled")
+            self.queue.forget(jobID)
+        else:
+            self.queue.withdraw(jobID)
+        self._removeJob(jobID)
+    
+    
+    #-----------------#
+    # Private methods #
+    #-----------------#
+    
+    def _dispatch(self):
+        
+        # start pending jobs in order of submission, each once its delay is over and its cores are free
+        
+        import os, random, time
+        from subprocess import Popen
+        import configuration
+        from common import verbosemsg
+        from packer import Packer
+        from resources import NodeShape
+        
+        limit  = int(configuration.get("config.batch.local queue.cores") or NodeShape.local().cores)
+        delay  = float(configuration.get("config.batch.local queue.delay", 0))
+        jitter = float(configuration.get("config.batch.local queue.jitter", 0))
+        
+        free = limit - sum(min(Packer.coresFor(job), limit) for _, _, job in self.queue.leasedJobs())
+        for jobID, job in self.queue.pendingJobs():
+            
+            # other drivers' jobs are theirs to start, so none outlives the driver that waits for it
+            if jobID not in self.runningJobs:
+                continue
+            
+            # delay is simulated per job, reproducibly, from its id
+            wait = delay + jitter * random.Random(jobID).random()
+            if time.time() - job.get("submitted", 0) < wait:
+                continue
+            
+            # like a FIFO batch manager with backfill: later jobs may start if they fit
+            cores = min(Packer.coresFor(job), limit)
+            if cores <= free and self.queue.claim(jobID, self.workerID):
+                env = os.environ.copy()
+                env["OMP_NUM_THREADS"] = str(max(job["threads"], 1))
+                env["HPCTEST_WORKER"]  = self.workerID
+                self.running[jobID] = Popen(job["cmd"], shell=True, env=env, preexec_fn=os.setsid)   # see 'kill'
+                free -= cores
+                verbosemsg("dispatched {} on {} cores, {} free".format(jobID, cores, free))
+    
+    
+    def _reap(self):
+        
+        # complete jobs whose processes are done, and keep the others' leases alive
+        
+        for jobID, process in self.running.items():
+            if process.poll() is not None:
+                self.queue.complete(jobID, self.workerID, process.returncode)
+                del self.running[jobID]
+            else:
+                self.queue.heartbeat(jobID, self.workerID)
+
+
+
+# register this executor class by name
+Executor.register(LocalQueueExecutor.name(), LocalQueueExecutor)
+
@@ -86,7 +86,7 @@ class LSFExecutor(Executor):
     
     # Programming model support
     
-    def wrap(self, cmd, runPath, binPath, numRanks, numThreads, spackMPIBin):
+    def wrap(self, cmd, runPath, binPath, numRanks, numThreads, spackMPIBin, memory=None):
         
         # TODO: USE binPath APPROPRIATELY!!!
         
@@ -96,16 +96,20 @@ class LSFExecutor(Executor):
         from os import getcwd
         import textwrap, tempfile
         from common import options, verbosemsg
+        from resources import ResourceShape
+        
+        shape = ResourceShape.forBatch(numRanks, numThreads, memory)
                 
-        # get template
+        # get template: a resource set per rank, with its threads' cores packed together
         template = \
-            "jsrun {options} -i -n {numRanks} -a 1 -c {numThreads} {cmd}"   # could also say  -h {runPath}
+            "jsrun {options} -i -n {numRanks} -a 1 -c {numThreads} -b {binding} {cmd}"   # could also say  -h {runPath}
 
         # insert parameters
         jsrunCmd = template.format(
             options      = "",          # or "--verbose" if "debug" in options else "", but jsrun apparently has no verbose option
-            numRanks     = numRanks if numRanks > 0 else 1,
-            numThreads   = numThreads if numThreads > 0 else 1,
+            numRanks     = shape.ranks,
+            numThreads   = shape.cpusPerTask,
+            binding      = "packed:{}".format(shape.cpusPerTask) if shape.binding == "cores" else "none",
             cmd          = cmd
             )
         
@@ -124,11 +128,20 @@ class LSFExecutor(Executor):
         if err: raise ExecuteFailed(out, err)
 
     
-    def submitJob(self, cmd, prelude, numRanks, numThreads, name, description):   # returns jobID, out, err
+    def submitJob(self, cmd, prelude, numRanks, numThreads, name, description, memory=None):   # returns jobID, out, err
         
         from common import ExecuteFailed
 
-        jobid, out, err = self._bsub(cmd, prelude, numRanks, numThreads, name, description)
+        jobid, out, err = self._bsub(cmd, prelude, numRanks, numThreads, name, description, memory=memory)
+        if err == 0:
+            self._addJob(jobid, description)
+        
+        return jobid, out, err
+
+    
+    def submitAllocation(self, cmd, prelude, numNodes, name, description):   # returns jobID, out, err
+        
+        jobid, out, err = self._bsub(cmd, prelude, 0, 0, name, description, numNodes=numNodes)
         if err == 0:
             self._addJob(jobid, description)
         
@@ -137,7 +150,12 @@ class LSFExecutor(Executor):
     
     def isFinished(self, jobID):
         
-        return False    ## TODO: DEBUG
+        # 'bjobs' reports a finished job as DONE or EXIT for a while, then not at all
+        
+        out, err = self._shell("bjobs -noheader -o stat {}".format(jobID))
+        if err:
+            return "not found" in out
+        return out.strip() in ("DONE", "EXIT")
 
     
     def pollForFinishedJobs(self):
@@ -220,7 +238,10 @@ class LSFExecutor(Executor):
         return out, (err if err else 0)
 
 
-    def _bsub(self, cmds, prelude, numRanks, numThreads, name, description): # returns (jobid, out, err)
+    def _bsub(self, cmds, prelude, numRanks, numThreads, name, description, numNodes=None, memory=None): # returns (jobid, out, err)
+        
+        # 'numNodes' => allocate that many nodes, for runs packed into them with 'jsrun';
+        # otherwise just enough nodes for 'numRanks' x 'numThreads' cores (LSF allocates whole nodes)
         
         import textwrap, tempfile
         from os import getcwd
@@ -228,6 +249,7 @@ class LSFExecutor(Executor):
         import re
         import common
         from common import options, verbosemsg, debugmsg, errormsg
+        from resources import ResourceShape
         
         # add the prelude commands if any
         if type(prelude) is not list: prelude = [prelude]
@@ -239,7 +261,7 @@ class LSFExecutor(Executor):
             #!/bin/bash
             #BSUB -J {jobName}
             #BSUB -P {project}
-            #BSUB -nnodes {numRanks}
+            #BSUB -nnodes {numNodes}
             #BSUB -W {time}
             export OMP_NUM_THREADS={numThreads}
             {cmds} 
@@ -255,7 +277,7 @@ class LSFExecutor(Executor):
         f.write(LSF_batch_file_template.format(
             jobName      = name,
             project      = project,
-            numRanks     = numRanks if numRanks > 0 else 1,
+            numNodes     = numNodes if numNodes else ResourceShape.forBatch(numRanks, numThreads, memory).nodes,
             numThreads   = numThreads if numThreads > 0 else 1,
             time         = time,
             cmds         = cmds,
@@ -0,0 +1,195 @@
+################################################################################
+#                                                                              #
+#  packer.py                                                                   #
+#  runs many small test runs side by side inside one batch allocation          #
+#                                                                              #
+#  $HeadURL$                                                                   #
+#  $Id$                                                                        #
+#                                                                              #
+#  --------------------------------------------------------------------------- #
+#  Part of HPCToolkit (hpctoolkit.org)                                         #
+#                                                                              #
+#  Information about sources of support for research and development of        #
+#  HPCToolkit is at 'hpctoolkit.org' and in 'README.Acknowledgments'.          #
+#  --------------------------------------------------------------------------- #
+#                                                                              #
+#  Copyright ((c)) 2002-2017, Rice University                                  #
+#  All rights reserved.                                                        #
+#                                                                              #
+#  Redistribution and use in source and binary forms, with or without          #
+#  modification, are permitted provided that the following conditions are      #
+#  met:                                                                        #
+#                                                                              #
+#  * Redistributions of source code must retain the above copyright            #
+#    notice, this list of conditions and the following disclaimer.             #
+#                                                                              #
+#  * Redistributions in binary form must reproduce the above copyright         #
+#    notice, this list of conditions and the following disclaimer in the       #
+#    documentation and/or other materials provided with the distribution.      #
+#                                                                              #
+#  * Neither the name of Rice University (RICE) nor the names of its           #
+#    contributors may be used to endorse or promote products derived from      #
+#    this software without specific prior written permission.                  #
+#                                                                              #
+#  This software is provided by RICE and contributors "as is" and any          #
+#  express or implied warranties, including, but not limited to, the           #
+#  implied warranties of merchantability and fitness for a particular          #
+#  purpose are disclaimed. In no event shall RICE or contributors be           #
+#  liable for any direct, indirect, incidental, special, exemplary, or         #
+#  consequential damages (including, but not limited to, procurement of        #
+#  substitute goods or services; loss of use, data, or profits; or             #
+#  business interruption) however caused and on any theory of liability,       #
+#  whether in contract, strict liability, or tort (including negligence        #
+#  or otherwise) arising in any way out of the use of this software, even      #
+#  if advised of the possibility of such damage.                               #
+#                                                                              #
+################################################################################
+
+
+
+# A pack list names the runs to be packed into one allocation, each by the manifest
+# that '_runOne' reads (see Run._writeManifest) and the cores it needs.
+_packPrefix = ".pack-"
+
+
+class Packer(object):
+    
+    # Places runs onto the free cores of an allocation, largest first, and each time
+    # a run finishes starts whichever pending runs now fit ("backfilling"). Every run
+    # is an 'hpctest _runOne' process whose job steps get their own cores from the
+    # batch manager ('srun --exclusive' or 'jsrun' resource sets), so the packer only
+    # has to keep the cores it hands out within those of the allocation.
+    
+    def __init__(self, jobs, numCores):
+        
+        # 'jobs' is a list of dicts with keys "manifest", "ranks", "threads", "description"
+        
+        self.numCores = numCores
+        self.pending  = sorted(jobs, key=Packer.coresFor, reverse=True)
+        self.running  = dict()      # process -> (job, cores)
+        self.numFailed = 0
+    
+    
+    @classmethod
+    def coresFor(cls, job):
+        
+        return max(job["ranks"], 1) * max(job["threads"], 1)
+    
+    
+    @classmethod
+    def writePackList(cls, jobs, numNodes, study):     # returns path
+        
+        import os, tempfile
+        from collections import OrderedDict
+        from common import magic_cookie
+        from util.yaml import writeJsonFile
+        
+        packList = OrderedDict()
+        packList["cookie"]         = magic_cookie
+        packList["nodes"]  = numNodes
+        packList["jobs"]   = jobs
+        
+        # hidden file in study dir b/c every subdir there is taken to be a run dir
+        fd, path = tempfile.mkstemp(prefix=_packPrefix, suffix=".json", dir=study.path)
+        os.close(fd)
+        writeJsonFile(path, packList)
+        return path
+    
+    
+    @classmethod
+    def readPackList(cls, path):     # returns (jobs, total cores of allocation)
+        
+        from sys import exit
+        from common import magic_cookie
+        from util.yaml import readJsonFile
+        
+        try:
+            packList = readJsonFile(path)
+            if packList.get("cookie") != magic_cookie: raise ValueError
+        except (IOError, OSError, ValueError, AttributeError):
+            print "The _pack command is for internal use only."
+            exit()
+        
+        return packList["jobs"], Packer._allocationCores(packList["nodes"])
+    
+    
+    def run(self, launch, pollInterval=1.0):     # returns number of runs whose process failed
+        
+        # 'launch(job)' starts the job's process with OMP_NUM_THREADS set and returns it
+        
+        import time
+        from common import infomsg, verbosemsg, warnmsg
+        
+        for job in self.pending:
+            if Packer.coresFor(job) > self.numCores:
+                warnmsg("{} needs {} cores but the allocation has {}, so will run alone"
+                            .format(job["description"], Packer.coresFor(job), self.numCores))
+        
+        while self.pending or self.running:
+            
+            # start every pending run that fits, biggest first
+            job = self._nextFitting()
+            while job:
+                cores = min(Packer.coresFor(job), self.numCores)
+                verbosemsg("starting {} on {} of {} free cores".format(job["description"], cores, self._freeCores()))
+                self.running[launch(job)] = (job, cores)
+                job = self._nextFitting()
+            
+            # wait for a run to finish
+            time.sleep(pollInterval)
+            for process in [ p for p in self.running if p.poll() is not None ]:
+                job, _ = self.running.pop(process)
+                if process.returncode:
+                    self.numFailed += 1
+                infomsg("{} finished".format(job["description"]))
+        
+        return self.numFailed
+    
+    
+    #-----------------#
+    # Private methods #
+    #-----------------#
+    
+    def _freeCores(self):
+        
+        return self.numCores - sum(cores for _, cores in self.running.values())
+    
+    
+    def _nextFitting(self):     # returns job removed from 'pending', or None if none fits now
+        
+        # Pending runs are biggest first and none is added later, so a big run passed
+        # over for smaller ones gets its cores at the latest when they are all done.
+        # One bigger than the whole allocation runs alone.
+        
+        free = self._freeCores()
+        for i, job in enumerate(self.pending):
+            if Packer.coresFor(job) <= free or (not self.running and free == self.numCores):
+                return self.pending.pop(i)
+        return None
+    
+    
+    @classmethod
+    def _allocationCores(cls, numNodes):     # returns total cores
+        
+        # configured cores per node, else what the batch manager says, else this node's count
+        
+        import os
+        from resources import NodeShape
+        
+        coresPerNode = NodeShape.fromConfiguration().cores
+        if coresPerNode:
+            return numNodes * coresPerNode
+        
+        env = os.environ
+        if "SLURM_CPUS_ON_NODE" in env:
+            nodes = int(env.get("SLURM_JOB_NUM_NODES", numNodes))
+            return nodes * int(env["SLURM_CPUS_ON_NODE"])
+        if "LSB_MCPU_HOSTS" in env:
+            # "host1 n1 host2 n2 ..." where the first host is the launch node, not for runs
+            fields = env["LSB_MCPU_HOSTS"].split()
+            counts = [ int(n) for n in fields[3::2] ]
+            if counts:
+                return sum(counts)
+        
+        return numNodes * NodeShape.local().cores
+    
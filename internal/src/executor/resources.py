@@ -0,0 +1,166 @@
+################################################################################
+#                                                                              #
+#  resources.py                                                                #
+#  shapes of nodes and of the resources a run asks the batch manager for       #
+#                                                                              #
+#  $HeadURL$                                                                   #
+#  $Id$                                                                        #
+#                                                                              #
+#  --------------------------------------------------------------------------- #
+#  Part of HPCToolkit (hpctoolkit.org)                                         #
+#                                                                              #
+#  Information about sources of support for research and development of        #
+#  HPCToolkit is at 'hpctoolkit.org' and in 'README.Acknowledgments'.          #
+#  --------------------------------------------------------------------------- #
+#                                                                              #
+#  Copyright ((c)) 2002-2017, Rice University                                  #
+#  All rights reserved.                                                        #
+#                                                                              #
+#  Redistribution and use in source and binary forms, with or without          #
+#  modification, are permitted provided that the following conditions are      #
+#  met:                                                                        #
+#                                                                              #
+#  * Redistributions of source code must retain the above copyright            #
+#    notice, this list of conditions and the following disclaimer.             #
+#                                                                              #
+#  * Redistributions in binary form must reproduce the above copyright         #
+#    notice, this list of conditions and the following disclaimer in the       #
+#    documentation and/or other materials provided with the distribution.      #
+#                                                                              #
+#  * Neither the name of Rice University (RICE) nor the names of its           #
+#    contributors may be used to endorse or promote products derived from      #
+#    this software without specific prior written permission.                  #
+#                                                                              #
+#  This software is provided by RICE and contributors "as is" and any          #
+#  express or implied warranties, including, but not limited to, the           #
+#  implied warranties of merchantability and fitness for a particular          #
+#  purpose are disclaimed. In no event shall RICE or contributors be           #
+#  liable for any direct, indirect, incidental, special, exemplary, or         #
+#  consequential damages (including, but not limited to, procurement of        #
+#  substitute goods or services; loss of use, data, or profits; or             #
+#  business interruption) however caused and on any theory of liability,       #
+#  whether in contract, strict liability, or tort (including negligence        #
+#  or otherwise) arising in any way out of the use of this software, even      #
+#  if advised of the possibility of such damage.                               #
+#                                                                              #
+################################################################################
+
+
+
+from collections import namedtuple
+
+
+class NodeShape(namedtuple("NodeShape", ["cores", "memory"])):
+    
+    # 'memory' is in bytes; either field is None if not known
+    
+    _local = None
+    
+    
+    @classmethod
+    def fromConfiguration(cls):     # returns shape per config.machine, with None for what isn't given
+        
+        import configuration
+        from common import sizeInBytes
+        
+        cores = configuration.get("config.machine.cores per node")
+        if not cores:
+            cpus    = configuration.get("config.machine.cpus per node")
+            threads = configuration.get("config.machine.threads per cpu")
+            cores   = cpus * threads if cpus and threads else None
+        memory = sizeInBytes(configuration.get("config.machine.memory per node"))
+        
+        return NodeShape(int(cores) if cores else None, memory)
+    
+    
+    @classmethod
+    def local(cls):     # returns shape per config.machine, completed from this node's hardware
+        
+        from multiprocessing import cpu_count
+        
+        if not cls._local:
+            configured = NodeShape.fromConfiguration()
+            cls._local = NodeShape(configured.cores  or cpu_count(),
+                                   configured.memory or _detectMemory())
+        return cls._local
+
+
+class ResourceShape(object):
+    
+    # How 'numRanks' ranks of 'numThreads' threads each, with 'memory' bytes per rank
+    # if given, fit onto the fewest nodes of shape 'node'. Each executor turns this one
+    # description into its own batch options, so none asks for more than a run needs.
+    # If the node's cores aren't known, 'nodeKnown' is False and each rank is placed by
+    # itself, leaving nodes to the batch manager.
+    
+    def __init__(self, numRanks, numThreads, memory=None, node=None):
+        
+        # numRanks == 0 means no MPI, numThreads == 0 means no OpenMP, as in Executor.wrap
+        
+        if not node: node = NodeShape.local()
+        
+        self.ranks     = max(numRanks, 1)
+        self.memory    = memory
+        self.nodeKnown = bool(node.cores)
+        
+        if not self.nodeKnown:
+            self.cpusPerTask  = max(numThreads, 1)
+            self.ranksPerNode = 1
+            self.nodes        = self.ranks
+            self.cores        = self.ranks * self.cpusPerTask
+            self.exclusive    = False
+            self.binding      = "cores"
+            return
+        
+        self.cpusPerTask = min(max(numThreads, 1), node.cores)
+        
+        ranksPerNode = node.cores // self.cpusPerTask
+        if memory and node.memory:
+            ranksPerNode = min(ranksPerNode, max(node.memory // memory, 1))
+        self.ranksPerNode = min(ranksPerNode, self.ranks)
+        self.nodes        = -(-self.ranks // self.ranksPerNode)    # ceiling
+        self.cores        = self.ranks * self.cpusPerTask
+        
+        # whole nodes are asked for only if the run fills them anyway
+        self.exclusive = self.nodes > 1 or self.ranksPerNode * self.cpusPerTask == node.cores
+        
+        # each rank is bound to cores of its own, unless it has more threads than a node has cores
+        self.binding = "cores" if self.cpusPerTask == max(numThreads, 1) else "none"
+    
+    
+    @classmethod
+    def forBatch(cls, numRanks, numThreads, memory=None):     # returns ResourceShape
+        
+        # batch jobs run on compute nodes, whose shape only config.machine can tell,
+        # since the node submitting them, eg a login node, may well differ
+        
+        return cls(numRanks, numThreads, memory, NodeShape.fromConfiguration())
+    
+    
+    def __str__(self):
+        
+        return "{} rank(s) x {} cpu(s) on {} node(s), {} per node".format(
+                    self.ranks, self.cpusPerTask, self.nodes, self.ranksPerNode)
+    
+    
+    def memoryPerCpu(self):     # returns megabytes, or None if run's memory not given
+        
+        if not self.memory: return None
+        return -(-self.memory // (self.cpusPerTask * 2**20))    # ceiling
+
+
+#-------------------#
+# Private functions #
+#-------------------#
+
+def _detectMemory():     # returns bytes, or None if not found
+    
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    return int(line.split()[1]) * 2**10     # given in kB
+    except (IOError, OSError, ValueError):
+        pass
+    return None
+
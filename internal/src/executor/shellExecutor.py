@@ -84,10 +84,13 @@ class ShellExecutor(Executor):
     
     # Programming model support
     
-    def wrap(self, cmd, runPath, binPath, numRanks, numThreads, spackMPIBin):
+    def wrap(self, cmd, runPath, binPath, numRanks, numThreads, spackMPIBin, memory=None):
+        
+        from resources import ResourceShape
         
         if numRanks:
-            cmd = "{}/mpirun -np {} {}".format(spackMPIBin, numRanks, cmd)
+            shape = ResourceShape(numRanks, numThreads, memory)
+            cmd = "{}/mpirun -np {} {} {}".format(spackMPIBin, numRanks, self._bindingOptions(shape, spackMPIBin), cmd)
 
         return cmd
 
@@ -125,7 +128,7 @@ class ShellExecutor(Executor):
                 os.chdir(oldwd)
 
     
-    def submitJob(self, cmd, prelude, numRanks, numThreads, name, description):   # returns jobID, out, err
+    def submitJob(self, cmd, prelude, numRanks, numThreads, name, description, memory=None):   # returns jobID, out, err
         
         import os
         from subprocess import Popen, CalledProcessError
@@ -169,6 +172,27 @@ class ShellExecutor(Executor):
         self._removeJob(job)
 
     
+    def _bindingOptions(self, shape, spackMPIBin):     # returns mpirun options placing ranks per 'shape'
+        
+        # Ranks that all fit on this node each get 'shape.cpusPerTask' cores of their own,
+        # so that a rank's threads aren't crowded onto one core. Ranks that don't fit share
+        # the cores unbound. OpenMPI is told by its 'ompi_info'; otherwise mpirun is taken
+        # to be MPICH's Hydra.
+        
+        from os.path import isfile, join
+        
+        fits = shape.nodes == 1 and shape.binding == "cores"
+        if isfile(join(spackMPIBin, "ompi_info")):
+            if not fits:
+                return "--oversubscribe --bind-to none"
+            elif shape.cpusPerTask > 1:
+                return "--map-by slot:PE={} --bind-to core".format(shape.cpusPerTask)
+            else:
+                return "--bind-to core"
+        else:
+            return "-bind-to core:{}".format(shape.cpusPerTask) if fits else "-bind-to none"
+
+    
     def _shellError(self, retcode):
         
         # see http://www.tldp.org/LDP/abs/html/exitcodes.html
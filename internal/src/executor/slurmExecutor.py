@@ -89,27 +89,29 @@ class SlurmExecutor(Executor):
     
     # Programming model support
     
-    def wrap(self, cmd, runPath, binPath, numRanks, numThreads, spackMPIBin):
+    def wrap(self, cmd, runPath, binPath, numRanks, numThreads, spackMPIBin, memory=None):
         
         # binPath and spackMPIBin are unused
         
+        import textwrap
         from common import args, options
+        from resources import ResourceShape
+        
+        shape = ResourceShape.forBatch(numRanks, numThreads, memory)
         
         # get template
-        if args["_runOne"]:   # now running nested in a batch script
-            if numRanks == 0:
-                Slurm_run_cmd_template = "srun {options} --ntasks=1 {cmd}"
-            else:
-                Slurm_run_cmd_template = "srun {options} {cmd}"
+        if args["_runOne"]:   # now running nested in a batch script, maybe packed with others
+            # '--exclusive' gives the step cores of its own, so packed runs don't share any
+            Slurm_run_cmd_template = \
+                "srun {options} --exclusive --ntasks={numRanks} --cpus-per-task={numThreads} {binding} {cmd}"
         else:
             Slurm_run_cmd_template = textwrap.dedent(
                 "srun {options} "
                 "     --account={account} "
                 "     --partition={partition} "
                 "     --time={time} "
-                "     --exclusive "
-                "     --ntasks={numRanks} "
-                "     --cpus-per-task={numThreads} "
+                "     {resources} "
+                "     {binding} "
                 "     --mail-type=NONE "
                 "     {cmd}"
                 )
@@ -121,8 +123,10 @@ class SlurmExecutor(Executor):
             account      = account,
             partition    = partition,
             time         = time,
-            numRanks     = numRanks if numRanks > 0 else 1,
-            numThreads   = numThreads if numThreads > 0 else 1,
+            resources    = " ".join(self._resourceOptions(shape)),
+            binding      = "--cpu-bind=cores" if shape.binding == "cores" else "--cpu-bind=none",
+            numRanks     = shape.ranks,
+            numThreads   = shape.cpusPerTask,
             cmd          = cmd
             )
 
@@ -145,11 +149,20 @@ class SlurmExecutor(Executor):
         if err: raise ExecuteFailed(out, err)
 
     
-    def submitJob(self, cmd, prelude, numRanks, numThreads, name, description):   # returns jobID, out, err
+    def submitJob(self, cmd, prelude, numRanks, numThreads, name, description, memory=None):   # returns jobID, out, err
         
         from common import ExecuteFailed
 
-        jobid, out, err = self._sbatch(cmd, prelude, numRanks, numThreads, name, description)
+        jobid, out, err = self._sbatch(cmd, prelude, numRanks, numThreads, name, description, memory=memory)
+        if err == 0:
+            self._addJob(jobid, description)
+        
+        return jobid, out, err
+
+    
+    def submitAllocation(self, cmd, prelude, numNodes, name, description):   # returns jobID, out, err
+        
+        jobid, out, err = self._sbatch(cmd, prelude, 0, 0, name, description, numNodes=numNodes)
         if err == 0:
             self._addJob(jobid, description)
         
@@ -158,7 +171,12 @@ class SlurmExecutor(Executor):
     
     def isFinished(self, jobID):
         
-        return False    ## TODO: DEBUG
+        # a job is no longer listed once finished, and is unknown to squeue soon after
+        
+        out, err = self._shell("squeue --job={} --noheader --format=%i".format(jobID))
+        if err:
+            return "Invalid job id" in out
+        return jobID not in out.split()
 
     
     def pollForFinishedJobs(self):
@@ -202,7 +220,9 @@ class SlurmExecutor(Executor):
             errormsg("attempt to cancel batch job {} failed".format(jobid))
 
 
-    def _sbatch(self, cmds, prelude, numRanks, numThreads, name, description): # returns (jobid, out, err)
+    def _sbatch(self, cmds, prelude, numRanks, numThreads, name, description, numNodes=None, memory=None): # returns (jobid, out, err)
+        
+        # 'numNodes' => allocate that many whole nodes instead of 'numRanks' x 'numThreads' cores
         
         import textwrap, tempfile
         from os import getcwd
@@ -210,6 +230,7 @@ class SlurmExecutor(Executor):
         import os, re
         import common
         from common import options, verbosemsg, debugmsg, errormsg
+        from resources import ResourceShape
                 
         # add the prelude commands if any
         if type(prelude) is not list: prelude = [prelude]
@@ -222,9 +243,7 @@ class SlurmExecutor(Executor):
             #SBATCH --job-name={jobName}
             #SBATCH --account={account}
             #SBATCH --partition={partition}
-            #SBATCH --exclusive
-            #SBATCH --ntasks={numRanks}
-            #SBATCH --cpus-per-task={numThreads}
+            {resources}
             #SBATCH --time={time}
             #SBATCH --mail-type=NONE
             export OMP_NUM_THREADS={numThreads}
@@ -234,6 +253,12 @@ class SlurmExecutor(Executor):
         # template params from configuration
         account, partition, time = self._paramsFromConfiguration()
         
+        if numNodes:
+            resourceOpts = ["--nodes={}".format(numNodes), "--exclusive"]
+        else:
+            resourceOpts = self._resourceOptions(ResourceShape.forBatch(numRanks, numThreads, memory))
+        resources = "\n".join("#SBATCH " + opt for opt in resourceOpts)
+        
         # prepare slurm command file
         slurmfilesDir = getcwd() if "debug" in options else join(common.homepath, ".hpctest")
         f = tempfile.NamedTemporaryFile(mode='w+t', bufsize=-1, delete=False,
@@ -242,7 +267,7 @@ class SlurmExecutor(Executor):
             jobName       = name,
             account       = account,
             partition     = partition,
-            numRanks      = numRanks if numRanks > 0 else 1,
+            resources     = resources,
             numThreads    = numThreads if numThreads > 0 else 1,
             time          = time,
             cmds          = cmds,
@@ -284,6 +309,29 @@ class SlurmExecutor(Executor):
         return (jobid, out, err if err else 0)
 
 
+    def _resourceOptions(self, shape):     # returns list of srun/sbatch options asking for 'shape'
+        
+        # whole nodes only if the run fills them, else just its cores and their share of memory;
+        # without a known node shape, Slurm places the tasks
+        
+        if shape.nodeKnown:
+            options = [ "--nodes={}".format(shape.nodes),
+                        "--ntasks={}".format(shape.ranks),
+                        "--ntasks-per-node={}".format(shape.ranksPerNode),
+                        "--cpus-per-task={}".format(shape.cpusPerTask),
+                      ]
+        else:
+            options = [ "--ntasks={}".format(shape.ranks),
+                        "--cpus-per-task={}".format(shape.cpusPerTask),
+                      ]
+        if shape.exclusive:
+            options.append("--exclusive")
+        elif shape.memoryPerCpu():
+            options.append("--mem-per-cpu={}M".format(shape.memoryPerCpu()))
+        
+        return options
+
+
     def _paramsFromConfiguration(self,):
         
         import configuration
@@ -83,8 +83,12 @@ class Experiment(object):
     
     def run(self):
         
-        self.perform()
-        self.check()
+        import spans
+        
+        with spans.span("perform"):
+            self.perform()
+        with spans.span("check"):
+            self.check()
     
     
     def perform(self):
@@ -66,9 +66,9 @@ class ProfileExperiment(Experiment):
          
         # other details
         self.testIncs      = "./+"
-        self.runOutpath    = self.output.makePath("hpctoolkit-{}-measurements".format(self.exeName))
-        self.structOutpath = self.output.makePath("{}.hpcstruct".format(self))
-        self.profOutpath   = self.output.makePath("hpctoolkit-{}-database".format(self.exeName))
+        self.runOutpath    = self.output.makePath("hpctoolkit-{}-measurements".format(self.exeName), scratch=True)
+        self.structOutpath = self.output.makePath("{}.hpcstruct".format(self.exeName), scratch=True)
+        self.profOutpath   = self.output.makePath("hpctoolkit-{}-database".format(self.exeName), scratch=True)
 
      
     def description(self, forName=False):
@@ -79,6 +79,7 @@ class ProfileExperiment(Experiment):
     def perform(self):
          
         from os.path import join
+        import configuration
         from run import Run
         from common import options, infomsg, verbosemsg, sepmsg, ExecuteFailed
 
@@ -96,22 +97,35 @@ class ProfileExperiment(Experiment):
             # (1) execute test case with profiling
             runCmd = "{}/hpcrun -o {} -t {} {}" \
                 .format(self.hpctoolkitBinPath, self.runOutpath, runParams, self.cmd)
-            self.profiledTime, self.profiledFailMsg = self.runOb.execute(runCmd, ["run"], "profiled", self.wantMPI, self.wantOMP)
+            self.profiledTime, self.profiledFailMsg = self.runOb.execute(runCmd, ["run"], "profiled", self.wantMPI, self.wantOMP,
+                                                                         products=[self.runOutpath])
              
             if "verbose" in options: sepmsg()
              
             # (2) run hpcstruct on test executable
             structCmd = "{}/hpcstruct -o {} {} -I {} {}" \
                 .format(self.hpctoolkitBinPath, self.structOutpath, structParams, self.testIncs, join(self.prefixBin, self.exeName))
-            self.structTime, self.structFailMsg = self.runOb.execute(structCmd, ["run", "profiled"], "hpcstruct", False, False)
+            self.structTime, self.structFailMsg = self.runOb.execute(structCmd, ["run", "profiled"], "hpcstruct", False, False,
+                                                                     products=[self.structOutpath])
          
-            # (3) run hpcprof on test measurements
+            # (3) run hpcprof on test measurements, in parallel if measurements are large
             if self.profiledFailMsg or self.structFailMsg:
                 infomsg("hpcprof not run due to previous failure")
             else:
-                profCmd = "{}/hpcprof -o {} -S {} {} -I {} {}" \
-                    .format(self.hpctoolkitBinPath, self.profOutpath, self.structOutpath, profParams, self.testIncs, self.runOutpath)
-                self.profTime, self.profFailMsg = self.runOb.execute(profCmd, ["run", "profiled"], "hpcprof", False, False)
+                variant, ranks, threads = self._chooseHpcprofVariant()
+                profExe  = "hpcprof-mpi" if variant == "hpcprof-mpi" else "hpcprof"
+                if variant == "hpcprof-threads":
+                    profParams = configuration.get("profile.hpcprof.parallel.threads option", "-j {}").format(threads) + " " + profParams
+                profCmd = "{}/{} -o {} -S {} {} -I {} {}" \
+                    .format(self.hpctoolkitBinPath, profExe, self.profOutpath, self.structOutpath, profParams, self.testIncs, self.runOutpath)
+                self.profTime, self.profFailMsg = self.runOb.execute(profCmd, ["run", "profiled"], "hpcprof",
+                                                                     variant == "hpcprof-mpi", variant == "hpcprof-threads",
+                                                                     numRanks=ranks, numThreads=threads,
+                                                                     mpiBin=configuration.get("profile.hpcprof.parallel.mpi path"),
+                                                                     products=[self.profOutpath])
+                self.output.add("run", "profiled", "hpcprof", "variant", variant)
+                self.output.add("run", "profiled", "hpcprof", "ranks",   ranks)
+                self.output.add("run", "profiled", "hpcprof", "threads", threads)
              
             # (4) TODO: open hpcviewer on experiment database (& get it to do something nontrivial, if possible)
             #           -- omplicated b/c hpcviewer is written in Java; need a VM and some kind of UI access (?)
@@ -133,11 +147,58 @@ class ProfileExperiment(Experiment):
             raise ExecuteFailed(msg)
 
 
+    def _chooseHpcprofVariant(self):    # returns (variant, numRanks, numThreads)
+
+        # serial hpcprof is used unless the measurements directory is large enough per config settings;
+        # then hpcprof-mpi is used if the test uses MPI and the HPCToolkit has it, else threaded hpcprof
+
+        import os
+        from os.path import join, isfile
+        import configuration
+        from common import sizeInBytes, verbosemsg
+
+        # measure the measurements directory
+        numFiles, numBytes = 0, 0
+        for dir, _, files in os.walk(self.runOutpath):
+            for f in files:
+                numFiles += 1
+                numBytes += os.path.getsize(join(dir, f))
+        self.output.add("run", "profiled", "hpcprof", "measurement files", numFiles)
+        self.output.add("run", "profiled", "hpcprof", "measurement bytes", numBytes)
+
+        # decide whether measurements warrant parallel processing
+        minFiles = configuration.get("profile.hpcprof.parallel.min files", 64)
+        minBytes = sizeInBytes(configuration.get("profile.hpcprof.parallel.min size", "256M"))
+        maxRanks = configuration.get("profile.hpcprof.parallel.ranks", 8)
+        maxThreads = configuration.get("profile.hpcprof.parallel.threads", 8)
+        if numFiles < minFiles and numBytes < minBytes:
+            return "hpcprof", 0, 0
+
+        # scale with the number of measurement files, within the configured budget
+        haveMPI = isfile(join(self.hpctoolkitBinPath, "hpcprof-mpi"))
+        if self.wantMPI and haveMPI and maxRanks > 1:
+            ranks = max(2, min(maxRanks, numFiles // max(minFiles, 1)))
+            variant, ranks, threads = "hpcprof-mpi", ranks, 0
+        elif maxThreads > 1:
+            threads = max(2, min(maxThreads, numFiles // max(minFiles, 1)))
+            variant, ranks, threads = "hpcprof-threads", 0, threads
+        else:
+            variant, ranks, threads = "hpcprof", 0, 0
+
+        verbosemsg("using {} for {} measurement files ({} bytes)".format(variant, numFiles, numBytes))
+        return variant, ranks, threads
+
+
     def check(self):
         
-        self._checkHpcrunExecution()
-        self._checkHpcstructExecution()
-        self._checkHpcprofExecution()
+        import spans
+        
+        with spans.span("hpcrun"):
+            self._checkHpcrunExecution()
+        with spans.span("hpcstruct"):
+            self._checkHpcstructExecution()
+        with spans.span("hpcprof"):
+            self._checkHpcprofExecution()
     
      
     def _checkHpcrunExecution(self):
@@ -180,8 +241,9 @@ class ProfileExperiment(Experiment):
         from common import debugmsg, errormsg
         from util.yaml import writeYamlFile
  
+        summedResultDict = "NA"
         status, msg = Experiment.checkDirExists("hpcrun log", self.runOutpath)
-        if status == 0:
+        if status == "OK":
               
             pattern = ( "SUMMARY: samples: D (recorded: D, blocked: D, errant: D, trolled: D, yielded: D),\n"
                         "         frames: D (trolled: D)\n"
@@ -212,7 +274,7 @@ class ProfileExperiment(Experiment):
             summedResultTuple = map(sum, zip(*scrapedResultTupleList))
             summedResultDict  = dict(zip(fieldNames, summedResultTuple))
             sumPath = self.output.makePath("hpcrun-summary.yaml")
-            writeYamlFile(sumPath, summedResultDict)
+            writeYamlFile(sumPath, summedResultDict, jsonSidecar=True)
             debugmsg("hpcrun summary = {}".format(summedResultDict))
              
         return summedResultDict
@@ -256,7 +318,7 @@ class ProfileExperiment(Experiment):
         from experiment import Experiment
 
         if self.profFailMsg:
-            status, msg = "FAILED", profFailMsg
+            status, msg = "FAILED", self.profFailMsg
         else:
             # check outputs from hpcprof...
             status, msg = "OK", None
@@ -0,0 +1,238 @@
+################################################################################
+#                                                                              #
+#  fingerprint.py                                                              #
+#  short stable identifiers for hpctoolkit installations and hosts             #
+#                                                                              #
+#  $HeadURL$                                                                   #
+#  $Id$                                                                        #
+#                                                                              #
+#  --------------------------------------------------------------------------- #
+#  Part of HPCToolkit (hpctoolkit.org)                                         #
+#                                                                              #
+#  Information about sources of support for research and development of        #
+#  HPCToolkit is at 'hpctoolkit.org' and in 'README.Acknowledgments'.          #
+#  --------------------------------------------------------------------------- #
+#                                                                              #
+#  Copyright ((c)) 2002-2017, Rice University                                  #
+#  All rights reserved.                                                        #
+#                                                                              #
+#  Redistribution and use in source and binary forms, with or without          #
+#  modification, are permitted provided that the following conditions are      #
+#  met:                                                                        #
+#                                                                              #
+#  * Redistributions of source code must retain the above copyright            #
+#    notice, this list of conditions and the following disclaimer.             #
+#                                                                              #
+#  * Redistributions in binary form must reproduce the above copyright         #
+#    notice, this list of conditions and the following disclaimer in the       #
+#    documentation and/or other materials provided with the distribution.      #
+#                                                                              #
+#  * Neither the name of Rice University (RICE) nor the names of its           #
+#    contributors may be used to endorse or promote products derived from      #
+#    this software without specific prior written permission.                  #
+#                                                                              #
+#  This software is provided by RICE and contributors "as is" and any          #
+#  express or implied warranties, including, but not limited to, the           #
+#  implied warranties of merchantability and fitness for a particular          #
+#  purpose are disclaimed. In no event shall RICE or contributors be           #
+#  liable for any direct, indirect, incidental, special, exemplary, or         #
+#  consequential damages (including, but not limited to, procurement of        #
+#  substitute goods or services; loss of use, data, or profits; or             #
+#  business interruption) however caused and on any theory of liability,       #
+#  whether in contract, strict liability, or tort (including negligence        #
+#  or otherwise) arising in any way out of the use of this software, even      #
+#  if advised of the possibility of such damage.                               #
+#                                                                              #
+################################################################################
+
+
+# A fingerprint identifies what was measured with, independent of where it was
+# installed or which node ran it, so results can be compared across studies.
+# Fingerprints are short hex strings; the same inputs always give the same one.
+
+
+_hpctkCache = dict()     # stat manifest digest => content fingerprint, for this process
+_hostCache  = None
+_specCache  = dict()     # spec string => concretized spec string or None, for this process
+
+
+def hpctoolkit(installPath):     # returns fingerprint string, or None if not an installation
+    
+    # Content hash of the installation's executables and libraries. Hashing a whole
+    # installation is slow, so results are remembered keyed by a digest of the files'
+    # names, sizes and mtimes, both in memory and in .hpctest/fingerprints.yaml.
+    
+    import hashlib
+    
+    files = _hpctoolkitFiles(installPath)
+    if not files: return None
+    
+    manifest = hashlib.sha1()
+    for relpath, path, st in files:
+        manifest.update("{}\0{}\0{}\n".format(relpath, st.st_size, st.st_mtime))
+    key = manifest.hexdigest()
+    
+    if key not in _hpctkCache:
+        saved = _readSaved()
+        if key in saved:
+            _hpctkCache[key] = saved[key]
+        else:
+            content = hashlib.sha1()
+            for relpath, path, st in files:
+                content.update(relpath + "\0")
+                with open(path, "rb") as f:
+                    for block in iter(lambda: f.read(1 << 20), b""):
+                        content.update(block)
+            _hpctkCache[key] = content.hexdigest()[:12]
+            _writeSaved(key, _hpctkCache[key])
+    
+    return _hpctkCache[key]
+
+
+def host():     # returns (fingerprint, description dict)
+    
+    # Identifies the kind of machine rather than the node, so that runs on
+    # different nodes of one cluster partition share a fingerprint.
+    
+    import hashlib, platform
+    from collections import OrderedDict
+    
+    global _hostCache
+    
+    if not _hostCache:
+        desc = OrderedDict()
+        desc["name"]    = platform.node()
+        desc["machine"] = platform.machine()
+        desc["cpu"]     = _cpuModel()
+        desc["cpus"]    = _cpuCount()
+        desc["os"]      = "{} {}".format(platform.system(), platform.release())
+        desc["libc"]    = " ".join(platform.libc_ver()).strip()
+        
+        key = "\0".join(str(desc[k]) for k in ["machine", "cpu", "cpus", "os", "libc"])
+        _hostCache = (hashlib.sha1(key).hexdigest()[:12], desc)
+    
+    return _hostCache
+
+
+def inputs(test, build, hpctkPath, profile, resolved=None):     # returns fingerprint string, or None if an input can't be identified
+    
+    # Identifies everything a run's results depend on: the test's content, the concrete
+    # build, the hpctoolkit binaries, the profiling params, and the kind of host. A run
+    # with the same fingerprint as an earlier passing run would measure the same thing.
+    # 'resolved' is (hpctoolkit fingerprint, concrete spec) if already known.
+    
+    import hashlib
+    
+    if resolved:
+        hpctk, spec = resolved
+    else:
+        spec  = test.spackSpec(build) if test.prebuilt() else concreteSpec(test.spackSpec(build))
+        hpctk = hpctoolkit(hpctkPath)
+    if not hpctk or not spec: return None
+    
+    parts = [ test.relpath(), test.checksum(), spec, hpctk,
+              profile.hpcrun, profile.hpcstruct, profile.hpcprof, host()[0] ]
+    return hashlib.sha1("\0".join(str(p) for p in parts)).hexdigest()[:12]
+
+
+def concreteSpec(specString):     # returns concretized spec string, or None if Spack can't concretize it
+    
+    import spackle
+    
+    if specString not in _specCache:
+        try:
+            _specCache[specString] = spackle.specConcretized(specString)
+        except Exception:
+            _specCache[specString] = None
+    
+    return _specCache[specString]
+
+
+#-------------------#
+# Private functions #
+#-------------------#
+
+def _hpctoolkitFiles(installPath):     # returns sorted list of (relpath, path, stat)
+    
+    import os
+    from os.path import isdir, isfile, join, realpath, relpath
+    
+    # 'installPath' may be the install dir or its 'bin' subdir
+    installPath = realpath(installPath)
+    if not isdir(join(installPath, "bin")) and isfile(join(installPath, "hpcrun")):
+        installPath = realpath(join(installPath, ".."))
+    
+    files = []
+    for subdir in ["bin", "lib", "libexec"]:
+        for dir, dirnames, filenames in os.walk(join(installPath, subdir)):
+            dirnames.sort()
+            for name in sorted(filenames):
+                path = join(dir, name)
+                if isfile(path):
+                    files.append( (relpath(path, installPath), path, os.stat(path)) )
+    
+    return files
+
+
+def _savedPath():
+    
+    from os.path import join
+    import common
+    return join(common.homepath, ".hpctest", "fingerprints.yaml")
+
+
+def _readSaved():
+    
+    from os.path import isfile
+    from util.yaml import readYamlFile
+    
+    path = _savedPath()
+    if not isfile(path): return dict()
+    saved, error = readYamlFile(path)
+    return saved if not error and isinstance(saved, dict) else dict()
+
+
+def _writeSaved(key, fingerprint):
+    
+    # best effort: concurrent runs may race here, costing only a recomputation
+    # ... rename from a per-process temp file so readers never see a partly written file
+    
+    from os import getpid, remove, rename
+    from util.yaml import writeYamlFile
+    
+    path    = _savedPath()
+    tmpPath = "{}.{}.tmp".format(path, getpid())
+    saved   = _readSaved()
+    saved[key] = fingerprint
+    try:
+        writeYamlFile(tmpPath, saved)
+        rename(tmpPath, path)
+    except (IOError, OSError):
+        try:
+            remove(tmpPath)
+        except OSError:
+            pass
+
+
+def _cpuModel():
+    
+    import platform
+    
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name") or line.startswith("cpu\t"):
+                    return line.split(":", 1)[1].strip()
+    except IOError:
+        pass
+    return platform.processor()
+
+
+def _cpuCount():
+    
+    import multiprocessing
+    
+    try:
+        return multiprocessing.cpu_count()
+    except NotImplementedError:
+        return None
@@ -74,17 +74,40 @@ Usage:
           [--report REPORTSPEC]
           [--sort SORTSPEC]
           [--background] [--foreground] [--batch] [--immediate]
+          [--watch]
+          [--resume] [--rerun-failed] [--rerun-status STATUSES] [--incremental]
+          [--pack NODES] [--shard SHARD]
   hpctest report [options] [PATH]
           [--which WHICHSPEC]
           [--sort SORTSPEC]
+          [--watch]
+          [--pivot PIVOTSPEC] [--metric METRIC] [--aggregate AGGREGATE] [--export FILE]
+          [--timing] [--timeline FILE]
   hpctest clean [options]
           [--studies]
+          [--raw]
+          [--older-than DAYS]
+          [--keep-failed]
           [--built]
           [--dependencies]
           [--all]
+  hpctest unpack [options] PATH
+  hpctest compare [options] STUDY STUDY
+  hpctest merge [options] STUDY ... [--study PATH] [--report REPORTSPEC] [--sort SORTSPEC]
+  hpctest history [options] ingest [STUDY ...]
+  hpctest history [options] durations FILE
+  hpctest history [options] (trend | changes)
+          [--test TESTSPEC]
+          [--build BUILDSPEC]
+          [--profile PROFILESPEC]
+          [--host HOST]
+          [--last N]
+  hpctest benchmark [options] (yaml | startup | harness) [--runs N]
+  hpctest worker [options] [--study PATH] [--cores N]
   hpctest spack [options] SPACKCMD ...
   hpctest selftest [options] ( all | [TESTSPEC...] ) [--study PATH]
-  hpctest _runOne [options] ENCODED_ARGS
+  hpctest _runOne [options] MANIFEST
+  hpctest _pack [options] PACKLIST
   hpctest (--help | --version)
   
 """
@@ -134,7 +157,19 @@ HPCTest accepts a number of subcommands on its command line. The 'run' subcomman
 conducts a study using given dimension specs, while 'build' just builds the tests
 and 'debug' runs each test in the debugger. The 'report' subcommand prints a
 report from an existing study directory, and the 'clean' command removes unwanted
-study directories, and several minor commands carry out utility operations.
+study directories or their raw results. The 'unpack' subcommand extracts raw
+results archived by the 'run.archive' config setting, which must be done before
+other tools read them ('run --resume' extracts what it needs). The 'compare' subcommand
+compares two studies point by point and exits with nonzero status if the second
+shows regressions beyond thresholds in config.yaml. The 'merge' subcommand
+combines studies, such as the shards of a matrix run by '--shard', into a new
+study and reports on it. The 'history' subcommand keeps results of all studies
+in a warehouse and shows per-configuration trends across studies and hpctoolkit
+builds, and writes the mean durations that 'run --shard' can balance by.
+The 'benchmark' subcommand measures hpctest's own overheads. The 'worker' subcommand runs the jobs of a study whose
+runs were queued by config.batch.manager FileQueue, and may be started any number
+of times on any nodes that share the study directory. Several minor commands
+carry out utility operations.
 
 Options: Informational
   -q, --quiet             Print as little as reasonable.
@@ -159,6 +194,28 @@ Options: Testing
   -o, --study STUDYPATH
             If given, create the study directory at the specified path. Otherwise
             the default is to create it inside the hpctest/work directory.
+      --resume
+            Continue the existing study given by '--study' (default: the most
+            recent study) with the same dimension specs, skipping runs that
+            finished and resuming interrupted ones after their last completed
+            phase. Assumes none of the study's runs is still in progress.
+      --rerun-failed
+            Like '--resume', and also rerun failed runs from their failed phase.
+      --rerun-status STATUSES
+            Like '--resume', and also rerun runs whose status is in STATUSES.
+      --incremental
+            Don't repeat a run whose inputs (test files, concrete build spec,
+            HPCToolkit binaries, profile options, and kind of host) are the same
+            as those of a passing run in the results history; carry that run's
+            results forward into the new study instead.
+      --pack NODES
+            Submit one batch job holding NODES nodes and run all the study's runs
+            inside it, each on cores of its own and as many at once as fit,
+            instead of submitting a job per run. Implies '--batch'.
+      --shard SHARD
+            Run only shard i of the matrix split into N shards, given as i/N.
+            Every shard computes the same split, so shards can run on separate
+            machines and be combined by 'hpctest merge'. See config 'run.shard by'.
   -V, --version
             Print this hpctest's version number.
 
@@ -167,10 +224,42 @@ Options: Reporting
             Print only the specified subset of test results.
   -S, --sort SORTSPEC
             Print the test results sorted by each specified field in turn.
+      --watch
+            While the study runs, periodically print counts of passed, failed,
+            running, and pending runs, an ETA, new failures, and the worst
+            overheads so far. With 'run', applies to batch execution.
+      --pivot PIVOTSPEC
+            Print a grid of one metric aggregated over two dimensions
+            instead of one entry per run.
+      --metric METRIC
+            Metric for '--pivot': overhead (default), cputime, samples, or errant%.
+      --aggregate AGGREGATE
+            Aggregation for '--pivot': median (default), mean, max, or failures.
+      --export FILE
+            Also write the '--pivot' grid to FILE, in CSV or JSON by its extension.
+      --timing
+            Print where the study's time went instead of one entry per run:
+            wall-clock and cpu time of each phase of the runs, eg staging, Spack
+            commands, test executions, and checks, summed over all runs; then
+            the same for the driver's own work, eg Spack setup. Runs carried
+            forward from earlier studies are left out.
+      --timeline FILE
+            Write the study's runs over time to FILE as a Chrome trace, for
+            ui.perfetto.dev or chrome://tracing: a track per host or queue worker
+            and slot, each run's phases, and each batch run's wait in the queue.
 
 Options: Cleaning
   -s, --studies
             Remove all study directories from hpctest/work.
+  -r, --raw
+            Remove raw measurements, databases, and archives from all study
+            directories, keeping each run's OUT.yaml and other small outputs.
+            With either option, a study is kept whole if a remaining study has
+            runs carried forward from it.
+      --older-than DAYS
+            Only clean studies older than DAYS days.
+      --keep-failed
+            Don't clean runs that failed.
   -B, --built
             Remove all built test executables, not including their dependencies.
   -d, --dependencies
@@ -178,12 +267,33 @@ Options: Cleaning
   -f, --force
             Don't ask for confirmation, just remove the specified objects.
 
+Options: History
+      --host HOST
+            Only show results from hosts whose name or fingerprint matches HOST.
+      --last N
+            Only consider results from the N most recent studies.
+
+Options: Workers
+      --cores N
+            Number of cores for the worker's runs (default: all of this node's).
+            Without '--study', takes jobs from the most recent study.
+
+Options: Benchmarking
+      --runs N
+            Number of synthetic run results for 'benchmark yaml' (default 10000),
+            of runs of each command for 'benchmark startup' (default 10),
+            or of synthetic tests run by 'benchmark harness' (default 100).
+
 Arguments:        All lists are comma separated.
   BUILDSPEC       list of Spack specs minus package names, eg '%gcc@4.4.7'
   HPCTKSPEC       list of paths with wildcards pointing to hpctoolkit/install dirs
+  PIVOTSPEC       two dimensions for rows and columns, eg 'tests,hpctoolkit'
   PROFILESPEC     list of colon-separated arguments to hpcrun:hpcstruct:hpcprof
+  SHARD           shard number and number of shards, eg '2/5'
   SORTSPEC        list of dimensions ('tests'/'build'/'profile'/'hpctoolkit')
   SPACKCMD        subcommand for Spack, eg 'install openmpi'
+  STATUSES        list of run statuses as in reports, eg 'BUILD FAILED,EXECUTE FAILED'
+  STUDY           path to a study directory, absolute or relative to hpctest/work
   STUDYPATH       path with wildcards, absolute or relative to hpctest/work
   TESTSPEC        list of paths with wildcards relative to hpctest/tests
   WHICHSPEC       one of 'all', 'pass', or 'fail'
@@ -203,9 +313,34 @@ Examples:
           --profile "REALTIME@10000, REALTIME@1000, REALTIME@100"  \\
           --study ~/mystudies/june/trial_12
   
+  hpctest run all --study study-2020-06-01--18-29-59 --rerun-failed
+  hpctest run all --incremental
+  hpctest run unit-test/* --pack 2
+  
   hpctest report --study study-2020-06-01--18-29-59 --which fail --sort build
   
+  hpctest report --watch
+  hpctest report --pivot hpctoolkit,build --metric overhead --aggregate mean
+  hpctest report --timing
+  hpctest report --timeline timeline.json
+  
+  hpctest benchmark startup
+  hpctest benchmark harness --runs 10000
+  
+  hpctest worker --study study-2020-06-01--18-29-59 --cores 16
+  
   hpctest clean --all -f
+  hpctest clean --raw --older-than 30 --keep-failed
+  
+  hpctest compare study-2020-06-01--18-29-59 study-2020-06-02--18-30-12
+  
+  hpctest run all --shard 1/4 --study ~/ci/shard-1
+  hpctest merge ~/ci/shard-*/study-* --study ~/ci/all
+  
+  hpctest history ingest
+  hpctest history durations ~/ci/durations.json
+  hpctest history trend --test app/amgmk --last 30
+  hpctest history changes --profile "REALTIME*"
   
 """
 
@@ -0,0 +1,293 @@
+################################################################################
+#                                                                              #
+#  history.py                                                                  #
+#  cross-study warehouse of run results for trend queries                      #
+#                                                                              #
+#  $HeadURL$                                                                   #
+#  $Id$                                                                        #
+#                                                                              #
+#  --------------------------------------------------------------------------- #
+#  Part of HPCToolkit (hpctoolkit.org)                                         #
+#                                                                              #
+#  Information about sources of support for research and development of        #
+#  HPCToolkit is at 'hpctoolkit.org' and in 'README.Acknowledgments'.          #
+#  --------------------------------------------------------------------------- #
+#                                                                              #
+#  Copyright ((c)) 2002-2017, Rice University                                  #
+#  All rights reserved.                                                        #
+#                                                                              #
+#  Redistribution and use in source and binary forms, with or without          #
+#  modification, are permitted provided that the following conditions are      #
+#  met:                                                                        #
+#                                                                              #
+#  * Redistributions of source code must retain the above copyright            #
+#    notice, this list of conditions and the following disclaimer.             #
+#                                                                              #
+#  * Redistributions in binary form must reproduce the above copyright         #
+#    notice, this list of conditions and the following disclaimer in the       #
+#    documentation and/or other materials provided with the distribution.      #
+#                                                                              #
+#  * Neither the name of Rice University (RICE) nor the names of its           #
+#    contributors may be used to endorse or promote products derived from      #
+#    this software without specific prior written permission.                  #
+#                                                                              #
+#  This software is provided by RICE and contributors "as is" and any          #
+#  express or implied warranties, including, but not limited to, the           #
+#  implied warranties of merchantability and fitness for a particular          #
+#  purpose are disclaimed. In no event shall RICE or contributors be           #
+#  liable for any direct, indirect, incidental, special, exemplary, or         #
+#  consequential damages (including, but not limited to, procurement of        #
+#  substitute goods or services; loss of use, data, or profits; or             #
+#  business interruption) however caused and on any theory of liability,       #
+#  whether in contract, strict liability, or tort (including negligence        #
+#  or otherwise) arising in any way out of the use of this software, even      #
+#  if advised of the possibility of such damage.                               #
+#                                                                              #
+################################################################################
+
+
+class History(object):
+
+    # An append-only record of run results from all studies, kept in .hpctest so it
+    # outlives cleaned study directories. Rows are ingested from each study's index
+    # and are never updated; a run already ingested is skipped if seen again, as is
+    # a run carried forward from an earlier study, whose results are already here.
+    #
+    # A "configuration" is a (test, build spec, profile params, host fingerprint) tuple;
+    # its results over time, across hpctoolkit builds, make up one time series.
+
+    _filename      = "history.sqlite"
+    _schemaVersion = 2
+
+    # columns copied from a study index row, plus columns added here
+    _indexColumns = [ "date", "test", "buildSpec", "hpctoolkit", "hpctkFingerprint", "hpcrunParams",
+                      "hostFingerprint", "host", "status", "statusMsg", "elapsedTime",
+                      "normalTime", "profiledTime", "overheadPercent", "samples", "inputFingerprint" ]
+    _columns = [ "study", "run", "ingested" ] + _indexColumns
+
+    configColumns = [ "test", "buildSpec", "hpcrunParams", "hostFingerprint" ]
+
+    # filter names => columns they match by glob pattern
+    filterColumns = { "tests":   ["test"],
+                      "build":   ["buildSpec"],
+                      "profile": ["hpcrunParams"],
+                      "host":    ["host", "hostFingerprint"],
+                    }
+
+
+    def __init__(self, path=None):
+
+        from os.path import join
+        import common
+
+        self.path = path if path else join(common.homepath, ".hpctest", History._filename)
+        self.conn = None
+
+
+    def ingest(self, study):     # returns number of runs added
+
+        import time
+
+        index = study.index()
+        index.refresh()
+        rows = [ row for row in index.select("all") if row["status"] is not None and not row["carriedFrom"] ]
+
+        sql = "INSERT OR IGNORE INTO runs ({}) VALUES ({})".format(
+                    ", ".join(History._columns), ", ".join("?" * len(History._columns)))
+        now = time.time()
+        with self._connection() as conn:
+            before = conn.total_changes
+            for row in rows:
+                conn.execute(sql, [study.path, row["run"], now] + [ row[name] for name in History._indexColumns ])
+            added = conn.total_changes - before
+
+        return added
+
+
+    def trend(self, filters=dict(), lastN=None):     # returns list of (config, rows, summary)
+
+        # per-configuration time series of status and overhead, oldest first
+
+        from stats import mean
+
+        series = []
+        for config, rows in self._seriesByConfig(filters, lastN):
+            overheads = [ r["overheadPercent"] for r in rows if r["overheadPercent"] is not None ]
+            passed    = sum(1 for r in rows if r["status"] == "OK")
+            summary = { "runs":          len(rows),
+                        "passed":        passed,
+                        "pass rate":     100.0 * passed / len(rows),
+                        "overhead mean": mean(overheads),
+                        "overhead last": overheads[-1] if overheads else None,
+                      }
+            series.append( (config, rows, summary) )
+
+        return series
+
+
+    def changePoints(self, filters=dict(), lastN=None, minJump=None, maxP=None):     # returns list of dicts
+
+        # Flag configurations whose mean overhead jumps between consecutive hpctoolkit
+        # builds, taken in order of each build's first appearance. A jump is flagged if
+        # it is at least 'minJump' percentage points and, when both builds have two or
+        # more runs, Welch's t-test gives p <= 'maxP'.
+
+        from collections import OrderedDict
+        import configuration
+        from stats import mean, welch
+
+        if minJump is None: minJump = float(configuration.get("history.change threshold", 5.0))
+        if maxP    is None: maxP    = float(configuration.get("history.change significance", 0.05))
+
+        changes = []
+        for config, rows in self._seriesByConfig(filters, lastN):
+
+            builds = OrderedDict()     # fingerprint => overheads, in order of first appearance
+            for r in rows:
+                if r["status"] == "OK" and r["overheadPercent"] is not None:
+                    builds.setdefault(r["hpctkFingerprint"], []).append(r["overheadPercent"])
+            builds = builds.items()
+
+            for (beforeFP, before), (afterFP, after) in zip(builds, builds[1:]):
+                jump = mean(after) - mean(before)
+                test = welch(before, after)
+                p    = test[2] if test else None
+                if abs(jump) >= minJump and (p is None or p <= maxP):
+                    changes.append( { "config":      config,
+                                      "from build":  beforeFP,
+                                      "to build":    afterFP,
+                                      "before":      mean(before),
+                                      "after":       mean(after),
+                                      "jump":        jump,
+                                      "p":           p,
+                                    } )
+
+        return changes
+
+
+    def lastPassing(self, fingerprints):     # returns dict: input fingerprint => run dir
+
+        # most recent passing run for each of 'fingerprints' whose results are still on disk
+
+        from os.path import isfile, join
+
+        wanted = set(fingerprints)
+        found  = dict()
+        for row in self._connection().execute("SELECT inputFingerprint, study, run FROM runs "
+                                              "WHERE status = 'OK' AND inputFingerprint IS NOT NULL "
+                                              "ORDER BY date DESC"):
+            fp, rundir = str(row[0]), str(join(row[1], row[2]))
+            if fp in wanted and fp not in found and isfile(join(rundir, "OUT", "OUT.yaml")):
+                found[fp] = rundir
+
+        return found
+
+
+    def meanDurations(self):     # returns dict: (test, build spec, hpcrun params) or test => mean elapsed time
+
+        durations = dict()
+        conn = self._connection()
+        for row in conn.execute("SELECT test, buildSpec, hpcrunParams, AVG(elapsedTime) FROM runs "
+                                "WHERE status = 'OK' GROUP BY test, buildSpec, hpcrunParams"):
+            durations[ tuple(row[:3]) ] = row[3]
+        for row in conn.execute("SELECT test, AVG(elapsedTime) FROM runs WHERE status = 'OK' GROUP BY test"):
+            durations[ row[0] ] = row[1]
+
+        return durations
+
+
+    def writeDurations(self, path):     # returns number of configurations written
+
+        # save 'meanDurations' to a file, so that every shard of a matrix partitions it alike
+
+        from collections import OrderedDict
+        from util.yaml import writeJsonFile
+
+        durations = self.meanDurations()
+        content = OrderedDict()
+        content["runs"]  = sorted( list(key) + [value] for key, value in durations.items() if isinstance(key, tuple) )
+        content["tests"] = OrderedDict(sorted( (key, value) for key, value in durations.items() if not isinstance(key, tuple) ))
+        writeJsonFile(path, content)
+
+        return len(content["runs"])
+
+
+    @classmethod
+    def readDurations(cls, path):     # returns dict as from 'meanDurations'; raises IOError, OSError, ValueError, KeyError, TypeError
+
+        from util.yaml import readJsonFile
+
+        content   = readJsonFile(path)
+        durations = dict( (tuple(run[:3]), run[3]) for run in content["runs"] )
+        durations.update(content["tests"])
+
+        return durations
+
+
+    def close(self):
+
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+
+
+    #-----------------#
+    # Private methods #
+    #-----------------#
+
+    def _seriesByConfig(self, filters, lastN):     # returns list of (config tuple, rows oldest first)
+
+        # 'filters' maps names in 'filterColumns' to glob patterns;
+        # 'lastN' limits each series to the results of the N most recent studies
+
+        clauses, params = [], []
+        for name, pattern in filters.items():
+            if pattern:
+                columns = History.filterColumns[name]
+                clauses.append( "(" + " OR ".join("{} GLOB ?".format(c) for c in columns) + ")" )
+                params += [pattern] * len(columns)
+        if lastN:
+            clauses.append("study IN (SELECT study FROM runs GROUP BY study ORDER BY MAX(date) DESC LIMIT ?)")
+            params.append(int(lastN))
+
+        order = History.configColumns + ["date", "study", "run"]
+        sql = "SELECT * FROM runs"
+        if clauses: sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY " + ", ".join(order)
+
+        series = []
+        for row in self._connection().execute(sql, params):
+            config = tuple( row[c] for c in History.configColumns )
+            if not series or series[-1][0] != config:
+                series.append( (config, []) )
+            series[-1][1].append(row)
+
+        return series
+
+
+    def _connection(self):
+
+        import sqlite3
+
+        if not self.conn:
+
+            self.conn = sqlite3.connect(self.path, timeout=120)
+            self.conn.row_factory = sqlite3.Row
+
+            # make table if new history, or add columns if from an older hpctest version;
+            # unlike a study index, history can't be rebuilt so is never dropped
+            version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+            if version != History._schemaVersion:
+                with self.conn:
+                    self.conn.execute("CREATE TABLE IF NOT EXISTS runs ({}, PRIMARY KEY (study, run))".format(
+                        ", ".join(History._columns)))
+                    existing = [ row[1] for row in self.conn.execute("PRAGMA table_info(runs)") ]
+                    for name in History._columns:
+                        if name not in existing:
+                            self.conn.execute("ALTER TABLE runs ADD COLUMN {}".format(name))
+                    self.conn.execute("CREATE INDEX IF NOT EXISTS byConfig ON runs ({}, date)".format(
+                        ", ".join(History.configColumns)))
+                    self.conn.execute("CREATE INDEX IF NOT EXISTS byInputs ON runs (inputFingerprint)")
+                    self.conn.execute("PRAGMA user_version = {}".format(History._schemaVersion))
+
+        return self.conn
@@ -65,121 +65,207 @@ class HPCTest(object):
 
     def __init__(self):
         
-        global dimNames, dimDefaultMap, dimClassMap
+        # Spack, config, etc are set up by each subcommand as needed, see 'services'
+        
+        global dimNames, dimClassMap
 
-        from common import infomsg, warnmsg, errormsg
         from dimension import TestDim, BuildDim, HPCTkitDim, ProfileDim
-        import spackle
-                
-        # set up internal Spack
-        spackle.initSpack()
-
-        if not common.hpctk_default:
-            warnmsg("no default HPCToolkit specified for profiling.\n"
-                    "\n"
-                    "To run profiling tests, specify '--hpctookit <path to install directory>' on each 'hpctest run' command line.\n"
-                    "To avoid specifying '--hpctoolkit' every time, do one of the following:\n"
-                    "- edit hpctest/config.yaml and set profile.hpctoolkit.path to desired default HPCToolkit install directory\n"
-                    "- or ensure that an HPCToolkit bin directory is on your $PATH.\n"
-                    "\n"
-                    )
-        
-        # dimension info (requires paths and config to be set up)
+        
+        # dimension info; defaults are found when needed b/c they require config to be set up
         dimClasses    = [ TestDim, BuildDim, HPCTkitDim, ProfileDim ]
         dimNames      = [ dim.name()                  for dim in dimClasses ]
         dimClassMap   = { dim.name() : dim            for dim in dimClasses }
-        dimDefaultMap = { dim.name() : dim.default()  for dim in dimClasses }
 
 
     def init(self):
     
-        # all the necessary work is done in __init__, so nothing here
-        pass
+        # setting up is all done by services, so just request them
+        
+        import services
+        services.spack()
+        services.hpctoolkit()
 
         
-    def run(self, argDimSpecs=dict(), numrepeats=1, reportspec="", sortKeys=[], studyPath=None, wantBatch=False):
+    def run(self, argDimSpecs=dict(), numrepeats=1, reportspec="", sortKeys=[], studyPath=None, wantBatch=False, wantWatch=False,
+            resume=False, rerunFailed=False, rerunStatuses=[], incremental=False, packNodes=None, shard=None):
         
         import common
         import configuration
+        import services
+        import spans
         from executor   import Executor
         from study      import Study
         from iterate    import Iterate
         from report     import Report
-        global dimNames, dimDefaultMap, dimClassMap
+        global dimNames, dimClassMap
+        
+        # where the driver's own time goes is recorded in the study, see 'spans'
+        spans.begin()
+        
+        with spans.span("setup"):
+            services.workArea()
+            services.hpctoolkit()
                 
-        # decode the dict of spec strings into a complete dict of dimension objects
-        # with default dims for missing specs
-        dims = dict()
-        for name in dimNames:
-            spec = argDimSpecs[name] if name in argDimSpecs else dimDefaultMap[name]
-            dims[name] = dimClassMap[name](spec)
+            # decode the dict of spec strings into a complete dict of dimension objects
+            # with default dims for missing specs
+            dims = dict()
+            for name in dimNames:
+                spec = argDimSpecs[name] if name in argDimSpecs else dimClassMap[name].default()
+                dims[name] = dimClassMap[name](spec)
+        
+        # Spack is needed only to build tests, so not for synthetic ones
+        if not all(test.prebuilt() for test in dims["tests"]):
+            with spans.span("spack setup"):
+                services.spack()
             
         # check preconditions and run tests if ok
         # FIXME: 'dims["hpctoolkit"]' does not test whether any paths were specified!!
         if dims["hpctoolkit"]:      # TODO: shouldn't require an HPCToolkit if no test wants profiling
             
-            # run all the tests
-            study = Study(studyPath if studyPath else common.workpath)
-            if wantBatch is None:
+            # run all the tests, in an existing study if resuming
+            if resume:
+                study = self._studyForReport(studyPath)
+                if not study: return
+            else:
+                study = Study(studyPath if studyPath else common.workpath)
+            if packNodes:
+                wantBatch = True
+            elif wantBatch is None:
                 wantBatch = Executor.defaultToBackground()
-            Iterate.doForAll(dims, numrepeats, study, wantBatch)
+            with spans.span("runs"):
+                Iterate.doForAll(dims, numrepeats, study, wantBatch, wantWatch, resume, rerunFailed, rerunStatuses,
+                                 incremental, packNodes, shard)
             print
             
             # report results
             if not common.args["build"]:
-                reporter = Report()
-                reporter.printReport(study, reportspec, sortKeys if len(sortKeys) else argDimSpecs.keys())
+                with spans.span("report"):
+                    reporter = Report()
+                    reporter.printReport(study, reportspec, sortKeys if len(sortKeys) else argDimSpecs.keys())
+                if configuration.get("history.auto ingest", True):
+                    with spans.span("history"):
+                        self._ingestHistory(study)
             else:
                 print
                 print "building complete."
+            study.addDriverSpans(spans.end())
         else:
             errormsg("no --hpctoolkit paths given and no default hpctoolkit is set")
          
         
     def report(self, studypath, reportspec="", sortKeys=[]):
         
-        from os         import listdir
-        from os.path    import join, isabs
-        from common     import workpath, errormsg
         from report     import Report
-        from study      import Study
 
-        if not studypath:
-            studies   = sorted(listdir(workpath), reverse=True)
-            studypath = join(workpath, studies[0]) if len(studies) else None
-        if studypath:
-            if not isabs(studypath):
-                studypath = join(workpath, studypath)
-            if Study.isStudyDir(studypath):
-                reporter  = Report()
-                reporter.printReport(Study(studypath), reportspec, sortKeys)
-            else:
-                errormsg("path does not point to a study directory: {}".format(studypath))
-        else:
-            errormsg("no study to report on")
+        study = self._studyForReport(studypath)
+        if study:
+            reporter  = Report()
+            reporter.printReport(study, reportspec, sortKeys)
             
 
 
-    def clean(self, studies, tests, dependencies):
+    def timing(self, studypath, reportspec=""):
+        
+        from report     import Report
+
+        study = self._studyForReport(studypath)
+        if study:
+            Report().printTiming(study, reportspec)
+
+
+    def timeline(self, studypath, reportspec, exportPath):
+        
+        from report     import Report
+
+        study = self._studyForReport(studypath)
+        if study:
+            Report().exportTimeline(study, reportspec, exportPath)
+
+
+    def watch(self, studypath, reportspec="", sortKeys=[]):
+        
+        # follow a study's progress until it finishes, then report as usual
+        
+        import configuration
+        from report     import Report
+        from watch      import Watch
+        
+        study = self._studyForReport(studypath)
+        if study:
+            Watch(study).watch(float(configuration.get("report.watch interval", 60)))
+            Report().printReport(study, reportspec, sortKeys)
+    
+    
+    def pivot(self, studypath, whichspec, pivotDims, metric, aggregate, exportPath=None):
+        
+        from common     import errormsg
+        from pivot      import Pivot
+        from report     import Report
+        from studyIndex import StudyIndex
+        
+        if len(pivotDims) != 2 or not all(dim in StudyIndex.dimColumns for dim in pivotDims) or pivotDims[0] == pivotDims[1]:
+            errormsg("'--pivot' requires two different dimensions from {}".format(", ".join(sorted(StudyIndex.dimColumns))))
+        elif metric not in Pivot.metrics:
+            errormsg("unknown metric for '--pivot': '{}'".format(metric))
+        elif aggregate not in Pivot.aggregates:
+            errormsg("unknown aggregate for '--pivot': '{}'".format(aggregate))
+        else:
+            study = self._studyForReport(studypath)
+            if study:
+                Report().printPivot(study, whichspec, pivotDims[0], pivotDims[1], metric, aggregate, exportPath)
+            
+
+    def clean(self, studies, tests, dependencies, raw=False, olderThan=None, keepFailed=False):
         
         from os        import listdir
-        from os.path   import join
+        from os.path   import isdir, join, realpath
         import spackle        
         import common
-        from common    import options, yesno, verbosemsg, debugmsg, workpath
+        import services
+        from common    import options, yesno, infomsg, verbosemsg, debugmsg, workpath
         from study     import Study                                      
+        
+        if tests or dependencies:
+            services.spack()
 
         def confirm(what, to_what):
             ask    = "really {} all {}?".format(what, to_what)
             cancel = "ok, did not {} them".format(what)
             return ("force" in options) or yesno(ask, cancel)
+        
+        # retention policy for studies
+        qualifier  = " older than {} days".format(olderThan) if olderThan is not None else ""
+        qualifier += " except failed runs" if keepFailed else ""
+        def chosenStudies():
+            allStudies = [ Study(join(workpath, name)) for name in (sorted(listdir(workpath)) if isdir(workpath) else [])
+                                                       if Study.isStudyDir(join(workpath, name)) ]
+            chosen = [ study for study in allStudies if olderThan is None or study.age() > olderThan ]
+            # ... keep studies whose products are still used by carried-forward runs in studies that stay
+            # ... (with '--raw' every study stays, and so do referring studies kept by this rule)
+            carriedFrom = dict( (realpath(study.path), study.carriedFromStudies()) for study in allStudies )
+            kept = set( realpath(study.path) for study in allStudies if (raw and not studies) or study not in chosen )
+            while True:
+                referenced = set( ref for path in kept for ref in carriedFrom.get(path, ()) if ref != path )
+                if referenced <= kept: break
+                kept |= referenced
+            for study in chosen:
+                if realpath(study.path) in referenced:
+                    verbosemsg("  kept {}, whose results other studies carried forward".format(study.path))
+                else:
+                    yield study
             
         # delete studies if desired
-        if studies and confirm("delete", "study directories"):
-            for name in listdir(workpath):
-                path = join(workpath, name)
-                if Study.isStudyDir(path): Study(path).clean()
-            infomsg("deleted all study directories")
+        if studies and confirm("delete", "study directories" + qualifier):
+            for study in chosenStudies():
+                study.clean(keepFailed)
+            infomsg("deleted all study directories" + qualifier)
+        
+        # delete raw measurements and databases but keep summaries if desired
+        if raw and not studies and confirm("delete", "raw measurements in study directories" + qualifier):
+            for study in chosenStudies():
+                count = study.cleanRaw(keepFailed)
+                verbosemsg("  removed raw results of {} runs in {}".format(count, study.path))
+            infomsg("deleted all raw measurements" + qualifier)
         
         # uninstall tests if desired
         # BUG: "builtin" tests won't be uninstalled: not in 'tests' namespace,
@@ -197,20 +283,204 @@ class HPCTest(object):
             infomsg("uninstalled all built dependencies")
 
     
+    def unpack(self, path):
+        
+        # extract all archived raw results in a study, run, or OUT directory
+        
+        import os
+        from os.path import join, isabs, isdir
+        from common    import workpath, infomsg, verbosemsg, errormsg
+        import archiving
+        
+        if not isabs(path):
+            path = join(workpath, path)
+        if not isdir(path):
+            errormsg("path does not point to a directory: {}".format(path))
+            return
+        
+        count = 0
+        for dir, _, files in os.walk(path):
+            for name in files:
+                if archiving.isArchive(name):
+                    archivePath = join(dir, name)
+                    archiving.unpack(archivePath, dir)
+                    os.remove(archivePath)
+                    verbosemsg("  unpacked {}".format(archivePath))
+                    count += 1
+        infomsg("unpacked {} archives".format(count))
+
+    
+    def compare(self, studyPathA, studyPathB):     # returns number of regressions
+        
+        from os.path    import join, isabs
+        from common     import workpath, errormsg
+        from compare    import Comparison
+        from study      import Study
+        
+        studies = []
+        for path in studyPathA, studyPathB:
+            if not isabs(path):
+                path = join(workpath, path)
+            if not Study.isStudyDir(path):
+                errormsg("path does not point to a study directory: {}".format(path))
+                return 1
+            studies.append(Study(path))
+        
+        return Comparison(*studies).printComparison()
+    
+    
+    def merge(self, studyPaths, intoPath=None, reportspec="all", sortKeys=[]):
+        
+        # combine studies, eg the shards of one matrix run by 'run --shard', into a new study
+        
+        from os.path    import join, isabs
+        import common
+        from common     import workpath, infomsg, errormsg
+        from report     import Report
+        from study      import Study
+        
+        sources = []
+        for path in studyPaths:
+            if not isabs(path):
+                path = join(workpath, path)
+            if not Study.isStudyDir(path):
+                errormsg("path does not point to a study directory: {}".format(path))
+                return
+            sources.append(Study(path))
+        
+        # shards of one matrix must have partitioned it alike, else points are missing or repeated
+        shards = [ source.metadata() for source in sources if "shard" in source.metadata() ]
+        if len(set( (m["shard"].split("/")[1], m.get("shard partition")) for m in shards )) > 1:
+            errormsg("shards were partitioned differently, so some runs may be missing or repeated:\n{}".format(
+                        "\n".join("  {}: shard {} by {}".format(source.path, source.metadata()["shard"],
+                                                                  source.metadata().get("shard partition", "unknown"))
+                                  for source in sources if "shard" in source.metadata())))
+            return
+        
+        study = Study(intoPath if intoPath else workpath)
+        points, starts = [], []
+        for source in sources:
+            metadata = source.metadata()
+            points += metadata.get("expected runs", [])
+            starts += [ metadata["started"] ] if "started" in metadata else []
+            rundirs = source.runDirs()
+            for rundir in rundirs:
+                study.copyRun(rundir)
+            infomsg("merged {} runs{} from {}".format(len(rundirs),
+                        " of shard " + metadata["shard"] if "shard" in metadata else "", source.path))
+        study.writeMetadata(points, min(starts) if starts else None,
+                            extra={"merged from": [ source.path for source in sources ]})
+        
+        Report().printReport(study, reportspec, sortKeys)
+    
+    
+    def history(self, action, studyPaths=[], filters=dict(), lastN=None, durationsPath=None):
+        
+        from os         import listdir
+        from os.path    import join, isabs
+        import services
+        from common     import workpath, infomsg, verbosemsg, errormsg, percent
+        from history    import History
+        from study      import Study
+        
+        def configLabel(config):
+            test, build, params, hostFP = config
+            return "{} with {} and {} on host {}".format(test.upper(), build.upper(), params, hostFP)
+        
+        def formatPercent(x):
+            return "{:6.1f}%".format(x) if x is not None else "  ---- "
+        
+        services.workArea()
+        history = History()
+        
+        if action == "ingest":
+            
+            # default is all studies in hpctest/work
+            if not studyPaths:
+                studyPaths = sorted(listdir(workpath))
+            total = 0
+            for path in studyPaths:
+                if not isabs(path):
+                    path = join(workpath, path)
+                if Study.isStudyDir(path):
+                    added = history.ingest(Study(path))
+                    verbosemsg("  added {} runs from {}".format(added, path))
+                    total += added
+                else:
+                    errormsg("path does not point to a study directory: {}".format(path))
+            infomsg("added {} runs to history".format(total))
+        
+        elif action == "durations":
+            
+            try:
+                count = history.writeDurations(durationsPath)
+                infomsg("wrote mean durations of {} configurations to {}, for 'run.shard durations'".format(count, durationsPath))
+            except (IOError, OSError) as e:
+                errormsg("can't write durations to {}: {}".format(durationsPath, e))
+        
+        elif action == "trend":
+            
+            series = history.trend(filters, lastN)
+            for config, rows, summary in series:
+                print
+                infomsg(configLabel(config))
+                infomsg("    runs {}  passed {} ({})  overhead mean {}  last {}".format(
+                            summary["runs"], summary["passed"], percent(summary["passed"], summary["runs"]).strip(),
+                            formatPercent(summary["overhead mean"]).strip(), formatPercent(summary["overhead last"]).strip()))
+                for row in rows:
+                    infomsg("    {:16}  hpctoolkit {:12}  {:8} {}".format(
+                                row["date"], row["hpctkFingerprint"], row["status"], formatPercent(row["overheadPercent"])))
+            if not series:
+                infomsg("no results in history match")
+        
+        else:
+            
+            changes = history.changePoints(filters, lastN)
+            for change in changes:
+                pvalue = "p = {:.3g}".format(change["p"]) if change["p"] is not None else "too few runs to test"
+                infomsg("{}:\n    overhead {} -> {} ({:+.1f}) from hpctoolkit {} to {}, {}".format(
+                            configLabel(change["config"]),
+                            formatPercent(change["before"]).strip(), formatPercent(change["after"]).strip(),
+                            change["jump"], change["from build"], change["to build"], pvalue))
+            infomsg("{} overhead changes found".format(len(changes)))
+        
+        history.close()
+    
+    
+    def benchmark(self, which, **kwargs):     # returns number of measurements over budget, or of failed runs
+        
+        import benchmark
+        
+        if which == "yaml":
+            benchmark.yamlBenchmark(**kwargs)
+            return 0
+        elif which == "harness":
+            return benchmark.harnessBenchmark(**kwargs)
+        else:
+            return benchmark.startupBenchmark(**kwargs)
+    
+    
     def spack(self, cmdstring):
         
+        import services
         import spackle
+        
+        services.spack()
         spackle.do(cmdstring)
 
 
     def selftest(self, testspec="all", reportspec="", studyPath=None):
         
         import common
+        import services
         from dimension import TestDim, BuildDim, HPCTkitDim, ProfileDim
         from study     import Study
         from iterate   import Iterate
         from report    import Report
         from executor  import Executor
+        
+        services.spack()
+        services.hpctoolkit()
                 
 #       # run tests, reporting results as we go
         dims  = {"tests":      TestDim(testspec, selftest=True),
@@ -231,20 +501,119 @@ class HPCTest(object):
     # Instance methods - private #
     #----------------------------#
 
+    def _studyForReport(self, studypath):     # returns Study or None
+        
+        # 'studypath' defaults to most recent study in hpctest/work
+        
+        from os         import listdir
+        from os.path    import join, isabs, isdir
+        from common     import workpath, errormsg
+        from study      import Study
+
+        if not studypath:
+            studies   = sorted(listdir(workpath), reverse=True) if isdir(workpath) else []
+            studypath = join(workpath, studies[0]) if len(studies) else None
+        if studypath:
+            if not isabs(studypath):
+                studypath = join(workpath, studypath)
+            if Study.isStudyDir(studypath):
+                return Study(studypath)
+            else:
+                errormsg("path does not point to a study directory: {}".format(studypath))
+        else:
+            errormsg("no study to report on")
+        return None
+    
+    
+    def _ingestHistory(self, study):
+        
+        # failure here is not fatal b/c study can be ingested later with 'hpctest history ingest'
+        
+        from common import verbosemsg, warnmsg
+        from history import History
+        
+        try:
+            added = History().ingest(study)
+            verbosemsg("added {} runs to history".format(added))
+        except Exception as e:
+            warnmsg("study not added to history: {}".format(e))
+    
+    
     # support for deferred execution
-    def _runOne(self, encodedArgs):
+    def _runOne(self, manifestPath):
+        
+        # runs from the manifest written by the submitting driver, which has already set up
+        # Spack and its repo, so no services are needed here; Spack is used only if the test
+        # must be built. The manifest is removed once the run is over, but not before, since
+        # a job whose worker dies is run again from it.
         
+        from os import remove
         from run import Run
         from common import debugmsg
         
-        debugmsg("_runOne {}".format(encodedArgs))
-        runArgs = Run.decodeInitArgs(encodedArgs) + (False, )  # + wantBatch
+        debugmsg("_runOne {}".format(manifestPath))
+        (test, build, hpctoolkit, profile, numrepeats, study, resumeDir), resolved = Run.readManifest(manifestPath)
+        runArgs = (test, build, hpctoolkit, profile, numrepeats, study, False, resumeDir, resolved)   # False => not wantBatch
         debugmsg("_runOne runArgs = {}".format(runArgs))
         runOb   = Run(*runArgs)
-        runOb.run(echoStdout=False)
+        try:
+            runOb.run(echoStdout=False)
+        finally:
+            try:
+                remove(manifestPath)
+            except OSError:
+                pass
         debugmsg("_runOne done")
     
     
+    def worker(self, studyPath=None, numCores=None):
+        
+        # run jobs queued in the study by the FileQueue executor, alongside any other workers;
+        # the jobs were set up by the submitting driver, so no services are needed here
+        
+        import socket, os
+        from common import infomsg
+        from executor.fileQueueExecutor import FileQueue
+        from executor.resources import NodeShape
+        
+        study = self._studyForReport(studyPath)
+        if not study: return
+        
+        workerID = "{}-{}".format(socket.gethostname().split(".")[0], os.getpid())
+        numCores = numCores if numCores else NodeShape.local().cores
+        infomsg("worker {} taking jobs from {} for {} cores".format(workerID, study.path, numCores))
+        numRun = FileQueue.forStudy(study.path).work(numCores, workerID)
+        infomsg("worker {} done after {} job{}".format(workerID, numRun, "" if numRun == 1 else "s"))
+    
+    
+    def _pack(self, packPath):
+        
+        # runs inside the batch allocation submitted by 'Run.submitPacked', starting
+        # an '_runOne' process for each run listed in the pack list as cores come free;
+        # the pack list is removed when all are done
+        
+        import os
+        from subprocess import Popen
+        from common import debugmsg, homepath, optionsArgString
+        from executor.packer import Packer
+        
+        debugmsg("_pack {}".format(packPath))
+        jobs, numCores = Packer.readPackList(packPath)
+        
+        def launch(job):
+            env = os.environ.copy()
+            env["OMP_NUM_THREADS"] = str(max(job["threads"], 1))
+            cmd = "{}/hpctest _runOne {} '{}'".format(homepath, optionsArgString(), job["manifest"])
+            return Popen(cmd, shell=True, env=env)
+        
+        numFailed = Packer(jobs, numCores).run(launch)
+        try:
+            os.remove(packPath)
+        except OSError:
+            pass
+        debugmsg("_pack done, {} of {} runs failed to complete".format(numFailed, len(jobs)))
+    
+    
     #---------------#
     # Class methods #
     #---------------#
@@ -356,12 +725,10 @@ class HPCTest(object):
 #########################
 
 
-from os.path import isfile
-from shutil import copyfile
-from common import infomsg, errormsg, fatalmsg
-import spackle
+# only path setup is done here, so importing is cheap and has no side effects;
+# everything else is done on demand by 'services'
 
-# (1) establish preconditions for initializing the config system...
+# (1) establish paths used throughout hpctest...
 
 # homepath is needed for everything else
 common.homepath = normpath( join(dirname(realpath(__file__)), "..", "..") )
@@ -376,11 +743,6 @@ common.own_spack_module_dir = join( common.own_spack_home, "lib", "spack" )
 common.testspath     = join(common.homepath, "tests")
 common.repopath      = join(common.internalpath, "repos", "tests")
 common.workpath      = join(common.homepath, "work")
-if not isdir(common.workpath): makedirs(common.workpath)
-
-# and make our general-purpose hidden directory
-hiddenDir = join(common.homepath, ".hpctest")
-if not isdir(hiddenDir): makedirs(hiddenDir)
 
 # (2) sys.path adjustment is needed to load Spack (& other) modules
 sys.path[1:0] = [ common.own_spack_module_dir,
@@ -388,26 +750,4 @@ sys.path[1:0] = [ common.own_spack_module_dir,
                   join(common.own_spack_module_dir, "llnl"),
                 ]
 
-# (3) now we can set up configuration system so configs can specify important paths
-configpath = join(common.homepath, "config.yaml")
-if not isfile(configpath):
-    defaultpath = join(common.internalpath, "src", "config-data", "config-default.yaml")
-    try:
-        copyfile(defaultpath, configpath)
-    except Exception as e:
-        errormsg("config.yaml is missing and can't be created with defaults: {}".format(str(e)))
-configuration.initConfig()
-
-# (4) determine default hpctoolkit instance to use, possibly from config settings
-_whichHpcrun         = common.whichDir("hpcrun")
-_hpctkLocal          = dirname(_whichHpcrun) if _whichHpcrun else None  # 'dirname' to get hpctoolkit install dir from 'bin' dir
-common.hpctk_default = configuration.get("profile.hpctoolkit.path", _hpctkLocal)
-common.hpctk_default = expanduser(common.hpctk_default) if common.hpctk_default else None
-
-
-
-
-
-
-
 
@@ -53,11 +53,15 @@ class Iterate():
 
     
     @classmethod
-    def doForAll(myClass, dims, numrepeats, study, wantBatch):
+    def doForAll(myClass, dims, numrepeats, study, wantBatch, wantWatch=False, resume=False, rerunFailed=False, rerunStatuses=[],
+                 incremental=False, packNodes=None, shard=None):
         
+        import time
         from itertools import product
+        import configuration
         from common import infomsg, verbosemsg, errormsg, debugmsg, options
         from run import Run
+        from watch import Watch
 
         if dims["tests"].isEmpty():       # TODO: check every dimension for emptiness, not just 'tests' -- requires more structure in Spec classes
             infomsg("test spec matches no tests")
@@ -66,6 +70,22 @@ class Iterate():
             
             debugmsg("experiment space = crossproduct( {} ) with options = {} in study dir = {}"
                         .format(dims, options, study.path))
+            
+            # record the matrix so progress can be reported while runs are in flight
+            matrix = list( product(dims["tests"], dims["build"], dims["hpctoolkit"], dims["profile"]) )
+            if shard:
+                durations, partition = Iterate._shardPartition()
+                matrix = Iterate._shardOf(matrix, shard[0], shard[1], durations)
+            study.writeMetadata([ (test.relpath(), str(build), profile.hpcrun) for test, build, _, profile in matrix ],
+                                extra={"shard": "{}/{}".format(*shard), "shard partition": partition} if shard else None)
+            
+            # pair each point with run dir to resume in, or None for a fresh run; points not to be run are omitted
+            if resume:
+                plan = Iterate._resumePlan(matrix, study, rerunFailed, rerunStatuses)
+            else:
+                plan = [ (point, None) for point in matrix ]
+            if incremental:
+                plan = Iterate._incrementalPlan(plan, study)
 
             if wantBatch:
             
@@ -75,17 +95,32 @@ class Iterate():
                     
                     # schedule all tests for batch execution
                     infomsg("submitting all test runs for batch execution...")
+                    Run.useStudy(study)
                     submittedJobs = set()
                     numSubmitted = 0
-                    for test, build, hpctoolkit, profile in product(dims["tests"], dims["build"], dims["hpctoolkit"], dims["profile"]):
-                        verbosemsg("")
-                        jobID, out, err = Run.submitJob(test, build, hpctoolkit, profile, numrepeats, study)
+                    if packNodes and plan:
+                        # all runs in one allocation of 'packNodes' nodes
+                        jobID, out, err = Run.submitPacked(plan, packNodes, numrepeats, study)
                         if not err:
                             submittedJobs.add(jobID)
                             numSubmitted += 1
                             verbosemsg("submitted job # {} for {}".format(jobID, Run.descriptionForJob(jobID)))
                         else:
-                            errormsg("submit failed for test run {}:\n{}".format(test.description(build, hpctoolkit, profile), out))
+                            errormsg("submit failed for packed test runs:\n{}".format(out))
+                        plan = []
+                    # ... a job array per test, whose runs all need the same resources
+                    tests = []
+                    for (test, _, _, _), _ in plan:
+                        if test not in tests: tests.append(test)
+                    for test in tests:
+                        verbosemsg("")
+                        jobIDs, out, err = Run.submitArray([ entry for entry in plan if entry[0][0] is test ], numrepeats, study)
+                        for jobID in jobIDs:
+                            submittedJobs.add(jobID)
+                            numSubmitted += 1
+                            verbosemsg("submitted job # {} for {}".format(jobID, Run.descriptionForJob(jobID)))
+                        if err:
+                            errormsg("submit failed for runs of test {}:\n{}".format(test.relpath(), out))
                     verbosemsg("")
                     if numSubmitted > 0:
                         infomsg("done")
@@ -95,11 +130,17 @@ class Iterate():
                     # poll for finished jobs until all done
                     if numSubmitted > 0:
                         verbosemsg(">>> polling for finished jobs...")
+                        watch       = Watch(study) if wantWatch else None
+                        interval    = float(configuration.get("report.watch interval", 60))
+                        lastUpdate  = time.time()
                         while submittedJobs:
                             finished = Run.pollForFinishedJobs()
                             submittedJobs.symmetric_difference_update(finished)  # since 'finished' containedIn 'submittedJobs', same as set subtract (not in Python)
                             for jobID in finished:
                                 infomsg("{} finished".format(Run.descriptionForJob(jobID)))
+                            if watch and time.time() - lastUpdate >= interval:
+                                watch.update()
+                                lastUpdate = time.time()
                         infomsg("all runs finished")
 
                 except Exception as e:
@@ -108,12 +149,156 @@ class Iterate():
             else:
                 
                 # run all tests sequentially via shell commands
-                for test, build, hpctoolkit, profile in product(dims["tests"], dims["build"], dims["hpctoolkit"], dims["profile"]):
-                    run = Run(test, build, hpctoolkit, profile, numrepeats, study, False)
+                for (test, build, hpctoolkit, profile), resumeDir in plan:
+                    run = Run(test, build, hpctoolkit, profile, numrepeats, study, False, resumeDir)
                     status = run.run()
-            
-            
 
 
+    @classmethod
+    def _shardOf(myClass, matrix, index, count, durations=None):     # returns points of shard 'index' (1-based) of 'count'
+
+        # Every shard computes the same partition of the same matrix, so shards share no driver.
+        # By default a point goes to the shard given by a hash of its test, build spec, and
+        # profile options, which are the same on every machine (hpctoolkit paths may not be);
+        # given 'durations' as from 'History.meanDurations', points are dealt out longest first
+        # to the least loaded shard.
+
+        import hashlib
+        from common import infomsg, warnmsg
+
+        def key(point):
+            test, build, _, profile = point
+            return "{}|{}|{}|{}|{}".format(test.relpath(), build, profile.hpcrun, profile.hpcstruct, profile.hpcprof)
+
+        if durations is not None:
+            def duration(point):
+                test, build, _, profile = point
+                return durations.get((test.relpath(), str(build), profile.hpcrun)) or durations.get(test.relpath())
+            known = [ d for d in map(duration, matrix) if d ]
+            guess = sorted(known)[len(known) // 2] if known else 1.0    # median, for points never run
+            loads = [0.0] * count
+            shardOf = dict()
+            for point in sorted(matrix, key=lambda p: (-(duration(p) or guess), key(p))):
+                k = min(range(count), key=lambda k: (loads[k], k))
+                loads[k] += duration(point) or guess
+                shardOf[key(point)] = k
+            chosen = [ point for point in matrix if shardOf[key(point)] == index - 1 ]
+        else:
+            chosen = [ point for point in matrix
+                             if int(hashlib.sha1(key(point)).hexdigest(), 16) % count == index - 1 ]
+
+        infomsg("shard {}/{} has {} of {} runs".format(index, count, len(chosen), len(matrix)))
+        if not chosen:
+            warnmsg("shard {}/{} is empty".format(index, count))
+        return chosen
+
+
+    @classmethod
+    def _shardPartition(myClass):     # returns (durations or None, description of partition for study metadata)
+
+        # With config 'run.shard by: duration', durations come from the file named by config
+        # 'run.shard durations', which every shard must be given. The results history can't be
+        # used directly: it differs between hosts and changes as shards finish runs, so shards
+        # would compute different partitions and drop or repeat points.
+
+        import hashlib
+        from os.path import expanduser
+        import configuration
+        from common import fatalmsg
+        from history import History
+
+        if configuration.get("run.shard by", "hash") != "duration":
+            return None, "hash"
+
+        path = configuration.get("run.shard durations")
+        if not path:
+            fatalmsg("config 'run.shard by: duration' requires 'run.shard durations', a file written "
+                     "by 'hpctest history durations FILE' and given to every shard")
+        try:
+            with open(expanduser(str(path))) as f:
+                content = f.read()
+            durations = History.readDurations(expanduser(str(path)))
+        except (IOError, OSError, ValueError, KeyError, TypeError) as e:
+            fatalmsg("can't read shard durations from {}: {}".format(path, e))
 
+        return durations, "duration {}".format(hashlib.sha1(content).hexdigest()[:12])
+
+
+    @classmethod
+    def _resumePlan(myClass, matrix, study, rerunFailed, rerunStatuses):     # returns list of (point, run dir or None)
+
+        # A point whose run dir has results is skipped unless its status is to be rerun;
+        # a run dir without results is from an interrupted run. Both are resumed in place,
+        # skipping phases journaled as done. Assumes none of the study's runs is still going.
+
+        from os.path import join
+        from common import infomsg, verbosemsg
+        from study import Study
+
+        def isRunOf(rundir, test, build, hpctoolkit, profile):
+            # run dir names don't distinguish hpctoolkits, so check run's journaled inputs
+            input = Study.runInputs(rundir)
+            return ( input is not None
+                     and input.get("test")       == test.relpath()
+                     and input.get("build spec") == str(build)
+                     and input.get("hpctoolkit") == join(hpctoolkit, "bin")
+                     and (input.get("hpctoolkit params") or {}).get("hpcrun") == profile.hpcrun )
+
+        plan = []
+        numSkipped = numResumed = 0
+        for point in matrix:
+            test, build, hpctoolkit, profile = point
+            rundirs = study.runDirsFor(test.description(build, join(hpctoolkit, "bin"), profile, forName=True))
+            matches = [ dir for dir in rundirs if isRunOf(dir, *point) ]
+            rundir  = matches[-1] if matches else None
+            status  = Study.runStatus(rundir) if rundir else None
+            if rundir is None:
+                plan.append( (point, None) )
+            elif status is None or (status != "OK" and (rerunFailed or status in rerunStatuses)):
+                plan.append( (point, rundir) )
+                numResumed += 1
+                verbosemsg("resuming {} ({})".format(rundir, status if status else "interrupted"))
+            else:
+                numSkipped += 1
+
+        infomsg("resuming study {}: {} runs done, {} to resume, {} to start".format(
+                    study.path, numSkipped, numResumed, len(plan) - numResumed))
+        return plan
+
+
+    @classmethod
+    def _incrementalPlan(myClass, plan, study):     # returns 'plan' without points carried forward
+
+        # A point to be started afresh whose input fingerprint matches a passing run in
+        # the history is not run; that run's results are carried forward into 'study'.
+
+        from os.path import join
+        from common import infomsg, verbosemsg, warnmsg
+        import fingerprint
+        from history import History
+
+        fingerprints = [ fingerprint.inputs(*point) if resumeDir is None else None for point, resumeDir in plan ]
+
+        try:
+            history = History()
+            earlier = history.lastPassing([ fp for fp in fingerprints if fp ])
+            history.close()
+        except Exception as e:
+            warnmsg("results history can't be read, so all runs will be done: {}".format(e))
+            earlier = dict()
+
+        newPlan = []
+        for (point, resumeDir), fp in zip(plan, fingerprints):
+            test, build, hpctoolkit, profile = point
+            fromRundir = earlier.get(fp)
+            rundir = None
+            if fromRundir:
+                rundir = study.carryForward(test.description(build, join(hpctoolkit, "bin"), profile, forName=True), fromRundir, point)
+            if rundir:
+                verbosemsg("carried forward {} from {}".format(rundir, fromRundir))
+            else:
+                newPlan.append( (point, resumeDir) )
 
+        infomsg("incremental study: {} runs carried forward unchanged, {} to run".format(
+                    len(plan) - len(newPlan), len(newPlan)))
+        return newPlan
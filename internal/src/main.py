@@ -75,7 +75,8 @@ def main():
         common.args = args
         common.options = { key[2:] for key in args if key in option_list and args[key] }
 
-        if configuration.get("debug.force") is True:
+        # '--help' and '--version' don't load config, for a fast start
+        if not (args["--help"] or args["--version"]) and configuration.get("debug.force") is True:
             common.options.add("debug")
 
         debugmsg("main's argv = {}".format(sys.argv))
@@ -96,7 +97,7 @@ def execute(args):
     global HPCTestOb
     from collections import OrderedDict
     from os.path import join
-    from common import options, verbosemsg, errormsg, fatalmsg, version
+    from common import options, infomsg, verbosemsg, errormsg, fatalmsg, version
     from help import help_message
 
     HPCTestOb = HPCTest()      # must come early b/c initializes paths in common.*
@@ -131,23 +132,54 @@ def execute(args):
                      False if args["--immediate"] or args["--foreground"] else \
                      None
         
+        wantWatch  = args["--watch"]
+        rerunFailed   = args["--rerun-failed"]
+        rerunStatuses = [ status.strip() for status in args["--rerun-status"].split(",") ] if args["--rerun-status"] else []
+        resume        = args["--resume"] or rerunFailed or bool(rerunStatuses)
+        incremental   = args["--incremental"]
+        try:
+            packNodes = int(args["--pack"]) if args["--pack"] else None
+        except ValueError:
+            errormsg("'--pack' requires a number of nodes")
+            return
+        try:
+            shard = tuple( int(n) for n in args["--shard"].split("/") ) if args["--shard"] else None
+            if shard and not (len(shard) == 2 and 1 <= shard[0] <= shard[1]): raise ValueError
+        except ValueError:
+            errormsg("'--shard' requires a shard number and a number of shards, eg 2/5")
+            return
+        
         # perform the command
-        HPCTestOb.run(dims, numrepeats, reportspec, sortKeys, studyPath, wantBatch)
+        HPCTestOb.run(dims, numrepeats, reportspec, sortKeys, studyPath, wantBatch, wantWatch,
+                      resume, rerunFailed, rerunStatuses, incremental, packNodes, shard)
         
     elif args["report"]:
         
         studyPath  = args["PATH"]
         whichspec  = args["--which"] if args["--which"] else "all" 
         sortKeys   = [ key.strip() for key in (args["--sort"]).split(",") ] if args["--sort"] else []
-        HPCTestOb.report(studyPath, whichspec, sortKeys)
+        if args["--watch"]:
+            HPCTestOb.watch(studyPath, whichspec, sortKeys)
+        elif args["--timing"]:
+            HPCTestOb.timing(studyPath, whichspec)
+        elif args["--timeline"]:
+            HPCTestOb.timeline(studyPath, whichspec, args["--timeline"])
+        elif args["--pivot"]:
+            pivotDims = [ dim.strip() for dim in args["--pivot"].split(",") ]
+            metric    = args["--metric"]    if args["--metric"]    else "overhead"
+            aggregate = args["--aggregate"] if args["--aggregate"] else "median"
+            HPCTestOb.pivot(studyPath, whichspec, pivotDims, metric, aggregate, args["--export"])
+        else:
+            HPCTestOb.report(studyPath, whichspec, sortKeys)
         
     elif args["clean"]:    
         
         s = args["--studies"]
+        r = args["--raw"]
         b = args["--built"]
         d = args["--dependencies"]
         
-        if s or b or d:
+        if s or r or b or d:
             if args["--all"]:
                 infomsg("option '--all' may not be combined with other options, so is ignored")
         elif args["--all"]:
@@ -157,8 +189,75 @@ def execute(args):
         else:
             # default if no options
             s = True
+        
+        try:
+            olderThan = float(args["--older-than"]) if args["--older-than"] else None
+        except ValueError:
+            errormsg("'--older-than' requires a number of days")
+            return
+        keepFailed = args["--keep-failed"]
             
-        HPCTestOb.clean(s, b, d)
+        HPCTestOb.clean(s, b, d, r, olderThan, keepFailed)
+
+    
+    elif args["unpack"]:
+        
+        HPCTestOb.unpack(args["PATH"])
+
+        
+    elif args["compare"]:
+        
+        numRegressions = HPCTestOb.compare(args["STUDY"][0], args["STUDY"][1])
+        return 1 if numRegressions else 0
+
+        
+    elif args["merge"]:
+        
+        reportspec = args["--report"] if args["--report"] else "all"
+        sortKeys   = [ key.strip() for key in (args["--sort"]).split(",") ] if args["--sort"] else []
+        HPCTestOb.merge(args["STUDY"], args["--study"], reportspec, sortKeys)
+
+        
+    elif args["history"]:
+        
+        filters = { "tests":   args["--test"],
+                    "build":   args["--build"],
+                    "profile": args["--profile"],
+                    "host":    args["--host"],
+                  }
+        try:
+            lastN = int(args["--last"]) if args["--last"] else None
+        except ValueError:
+            errormsg("'--last' requires a number of studies")
+            return
+        action = "ingest" if args["ingest"] else "durations" if args["durations"] else "trend" if args["trend"] else "changes"
+        
+        HPCTestOb.history(action, args["STUDY"], filters, lastN, args["FILE"])
+
+        
+    elif args["benchmark"]:
+        
+        kwargs = dict()
+        try:
+            if args["--runs"]: kwargs["numRuns"] = int(args["--runs"])
+        except ValueError:
+            errormsg("'--runs' requires a number of runs")
+            return
+        which = "yaml" if args["yaml"] else "harness" if args["harness"] else "startup"
+        
+        numSlow = HPCTestOb.benchmark(which, **kwargs)
+        return 1 if numSlow else 0
+
+        
+    elif args["worker"]:
+        
+        try:
+            numCores = int(args["--cores"]) if args["--cores"] else None
+        except ValueError:
+            errormsg("'--cores' requires a number of cores")
+            return
+        
+        HPCTestOb.worker(args["--study"], numCores)
 
         
     elif args["spack"]:
@@ -193,7 +292,11 @@ def execute(args):
     
     elif args["_runOne"]:
         
-        HPCTestOb._runOne(args["ENCODED_ARGS"])
+        HPCTestOb._runOne(args["MANIFEST"])
+            
+    elif args["_pack"]:
+        
+        HPCTestOb._pack(args["PACKLIST"])
             
             
     else:
@@ -204,7 +307,9 @@ def execute(args):
 
 
 
-if __name__ == "__main__": main()
+if __name__ == "__main__":
+    import sys
+    sys.exit(main())
 
 
 
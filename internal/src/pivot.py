@@ -0,0 +1,159 @@
+################################################################################
+#                                                                              #
+#  pivot.py                                                                    #
+#  aggregate a study's results over two dimensions into a grid                 #
+#                                                                              #
+#  $HeadURL$                                                                   #
+#  $Id$                                                                        #
+#                                                                              #
+#  --------------------------------------------------------------------------- #
+#  Part of HPCToolkit (hpctoolkit.org)                                         #
+#                                                                              #
+#  Information about sources of support for research and development of        #
+#  HPCToolkit is at 'hpctoolkit.org' and in 'README.Acknowledgments'.          #
+#  --------------------------------------------------------------------------- #
+#                                                                              #
+#  Copyright ((c)) 2002-2017, Rice University                                  #
+#  All rights reserved.                                                        #
+#                                                                              #
+#  Redistribution and use in source and binary forms, with or without          #
+#  modification, are permitted provided that the following conditions are      #
+#  met:                                                                        #
+#                                                                              #
+#  * Redistributions of source code must retain the above copyright            #
+#    notice, this list of conditions and the following disclaimer.             #
+#                                                                              #
+#  * Redistributions in binary form must reproduce the above copyright         #
+#    notice, this list of conditions and the following disclaimer in the       #
+#    documentation and/or other materials provided with the distribution.      #
+#                                                                              #
+#  * Neither the name of Rice University (RICE) nor the names of its           #
+#    contributors may be used to endorse or promote products derived from      #
+#    this software without specific prior written permission.                  #
+#                                                                              #
+#  This software is provided by RICE and contributors "as is" and any          #
+#  express or implied warranties, including, but not limited to, the           #
+#  implied warranties of merchantability and fitness for a particular          #
+#  purpose are disclaimed. In no event shall RICE or contributors be           #
+#  liable for any direct, indirect, incidental, special, exemplary, or         #
+#  consequential damages (including, but not limited to, procurement of        #
+#  substitute goods or services; loss of use, data, or profits; or             #
+#  business interruption) however caused and on any theory of liability,       #
+#  whether in contract, strict liability, or tort (including negligence        #
+#  or otherwise) arising in any way out of the use of this software, even      #
+#  if advised of the possibility of such damage.                               #
+#                                                                              #
+################################################################################
+
+
+# NumPy is used when available for the grouping and aggregation; otherwise the same
+# results are computed in pure Python, which is fine for studies of modest size.
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class Pivot(object):
+
+    # metric name => function of a study index row, giving a number or None
+    metrics = {
+        "overhead": lambda r: r["overheadPercent"],
+        "cputime":  lambda r: r["normalTime"],
+        "samples":  lambda r: r["samples"],
+        "errant%":  lambda r: 100.0 * r["errant"] / r["samples"] if r["errant"] is not None and r["samples"] else None,
+    }
+
+    aggregates = [ "median", "mean", "max", "failures" ]
+
+
+    def __init__(self, rows, rowDim, colDim, metric):
+
+        # 'rows' are study index rows; the study's values are loaded into arrays once
+        # here, and any number of aggregations can then be computed from them
+
+        from studyIndex import StudyIndex
+
+        rowColumn = StudyIndex.dimColumns[rowDim]
+        colColumn = StudyIndex.dimColumns[colDim]
+        getMetric = Pivot.metrics[metric]
+
+        self.rowDim, self.colDim, self.metric = rowDim, colDim, metric
+        self.rowLabels = sorted(set( r[rowColumn] or "" for r in rows ))
+        self.colLabels = sorted(set( r[colColumn] or "" for r in rows ))
+
+        rowCode = { label: i for i, label in enumerate(self.rowLabels) }
+        colCode = { label: j for j, label in enumerate(self.colLabels) }
+        cells   = [ rowCode[r[rowColumn] or ""] * len(self.colLabels) + colCode[r[colColumn] or ""] for r in rows ]
+        values  = [ getMetric(r) if r["status"] == "OK" else None for r in rows ]
+        failed  = [ r["status"] != "OK" for r in rows ]
+
+        if numpy:
+            self.cells  = numpy.array(cells, dtype=numpy.int64)
+            self.values = numpy.array([ v if v is not None else numpy.nan for v in values ], dtype=numpy.float64)
+            self.failed = numpy.array(failed, dtype=numpy.bool_)
+        else:
+            self.cells, self.values, self.failed = cells, values, failed
+
+
+    def aggregate(self, how):     # returns grid as list of rows of values (None if no data)
+
+        numCells = len(self.rowLabels) * len(self.colLabels)
+        if numpy:
+            flat = self._aggregateNumpy(how, numCells)
+        else:
+            flat = self._aggregatePython(how, numCells)
+
+        width = len(self.colLabels)
+        return [ flat[i * width : (i + 1) * width] for i in range(len(self.rowLabels)) ]
+
+
+    #-----------------#
+    # Private methods #
+    #-----------------#
+
+    def _aggregateNumpy(self, how, numCells):
+
+        if how == "failures":
+            counts = numpy.bincount(self.cells[self.failed], minlength=numCells)
+            present = numpy.bincount(self.cells, minlength=numCells) > 0
+            return [ int(c) if p else None for c, p in zip(counts, present) ]
+
+        valid  = ~numpy.isnan(self.values)
+        cells  = self.cells[valid]
+        values = self.values[valid]
+        counts = numpy.bincount(cells, minlength=numCells)
+
+        if how == "mean":
+            sums = numpy.bincount(cells, weights=values, minlength=numCells)
+            result = numpy.where(counts > 0, sums / numpy.maximum(counts, 1), numpy.nan)
+        else:
+            # sort by cell then value, so each cell's values are one sorted run
+            order  = numpy.lexsort((values, cells))
+            values = values[order]
+            starts = numpy.concatenate(([0], numpy.cumsum(counts)[:-1]))
+            result = numpy.full(numCells, numpy.nan)
+            for cell in numpy.nonzero(counts)[0]:
+                run = values[starts[cell] : starts[cell] + counts[cell]]
+                result[cell] = run[-1] if how == "max" else numpy.median(run)
+
+        return [ None if numpy.isnan(x) else float(x) for x in result ]
+
+
+    def _aggregatePython(self, how, numCells):
+
+        from stats import mean, median
+
+        if how == "failures":
+            result = [ None ] * numCells
+            for cell, failed in zip(self.cells, self.failed):
+                result[cell] = (result[cell] or 0) + (1 if failed else 0)
+            return result
+
+        groups = [ [] for _ in range(numCells) ]
+        for cell, value in zip(self.cells, self.values):
+            if value is not None:
+                groups[cell].append(value)
+
+        func = { "mean": mean, "median": median, "max": lambda xs: max(xs) if xs else None }[how]
+        return [ func(xs) if xs else None for xs in groups ]
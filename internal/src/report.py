@@ -53,77 +53,33 @@ class Report():
     
     def printReport(self, study, whichspec, sortKeys):
 
-        from os import listdir
-        from os.path import isfile, isdir, join, basename, relpath
-        from common import homepath, options, percent, infomsg, debugmsg, errormsg, fatalmsg, sepmsg, truncate
-        from util.yaml import readYamlFile, writeYamlFile
-
-        def sortKeyFunc(result):
-            def get_nested(my_dict, keys):
-                key = keys.pop(0)
-                return my_dict[key] if len(keys) == 0 else get_nested(my_dict[key], keys)
-            keylist = []
-            for keypath in dimkeys:
-                keylist.append(get_nested(result["input"], list(keypath)))  # copy keypath b/c get_nested destroys its second argument
-            return keylist
-    
+        from common import options, percent, infomsg, debugmsg, errormsg, sepmsg, truncate
+        from studyIndex import StudyIndex
+
         studypath = study.path
         tableWidth = 110    # width of table row manually determined    # TODO: better
         
         debugmsg("reporting on study at {} with options {}".format(studypath, options))
            
-        # collect the results from all runs meeting 'whichspec'
-        reportAll    = whichspec == "all"
-        reportPassed = whichspec == "pass"     # if 'reportAll', don't care
-        runDirs = listdir(studypath)
-        passes  = list()
-        fails   = list()
-        for runname in runDirs:
-            runPath = join(studypath, runname)
-            outPath = join(runPath, "OUT", "OUT.yaml")
-            if isfile(outPath):
-                resultdict, error = readYamlFile(outPath)
-                if not error:
-                    try:
-                        ok = resultdict["summary"]["status"] == "OK"
-                    except:
-                        ok = False
-                    if reportAll or (reportPassed == ok):
-                        passes.append(resultdict)
-                    if not ok:
-                        fails.append(resultdict)
-                else:
-                    errormsg("results file OUT.yaml can't be read for run {}, ignored".format(runPath))
-            else:
-                errormsg("results file OUT.yaml not found for run {}, ignored".format(runPath))
+        # bring the study's index up to date, then collect results from all runs meeting 'whichspec'
+        index = study.index()
+        for runPath in index.refresh():
+            errormsg("results file OUT.yaml not found for run {}, ignored".format(runPath))
+        for key in StudyIndex.unknownSortKeys(sortKeys):
+            errormsg("unknown sort key for report ignored: '{}'".format(key))
+        results = index.select(whichspec, sortKeys)
+        fails   = index.select("fail", sortKeys)
 
         # counts for final summary line
-        numTests  = len(runDirs)
+        numTests  = len(study.runDirs())
         numFails  = len(fails)
         numPasses = numTests - numFails
         
         # print a summary record for each result, sorted by the dim names in 'sortKeys'
-        if passes:
-
-            # sort passes and fails by input dimspec sequence
-            dimkey_map = {"tests":       ["test"],
-                          "build":       ["build spec"],
-                          "hpctoolkit":  ["hpctoolkit"],
-                          "profile":     ["hpctoolkit params", "hpcrun"]
-                         }
-            dimkeys = []
-            for key in sortKeys:
-                if key in dimkey_map:
-                    dimkeys.append(dimkey_map[key])
-                else:
-                    errormsg("unknown sort key for report ignored: '{}'".format(key))
-            if len(dimkeys):
-                # key func returns list of result fields corresponding to dimkey_list
-                passes.sort(key=sortKeyFunc)
-                fails.sort(key=sortKeyFunc)
+        if results:
 
             print
-            for result in passes:
+            for result in results:
                                 
                 # format for display -- line 1
                 testLabel = self.labelForTest(result)
@@ -132,14 +88,8 @@ class Report():
                 
                 # format for display -- line 2
                 info = self.extractRunInfo(result)
-                try:
-                    status = info.status
-                except:
-                    status = "FAILED"
-                try:
-                    msg = info.msg
-                except:
-                    msg = "no status produced"
+                status = info.status if info.status else "FAILED"
+                msg    = info.msg    if info.msg    else "no status produced"
                 if status != "OK":
                     line2 = ("| {}: {}").format(status, truncate(msg, 100))         
                     line2 += " " * (tableWidth - len(line2) - 1) + "|"
@@ -183,54 +133,144 @@ class Report():
             debugmsg("reportspec = '--which {}'".format(whichspec))
 
 
+    def printPivot(self, study, whichspec, rowDim, colDim, metric, aggregate, exportPath=None):
+
+        # print one compact grid of 'metric' aggregated over all runs at each (rowDim, colDim) point
+
+        import json
+        from collections import OrderedDict
+        from os.path import splitext
+        from common import infomsg, errormsg, sepmsg, truncate
+        from pivot import Pivot
+
+        index = study.index()
+        for runPath in index.refresh():
+            errormsg("results file OUT.yaml not found for run {}, ignored".format(runPath))
+        rows = index.select(whichspec)
+        if not rows:
+            infomsg("no completed runs to report")
+            return
+
+        pivot = Pivot(rows, rowDim, colDim, metric)
+        grid  = pivot.aggregate(aggregate)
+
+        # grid display
+        cellWidth  = 12
+        labelWidth = min(40, max(len(rowDim), max(len(label) for label in pivot.rowLabels)))
+        def formatCell(x):
+            return "---" if x is None else str(x) if aggregate == "failures" else "{:.2f}".format(x)
+
+        print
+        infomsg("{} of {} by {} (rows) and {} (columns) in {}".format(aggregate, metric, rowDim, colDim, study.path))
+        print
+        header = "{:<{w}} |".format(truncate(rowDim, labelWidth), w=labelWidth)
+        header += "".join(" {:>{w}}".format(truncate(label, cellWidth), w=cellWidth) for label in pivot.colLabels)
+        print header
+        sepmsg(len(header))
+        for label, values in zip(pivot.rowLabels, grid):
+            print "{:<{w}} |".format(truncate(label, labelWidth), w=labelWidth) + \
+                  "".join(" {:>{w}}".format(formatCell(x), w=cellWidth) for x in values)
+        print
+
+        # optional export, in format given by file extension
+        if exportPath:
+            ext = splitext(exportPath)[1].lower()
+            try:
+                if ext == ".json":
+                    cells = [ OrderedDict([("row", r), ("column", c), ("value", x)])
+                              for r, values in zip(pivot.rowLabels, grid) for c, x in zip(pivot.colLabels, values) ]
+                    with open(exportPath, "w") as f:
+                        json.dump(OrderedDict([ ("study", study.path), ("rows", rowDim), ("columns", colDim),
+                                                ("metric", metric), ("aggregate", aggregate), ("cells", cells) ]),
+                                  f, indent=2)
+                elif ext == ".csv":
+                    import csv
+                    with open(exportPath, "wb") as f:
+                        writer = csv.writer(f)
+                        writer.writerow([rowDim] + pivot.colLabels)
+                        for label, values in zip(pivot.rowLabels, grid):
+                            writer.writerow([label] + [ "" if x is None else x for x in values ])
+                else:
+                    errormsg("export file must end in .csv or .json: {}".format(exportPath))
+                    return
+                infomsg("exported to {}".format(exportPath))
+            except IOError as e:
+                errormsg("can't export to {}: {}".format(exportPath, e))
+
+
+    def printTiming(self, study, whichspec):
+
+        # print where the study's time went: each span's totals over all runs, see 'spans',
+        # then the driver's own spans, eg Spack setup, over all invocations on the study;
+        # runs carried forward ran in an earlier study, so they are left out
+
+        import json
+        from common import infomsg, errormsg
+
+        index = study.index()
+        for runPath in index.refresh():
+            errormsg("results file OUT.yaml not found for run {}, ignored".format(runPath))
+        rows = index.select(whichspec)
+        spansList  = [ json.loads(row["spans"]) for row in rows if row["spans"] and not row["carriedFrom"] ]
+        driverList = [ spans for spans in study.metadata().get("driver spans") or [] if spans ]
+        if not spansList and not driverList:
+            infomsg("no runs with timing results to report")
+            return
+
+        if spansList:
+            print
+            infomsg("where the time went in {} runs of {}".format(len(spansList), study.path))
+            self._printSpans(spansList)
+        if driverList:
+            print
+            infomsg("where the driver's own time went in {} invocations on {}".format(len(driverList), study.path))
+            self._printSpans(driverList)
+
+
+    def exportTimeline(self, study, whichspec, exportPath):
+
+        # write the study's runs over time to 'exportPath' as a Chrome trace, see 'Timeline'
+
+        from common import infomsg, errormsg
+        from timeline import Timeline
+
+        index = study.index()
+        for runPath in index.refresh():
+            errormsg("results file OUT.yaml not found for run {}, ignored".format(runPath))
+        timeline = Timeline(index.select(whichspec))
+        if timeline.skipped:
+            infomsg("{} runs have no timing results in this study, eg were carried forward, left out".format(timeline.skipped))
+        if not timeline.runs:
+            infomsg("no runs with timing results to export")
+            return
+
+        try:
+            timeline.write(exportPath, study.path)
+            infomsg("timeline of {} runs exported to {}, for ui.perfetto.dev or chrome://tracing".format(
+                        len(timeline.runs), exportPath))
+        except IOError as e:
+            errormsg("can't export to {}: {}".format(exportPath, e))
+
+
     def extractRunInfo(self, result):
         
+        # 'result' is a row from the study index
+        
         from argparse import Namespace
-        from ast import literal_eval
 
         info = Namespace()
         
-        info.extractRunInfoMsg = None
-        
-        try:
-            
-            info.test           = result["input"]["test"].upper().replace("/", " / ")
-            info.build          = result["input"]["build spec"].upper()
-            info.hpctoolkit     = result["input"]["hpctoolkit"]
-            info.params         = result["input"]["hpctoolkit params"]["hpcrun"]
-            info.wantProfiling  = literal_eval(result["input"]["wantProfiling"])
-            info.status         = result["summary"]["status"]
-            info.msg            = result["summary"]["status msg"] if info.status != "OK" else "cpu time {} seconds".format(result["run"]["normal"]["cpu time"])
-            run                 = result["run"]
-                                            
-            if info.wantProfiling and (run != "NA"):
-                hpcrun          = run["profiled"]["hpcrun"]["summary"]
-                info.overhead   = run["profiled"]["hpcrun"]["overhead %"]
-            else:
-                hpcrun          = "NA"
-                info.overhead   = "NA"
-                
-            if hpcrun != "NA":
-                info.blocked    = hpcrun["blocked"]
-                info.errant     = hpcrun["errant"]
-                info.frames     = hpcrun["frames"]
-                info.intervals  = hpcrun["intervals"]
-                info.recorded   = hpcrun["recorded"]
-                info.samples    = hpcrun["samples"]
-                info.trolled    = hpcrun["trolled"]
-                info.yielded    = hpcrun["yielded"]
-            else:
-                info.blocked    = None
-                info.errant     = None
-                info.frames     = None
-                info.intervals  = None
-                info.recorded   = None
-                info.samples    = None
-                info.trolled    = None
-                info.yielded    = None
-            
-        except Exception as e:
-            info.extractRunInfoMsg = e.message      # TODO: 'KeyError' => "status"; e.message and str(e) no better
+        info.extractRunInfoMsg = result["reportMsg"]
+        info.test           = (result["test"] or "").upper().replace("/", " / ")
+        info.build          = (result["buildSpec"] or "").upper()
+        info.hpctoolkit     = result["hpctoolkit"]
+        info.params         = result["hpcrunParams"]
+        info.wantProfiling  = bool(result["wantProfiling"])
+        info.status         = result["status"]
+        info.msg            = result["statusMsg"] if info.status != "OK" else "cpu time {} seconds".format(result["normalTime"])
+        info.overhead       = result["overhead"] if info.wantProfiling and result["overhead"] is not None else "NA"
+        for field in "blocked", "errant", "frames", "intervals", "recorded", "samples", "trolled", "yielded":
+            setattr(info, field, result[field])
     
         return info
 
@@ -244,11 +284,30 @@ class Report():
         return label
 
 
-    
-    
-    
-    
-    
-    
-    
+    def _printSpans(self, spansList):
+
+        # print a table of the spans' totals, children below parents
+
+        from common import sepmsg, truncate
+        import spans
+
+        rows  = spans.breakdown(spansList)
+        total = sum( totals["wall"] for path, depth, totals in rows if depth == 0 )
+        def formatSecs(x):
+            return "{:10.2f}".format(x) if x is not None else " " * 10
+
+        print
+        header = "{:<44} {:>10} {:>7} {:>10} {:>10} {:>7}".format("span", "wall s", "%", "cpu s", "child s", "count")
+        print header
+        sepmsg(len(header))
+        for path, depth, totals in rows:
+            name = truncate("  " * depth + path.rpartition("/")[2], 44)
+            print "{:<44} {} {:>6.1f}% {} {} {:>7}".format(name, formatSecs(totals["wall"]),
+                                                          100.0 * totals["wall"] / total if total else 0.0,
+                                                          formatSecs(totals["cpu"]), formatSecs(totals["child cpu"]),
+                                                          totals["count"] if totals["count"] is not None else "")
+        sepmsg(len(header))
+        print "{:<44} {}".format("total", formatSecs(total))
+        print
+
 
@@ -49,20 +49,36 @@
 from common import options, debugmsg
 
 
+# The journal records, as a run goes, the names given out by 'makePath' and each
+# completed phase with its outputs and products, so that a resumed run (see
+# 'hpctest run --resume') gets the same paths and can skip phases already done.
+_journalName = "journal.json"
+
 
 class ResultDir():
     
-    def __init__(self, parentdir, name):
+    def __init__(self, parentdir, name, study=None, resume=False):
+
+        # 'resume' => result dir may exist already, and its journal is reloaded
 
-        from collections import OrderedDict
+        from collections import Counter, OrderedDict
         from os import makedirs
-        from os.path import join
+        from os.path import isdir, join
 
         self.name = name
+        self.parentdir = parentdir
+        self.study = study          # if given, study's index is updated on 'write'
         self.dir = join(parentdir, self.name)
-        makedirs(self.dir)
         self.outdict = OrderedDict()
         self.numOutfiles = 0
+        self.scratchdir = None
+        self.journal = OrderedDict([ ("paths", OrderedDict()), ("phases", OrderedDict()) ])
+        self.pathUses = Counter()
+
+        if resume and isdir(self.dir):
+            self._loadJournal()
+        else:
+            makedirs(self.dir)
 
 
     def __contains__(self, key):
@@ -75,12 +91,83 @@ class ResultDir():
         return self.dir
         
     
-    def makePath(self, nameFmt, label=None):
+    def makePath(self, nameFmt, label=None, scratch=False):
+
+        # 'scratch' => put file in scratch dir if there is one, to be copied back later
 
         from os.path import join
 
-        self.numOutfiles += 1
-        path = join(self.dir, ("{:02d}-" + nameFmt).format(self.numOutfiles, label))
+        # same request in same order gets same name as in an earlier attempt
+        self.pathUses[(nameFmt, label)] += 1
+        key = "{}|{}|{}".format(nameFmt, label, self.pathUses[(nameFmt, label)])
+        if key not in self.journal["paths"]:
+            self.numOutfiles += 1
+            self.journal["paths"][key] = ("{:02d}-" + nameFmt).format(self.numOutfiles, label)
+            self._writeJournal()
+
+        dir  = self.scratchdir if scratch and self.scratchdir else self.dir
+        path = join(dir, self.journal["paths"][key])
+        return path
+
+
+    def completePhase(self, phase, keypaths=[], products=[], state=None):
+
+        # journal 'phase' as done, saving current values at 'keypaths' to be restored on resume;
+        # 'products' are paths that must still exist for the phase to be skipped on resume
+
+        self.journal["phases"][phase] = { "outputs":  [ [list(kp), self.get(*kp)] for kp in keypaths ],
+                                          "products": [ self._journalPath(p) for p in products ],
+                                          "state":    state if state else {},
+                                        }
+        self._writeJournal()
+
+
+    def resumePhase(self, phase):     # returns saved state dict if phase can be skipped, else None
+
+        import archiving
+
+        entry = self.journal["phases"].get(phase)
+        if not entry:
+            return None
+        for p in entry["products"]:
+            path = self._actualPath(p)
+            if not path or not archiving.ensureExtracted(path):
+                return None
+
+        for keypath, value in entry["outputs"]:
+            self.add(*(keypath + [value]))
+        return entry["state"]
+
+
+    def useScratch(self, scratchdir):
+
+        from os import makedirs
+        
+        makedirs(scratchdir)
+        self.scratchdir = scratchdir
+
+
+    def copyBackScratch(self, archive=False):    # returns path of copy in result dir
+
+        # copy everything in scratch dir to result dir, or pack it all into one archive there
+
+        from os import listdir
+        from os.path import join, isdir
+        from shutil import copy2, copytree
+        import archiving
+
+        names = sorted(listdir(self.scratchdir))
+        if archive:
+            path = archiving.pack(self.scratchdir, names, self.makePath("scratch-results"))
+        else:
+            path = self.dir
+            for name in names:
+                item = join(self.scratchdir, name)
+                if isdir(item):
+                    copytree(item, join(self.dir, name), symlinks=True)
+                else:
+                    copy2(item, self.dir)
+
         return path
 
 
@@ -94,6 +181,19 @@ class ResultDir():
         setValueAtKeypath(self.outdict, keypath, value)
 
 
+    def packRawProducts(self):    # returns path of archive, or None if nothing to pack
+
+        # replace bulky raw products (measurements, databases, ...) by one compressed archive
+
+        import archiving
+
+        names = archiving.rawItems(self.dir)
+        if names:
+            return archiving.pack(self.dir, names, self.makePath("raw-results"), remove=True)
+        else:
+            return None
+
+
     def get(self, *keypath):    # returns None if keyPath not in results
         
         from common import getValueAtKeypath
@@ -111,7 +211,73 @@ class ResultDir():
         from os.path import join
         from util.yaml import writeYamlFile
 
-        writeYamlFile(join(self.dir, "{}.yaml".format(self.name)), self.outdict)
+        path = join(self.dir, "{}.yaml".format(self.name))
+        writeYamlFile(path, self.outdict, jsonSidecar=True)
+        if self.study:
+            self.study.indexResult(self.parentdir, self.outdict, path)
+
+
+    @classmethod
+    def journaledState(cls, dir, phase):     # returns state saved for 'phase' in result dir 'dir', or None
+
+        from os.path import join
+        from util.yaml import readJsonFile
+
+        try:
+            return readJsonFile(join(dir, _journalName))["phases"][phase]["state"]
+        except (IOError, OSError, ValueError, KeyError):
+            return None
+
+
+    #-----------------#
+    # Private methods #
+    #-----------------#
+
+    def _loadJournal(self):
+
+        from os.path import join
+        from util.yaml import readJsonFile
+
+        try:
+            journal = readJsonFile(join(self.dir, _journalName))
+            self.journal["paths"].update(journal["paths"])
+            self.journal["phases"].update(journal["phases"])
+            self.numOutfiles = len(self.journal["paths"])
+        except (IOError, OSError, ValueError, KeyError) as e:
+            debugmsg("no usable journal in {}, starting over: {}".format(self.dir, e))
+
+
+    def _writeJournal(self):
+
+        from os.path import join
+        from util.yaml import writeJsonFile
+
+        try:
+            writeJsonFile(join(self.dir, _journalName), self.journal)
+        except (TypeError, ValueError, IOError, OSError) as e:
+            debugmsg("journal not written in {}: {}".format(self.dir, e))
+
+
+    def _journalPath(self, path):
+
+        # products in scratch dir are journaled relative to it b/c a resumed run gets a new one
+
+        from os.path import relpath
+
+        if self.scratchdir and path.startswith(self.scratchdir + "/"):
+            return "scratch:" + relpath(path, self.scratchdir)
+        else:
+            return path
+
+
+    def _actualPath(self, journalPath):     # returns None if product was in scratch and there is none now
+
+        from os.path import join
+
+        if journalPath.startswith("scratch:"):
+            return join(self.scratchdir, journalPath[len("scratch:"):]) if self.scratchdir else None
+        else:
+            return journalPath
 
 
 
@@ -57,6 +57,8 @@ class Run(object):
     # batch job submission
     from executor import Executor
     executor = Executor.localExecutor()
+    _resolvedSpecs     = dict()     # spec string => (concrete spec, install prefix, MPI prefix), see '_resolveForManifest'
+    _frozenEnvironment = [ "PATH", "LD_LIBRARY_PATH" ]     # env vars from driver used in batch jobs
 
 
     # public operation parameter types
@@ -69,7 +71,7 @@ class Run(object):
     
     # METHODS
     
-    def __init__(self, test, build, hpctoolkit, profile, numrepeats, study, wantBatch):
+    def __init__(self, test, build, hpctoolkit, profile, numrepeats, study, wantBatch, resumeDir=None, resolved=None):
         
         from os.path import basename, join
 
@@ -77,6 +79,8 @@ class Run(object):
         self.test        = test
         self.build       = build                          # Spack spec for desired build configuration
         self.study       = study                          # storage for collection of test run dirs
+        self.resumeDir   = resumeDir                      # existing run dir to continue in, skipping phases done there
+        self.resolved    = resolved if resolved else {}   # facts found by submitting driver, see '_resolveForManifest'
 
         # hpctoolkit params
         self.hpctoolkit        = hpctoolkit
@@ -99,16 +103,28 @@ class Run(object):
         from os.path import join, relpath
         import time
         import common
+        import spans
         from common import args, homepath, infomsg, sepmsg
         from common import HPCTestError, BadTestDescription, BadBuildSpec, PrepareFailed, BuildFailed, ExecuteFailed, CheckFailed
         from experiment import Experiment
         from experiment.profileExperiment import ProfileExperiment
         from util.tee import StdoutTee, StderrTee
+        
+        # where the run's time goes is recorded in its results, see 'spans'
+        spans.begin()
+        started = time.time()
                 
         # job directory
-        self.jobdir = self.study.addRunDir(self.description(forName=True))
-        self.output = self.study.addResultDir(self.jobdir, "OUT")
-        self._writeInputs()
+        with spans.span("setup"):
+            if self.resumeDir:
+                self.jobdir = self.resumeDir
+                self.output = self.study.addResultDir(self.jobdir, "OUT", resume=True)
+            else:
+                self.jobdir = self.study.addRunDir(self.description(forName=True))
+                self.output = self.study.addResultDir(self.jobdir, "OUT")
+            self._writeInputs()
+            self._writeExecution(started)
+            self.output.completePhase("inputs", state={"input": self.output.get("input")})   # identifies run if interrupted
         
         # save console output in OUT directory
         outPath = self.output.makePath("console-output.txt")
@@ -123,15 +139,21 @@ class Run(object):
                         "debugging" if args["debug"] else \
                         "running"   # selftest => running
             infomsg( "{} test {}".format(gerundive, self.description()) )
+            if self.resumeDir:
+                infomsg( "resuming in {}".format(self.resumeDir) )
             sepmsg(True)
             
             # run the test
             try:
                 
-                self._examineYaml()
-                self._buildTest()
+                with spans.span("examine"):
+                    self._examineYaml()
+                with spans.span("build"):
+                    self._buildTest()
                 
                 if not common.args["build"]:    # ie not build-only
+                    with spans.span("scratch"):
+                        self._prepareScratch()
                     self.experiment = ProfileExperiment(self.test, self, self.output,
                                                         self.build, self.hpctoolkit, self.profile)
                     self.experiment.run()
@@ -170,9 +192,14 @@ class Run(object):
             if msg: infomsg(msg)
             
             # finish writing results
+            with spans.span("copy back"):
+                self._finishScratch()
+            with spans.span("archive"):
+                self._archiveResults()
             elapsedTime = time.time() - startTime
             self._addMissingOutputs()
             self.output.add("summary", "elapsed time", elapsedTime, format="{:0.2f}")
+            self.output.add("spans", spans.end())
             self.output.write()
 
 
@@ -195,18 +222,19 @@ class Run(object):
         import spackle
         from common import BadBuildSpec
         
-        namespace = "builtin" if self.test.builtin() else "tests"
-        spackString = "{}@{}{}".format(namespace + "." + self.test.name(), self.test.version(), self.build)
+        spackString = self.test.spackSpec(self.build)
 ####    spackString = spackle.specConcretized(spackString)
         self.spec = spackString  ## NOTE: so after bad-spec exception 'self.spec' can be used in error msg
         self.output.add("input", "spack spec", str(self.spec))
 
 
-    def _prepareJobDirs(self):
+    def _prepareJobDirs(self, forBuild):
 
-        from os import symlink
-        from os.path import basename, join
-        from shutil import copytree
+        from os import remove, symlink
+        from os.path import basename, join, lexists
+        from shutil import rmtree
+        import configuration
+        import staging
         from common import PrepareFailed
 
         try:
@@ -214,10 +242,19 @@ class Run(object):
             # src directory -- immutable so just use test's dir
             self.srcdir = self.test.path()
             
-            # build directory -- copy test's dir if not separable-build test
+            # build directory -- stage test's dir if not separable-build test
+            # ... sources are copied only if a build will happen, else staged as cheaply as possible
+            # ... any leftovers from an earlier unfinished attempt are discarded
             self.builddir = join(self.jobdir, "build");
-            copytree(self.srcdir, self.builddir)
-            symlink( self.builddir, join(self.jobdir, basename(self.srcdir)) )
+            linkPath = join(self.jobdir, basename(self.srcdir))
+            if lexists(linkPath): remove(linkPath)
+            rmtree(self.builddir, ignore_errors=True)
+            mode = configuration.get("run.staging", "auto")
+            if mode == "auto" or (forBuild and mode in ("hardlink", "symlink")):
+                mode = staging.defaultMode(self.srcdir, self.builddir, forBuild)
+            mode = staging.stageTree(self.srcdir, self.builddir, mode)
+            symlink( self.builddir, linkPath )
+            self.output.add("build", "staging", mode)
                 
             # run directory - use build dir if not separable-run test
             self.rundir = self.builddir
@@ -226,48 +263,160 @@ class Run(object):
             raise PrepareFailed(e.message)
         
 
+    def _prepareScratch(self):
+
+        # if configured, move the run directory to node-local scratch storage
+        # so profiling output doesn't go to the study's (possibly parallel) filesystem
+
+        import os
+        from os.path import basename, expanduser, expandvars, isdir, join
+        from tempfile import mkdtemp
+        import configuration
+        import staging
+        from common import warnmsg, PrepareFailed
+
+        self.scratchdir = None
+        scratch = configuration.get("run.scratch")
+        if not scratch:
+            return
+
+        scratch = expanduser(expandvars(str(scratch)))
+        if "$" in scratch or not isdir(scratch):
+            warnmsg("scratch directory '{}' is unavailable, running in study directory".format(scratch))
+            return
+
+        try:
+            self.scratchdir = mkdtemp(dir=scratch, prefix="hpctest-{}-".format(basename(self.jobdir)[:40]))
+            scratchRundir = join(self.scratchdir, "run")
+            # ... scratch is on another filesystem by design, and its run dir is discarded afterwards,
+            # ... so a private copy is both safe and no more costly than the run's reads
+            staging.stageTree(self.rundir, scratchRundir, "copy")
+            self.rundir = scratchRundir
+            self.output.useScratch(join(self.scratchdir, "OUT"))
+        except Exception as e:
+            raise PrepareFailed("can't set up scratch directory in {}: {}".format(scratch, e))
+
+        self.output.add("scratch", "path", self.scratchdir)
+
+
+    def _finishScratch(self):
+
+        # copy results from scratch storage back to the study, then remove scratch dir
+
+        from shutil import rmtree
+        import configuration
+        from common import errormsg
+
+        if not getattr(self, "scratchdir", None):
+            return
+
+        archive = configuration.get("run.scratch archive", False)
+        try:
+            path = self.output.copyBackScratch(archive)
+            self.output.add("scratch", "copied to", path)
+        except Exception as e:
+            errormsg("results could not be copied back from scratch dir {}: {}".format(self.scratchdir, e))
+            self.output.add("scratch", "copied to", "NA")
+        else:
+            rmtree(self.scratchdir, ignore_errors=True)
+
+
+    def _archiveResults(self):
+
+        # if configured, pack raw products of a passing run into a compressed archive
+        # leaving OUT.yaml and small text files unpacked for reporting
+
+        import configuration
+        import archiving
+        from common import errormsg
+
+        if not configuration.get("run.archive", False) or self.output.get("summary", "status") != "OK":
+            return
+
+        try:
+            path = self.output.packRawProducts()
+        except Exception as e:
+            errormsg("raw results could not be archived: {}".format(e))
+        else:
+            if path:
+                self.output.add("archive", "path",       path)
+                self.output.add("archive", "compressor", archiving.compressor()[0])
+
+
     def _buildTest(self):
 
         import os
-        from os.path import basename, join, isfile
+        from os.path import basename, join, isdir, isfile, islink
         from shutil import copyfile
         from sys import stdout
         from util.tee import StdoutTee, StderrTee
         from common import escape
+        import compilerCache
         import spackle
+        import spans
 
         from common import options, infomsg, errormsg, fatalmsg, BuildFailed, ElapsedTimer
 
         self._makeBuildSpec()
-        self._prepareJobDirs()
+
+        # skip build if done in an earlier attempt of this run
+        state = self.output.resumePhase("build")
+        if state is not None:
+            self.srcdir, self.builddir, self.rundir = self.test.path(), state["builddir"], state["builddir"]
+            self.packagePrefix = state["prefix"]
+            infomsg("skipping build, done in earlier attempt")
+            return
+
+        # 'always' => build every time, but never actually install
+        # don't actually install b/c Spack treats every 'dev-build' as different,
+        #   so installed instances just pile up
+        always = self.test.buildAlways()
+
+        # find out whether a build is needed before staging the test's files;
+        # an install prefix resolved by the submitting driver saves asking Spack
+        resolvedPrefix = self.resolved.get("prefix")
+        if resolvedPrefix and not isdir(resolvedPrefix):
+            resolvedPrefix = None   # uninstalled since submission
+        try:
+            installed, installedError = self.test.prebuilt() or bool(resolvedPrefix) \
+                                        or ((not always) and spackle.isSpecInstalled(self.spec)), None
+        except Exception as e:
+            installed, installedError = False, e
+        with spans.span("stage"):
+            self._prepareJobDirs(forBuild = not installed)
 
         # build the package if necessary
         try:
                         
-            buildTime = 0.0     # here in case 'isSpecInstalled' raises an exception
+            buildTime = 0.0     # here in case 'isSpecInstalled' raised an exception
+            if installedError: raise installedError
             
-            # 'always' => build every time, but never actually install
-            # don't actually install b/c Spack treats every 'dev-build' as different,
-            #   so installed instances just pile up
-            always = self.test.buildAlways()
+            if self.test.prebuilt():
+                
+                # test's own dir serves as install prefix, so its 'bin' subdir is on $PATH
+                status, msg = "OK", "nothing to build"
+                self.packagePrefix = self.srcdir
             
-            if spackle.isSpecInstalled(self.spec) and not always:
+            elif installed:
                 
                 if "verbose" in options: infomsg("skipping build, test already installed")
                 status, msg = "OK", "already built"
-                self.packagePrefix = spackle.specPrefix(self.spec)
+                self.packagePrefix = resolvedPrefix or spackle.specPrefix(self.spec)
 
                 # make alias(es) in build dir to product(s) in existing install dir
-                productRelPaths = self.test.installProducts()
-                for relpath in productRelPaths:
-                    productName    = basename(relpath)
-                    buildPath      = join(self.rundir, relpath)
-                    installPath    = join(self.packagePrefix, productName)
-                    installBinPath = join(self.packagePrefix, "bin", productName)
-                    if isfile(installPath):
-                        copyfile(installPath, buildPath)
-                    if isfile(installBinPath):
-                        copyfile(installBinPath, buildPath)
+                with spans.span("copy products"):
+                    productRelPaths = self.test.installProducts()
+                    for relpath in productRelPaths:
+                        productName    = basename(relpath)
+                        buildPath      = join(self.rundir, relpath)
+                        installPath    = join(self.packagePrefix, productName)
+                        installBinPath = join(self.packagePrefix, "bin", productName)
+                        if islink(buildPath) or isfile(buildPath):
+                            os.remove(buildPath)    # don't write through a staged link into the test's dir
+                        if isfile(installPath):
+                            copyfile(installPath, buildPath)
+                        if isfile(installBinPath):
+                            copyfile(installBinPath, buildPath)
 
             else:
                 
@@ -278,27 +427,39 @@ class Run(object):
                     with t:
                         
                         srcDir = self.builddir if not self.test.builtin() else None
-                        spackle.installSpec(self.spec, srcDir, always)
+                        cacheEnv = compilerCache.environment(self.study.path)
+                        cacheStatsBefore = compilerCache.stats(cacheEnv) if cacheEnv else None
+                        spackle.installSpec(self.spec, srcDir, always, cacheEnv)
                         status, msg = "OK", None
                         self.packagePrefix = spackle.specPrefix(self.spec)
                 
                         # make alias(es) in install dir to product(s) in build dir
-                        productRelPaths = self.test.installProducts()
-                        for relpath in productRelPaths:
-                            productName    = basename(relpath)
-                            buildPath      = join(self.rundir, relpath)
-                            installPath    = join(self.packagePrefix, productName)
-                            installBinPath = join(self.packagePrefix, "bin", productName)
-                            if not isfile(installPath) \
-                               and not isfile(installBinPath):
-                                copyfile(buildPath, installBinPath)
+                        with spans.span("copy products"):
+                            productRelPaths = self.test.installProducts()
+                            for relpath in productRelPaths:
+                                productName    = basename(relpath)
+                                buildPath      = join(self.rundir, relpath)
+                                installPath    = join(self.packagePrefix, productName)
+                                installBinPath = join(self.packagePrefix, "bin", productName)
+                                if not isfile(installPath) \
+                                   and not isfile(installBinPath):
+                                    copyfile(buildPath, installBinPath)
                                         
                     buildTime = t.secs
                 
+                # compilations served from the compiler cache, if any
+                cacheStatsAfter = compilerCache.stats(cacheEnv) if cacheStatsBefore else None
+                if cacheStatsAfter:
+                    hits, misses = [ after - before for after, before in zip(cacheStatsAfter, cacheStatsBefore) ]
+                    self.output.add("build", "ccache", "hits",       hits)
+                    self.output.add("build", "ccache", "misses",     misses)
+                    self.output.add("build", "ccache", "hit rate %", round(100.0 * hits / (hits + misses), 1) if hits + misses else "NA")
+                
                 # save Spack build logs -- TODO: do this for builtin tests as well
                 if not self.test.builtin():
-                    cmd = "cd {}; cp spack-build* {} 2>&1 > /dev/null".format(self.builddir, self.output.getDir())
-                    os.system(escape(cmd))
+                    with spans.span("copy logs"):
+                        cmd = "cd {}; cp spack-build* {} 2>&1 > /dev/null".format(self.builddir, self.output.getDir())
+                        os.system(escape(cmd))
                         
         except Exception as e:
             status, msg =  "FAILED", e.message
@@ -313,6 +474,8 @@ class Run(object):
         # finish up
         if status == "OK":
             infomsg("build time = {:<0.2f} seconds".format(buildTime))
+            self.output.completePhase("build", [["build"]], [self.builddir],
+                                      {"builddir": self.builddir, "prefix": self.packagePrefix})
         else:
             if status == "FATAL":
                 fatalmsg(msg)
@@ -337,8 +500,10 @@ class Run(object):
         import datetime
         from os.path import join, relpath
         from common import homepath
+        import fingerprint
 
         now = datetime.datetime.now()
+        hostFingerprint, hostDesc = fingerprint.host()
         self.output.add("input", "date",              now.strftime("%Y-%m-%d %H:%M"))
         self.output.add("input", "test",              self.test.relpath())
         self.output.add("input", "build spec",        str(self.build))
@@ -346,6 +511,32 @@ class Run(object):
         self.output.add("input", "hpctoolkit params", self.profile._asdict())
         self.output.add("input", "num repeats",       self.numrepeats)
         self.output.add("input", "study dir",         self.study.path)
+        if self.resolved:
+            hpctkFingerprint = self.resolved["hpctoolkit fingerprint"]
+            inputFingerprint = fingerprint.inputs(self.test, self.build, self.hpctoolkit, self.profile,
+                                                  (hpctkFingerprint, self.resolved["concrete spec"]))
+        else:
+            hpctkFingerprint = fingerprint.hpctoolkit(self.hpctoolkit)
+            inputFingerprint = fingerprint.inputs(self.test, self.build, self.hpctoolkit, self.profile)
+        self.output.add("input", "hpctoolkit fingerprint", hpctkFingerprint or "NA")
+        self.output.add("input", "host fingerprint",  hostFingerprint)
+        self.output.add("input", "host",              hostDesc)
+        self.output.add("input", "input fingerprint", inputFingerprint or "NA")
+
+
+    def _writeExecution(self, started):
+
+        # where and when the run ran, eg for 'report --timeline'; 'worker' is the queue worker
+        # that ran it and 'allocation' its batch job, if any
+
+        import os, socket
+
+        self.output.add("execution", "host",       socket.gethostname())
+        self.output.add("execution", "pid",        os.getpid())
+        self.output.add("execution", "worker",     os.environ.get("HPCTEST_WORKER"))
+        self.output.add("execution", "allocation", os.environ.get("SLURM_JOB_ID") or os.environ.get("LSB_JOBID"))
+        self.output.add("execution", "submitted",  self.resolved.get("submitted"))
+        self.output.add("execution", "started",    round(started, 3))
 
 
     def _addMissingOutputs(self):
@@ -366,17 +557,34 @@ class Run(object):
 #==========================
 
 
-    def execute(self, cmd, subroot, label, mpi, openmp):
+    def execute(self, cmd, subroot, label, mpi, openmp, numRanks=None, numThreads=None, mpiBin=None, products=[]):
+
+        # 'numRanks', 'numThreads', and 'mpiBin' override the test's own values if given;
+        # 'products' are paths the command creates, needed if later phases are to be resumed
 
         import os
-        from os.path import join
+        from os.path import join, isdir, lexists
+        from shutil import rmtree
         import sys
         from subprocess import CalledProcessError
         from common import options, escape, infomsg, verbosemsg, sepmsg
         from common import HPCTestError, ExecuteFailed
         from spackle import mpiPrefix
         from run import Run
-        
+        import spans
+
+        # skip if done in an earlier attempt of this run, else discard that attempt's products
+        phase = ".".join(subroot + [label])
+        state = self.output.resumePhase(phase)
+        if state is not None:
+            infomsg("skipping {} execution, done in earlier attempt".format(label))
+            return state["cpu time"], state["msg"]
+        for path in products:
+            if isdir(path):
+                rmtree(path, ignore_errors=True)
+            elif lexists(path):
+                os.remove(path)
+
         # compute command to be executed
         # ... start with test's run command
         binPath   = join(self.packagePrefix, "bin")
@@ -387,20 +595,20 @@ class Run(object):
 
         # ... OpenMP parameters if wanted
         if openmp:
-            threads = self.test.numThreads()
+            threads = numThreads if numThreads else self.test.numThreads()
         else:
             threads = 0
 
         # ... MPI launching code if wanted
         if mpi:
-            ranks = self.test.numRanks()
-            mpipath = join(mpiPrefix(self.spec), "bin")
+            ranks = numRanks if numRanks else self.test.numRanks()
+            mpipath = mpiBin if mpiBin else join(self.resolved.get("mpi prefix") or mpiPrefix(self.spec), "bin")
         else:
             ranks = 0       # tells executor.wrap not to use MPI
             mpipath = None
         
         # ... let executor add code immediately surrounding cmd 
-        cmd = Run.executor.wrap(cmd, runPath, binPath, ranks, threads, spackMPIBin=mpipath)
+        cmd = Run.executor.wrap(cmd, runPath, binPath, ranks, threads, spackMPIBin=mpipath, memory=self.test.memory())
         
         # ... always add resource limiting code
         limitstring = self._makeLimitString()
@@ -416,7 +624,8 @@ class Run(object):
         msg = None  # for cpu-time messaging below
         try:
             
-             Run.executor.run(cmd, runPath, binPath, ranks, threads, outPath, self.description())
+             with spans.span(label):
+                 Run.executor.run(cmd, runPath, binPath, ranks, threads, outPath, self.description())
                 
         except HPCTestError as e:
             failed, msg = True, str(e)
@@ -446,11 +655,15 @@ class Run(object):
                     msg = cputime_msg            
         
         # save results
-        cpCmd = "cd {}; cp core.* {}  > /dev/null 2>&1".format(runPath, self.output.getDir())
-        os.system(escape(cpCmd))
+        with spans.span("copy cores"):
+            cpCmd = "cd {}; cp core.* {}  > /dev/null 2>&1".format(runPath, self.output.getDir())
+            os.system(escape(cpCmd))
         self.output.add(label, "cpu time", cputime, subroot=subroot, format="{:0.2f}" if cputime else None)
         self.output.add(label, "status", "FAILED" if failed else "OK", subroot=subroot)
         self.output.add(label, "status msg", msg, subroot=subroot)
+        if not failed and not msg:
+            keypaths = [ subroot + [label, key] for key in ["command", "cpu time", "status", "status msg"] ]
+            self.output.completePhase(phase, keypaths, products + [outPath], {"cpu time": cputime, "msg": msg})
         
         return cputime, msg
              
@@ -458,8 +671,7 @@ class Run(object):
     def _makeLimitString(self, limitDict=None):
          
         import configuration
-         
-        unitsDict = {"k": 2**10, "K": 2**10, "m": 2**20, "M": 2**20, "g": 2**30, "G": 2**30}
+        from common import sizeInBytes
          
         if not limitDict:
             limitDict = configuration.get("run.ulimit", {})
@@ -469,18 +681,9 @@ class Run(object):
              
             value = str(limitDict[key])
              
+            # apply units modifier if any, e.g. '16K'
             if value != "unlimited":
-                 
-                # check for units modifier, e.g. '16K'
-                lastChar = value[-1]
-                if lastChar in unitsDict:
-                    multiplier = unitsDict[lastChar]
-                    value = value[:-1]
-                else:
-                    multiplier = 1
-                 
-                # compute effective limit accordingly
-                value = str( int(value) * multiplier )
+                value = str( sizeInBytes(value) )
  
             # append a limit option for this resource
             s += "-{} {} ".format(key, value)
@@ -519,26 +722,63 @@ class Run(object):
 
 
     @classmethod
-    def submitJob(cls, test, build, hpctoolkit, profile, numrepeats, study):   # returns jobID, out, err
+    def submitArray(cls, plan, numrepeats, study):   # returns jobIDs, out, err
+        
+        # 'plan' is a list of (point, resume dir or None) for one test, whose runs all need
+        # the same resources, so they are submitted as one job array, a task per run
         
-        import os
-        from os.path import join
         from common import optionsArgString, homepath
         import configuration
         
         optString = optionsArgString()
-        initArgs  = Run._encodeInitArgs(test, build, hpctoolkit, profile, numrepeats, study)
-        cmd = "{}/hpctest _runOne {} '{}'; exit 0".format(homepath, optString, initArgs)        
+        cmds, descs = [], []
+        for (test, build, hpctoolkit, profile), resumeDir in plan:
+            manifestPath = Run._writeManifest(test, build, hpctoolkit, profile, numrepeats, study, resumeDir)
+            cmds.append("{}/hpctest _runOne {} '{}'; exit 0".format(homepath, optString, manifestPath))
+            descs.append(test.description(build, hpctoolkit, profile, forName=False))
         prelude = configuration.get("config.batch.prelude", [])
-        numRanks = test.numRanks()
-        numThreads = test.numThreads()
-        name = test.name()
-        desc = test.description(build, hpctoolkit, profile, forName=False)
-        jobID, out, err = Run.executor.submitJob(cmd, prelude, numRanks, numThreads, name, desc)
+        test = plan[0][0][0]
+        jobIDs, out, err = Run.executor.submitArray(cmds, prelude, test.numRanks(), test.numThreads(), test.name(),
+                                                    descs, test.memory())
+        
+        return jobIDs, out, err
+    
+    
+    @classmethod
+    def submitPacked(cls, plan, numNodes, numrepeats, study):   # returns jobID, out, err
+        
+        # Instead of a job per run, one job holds 'numNodes' nodes and 'hpctest _pack'
+        # runs them all inside it, as many at once as its cores allow.
+        
+        from collections import OrderedDict
+        from common import optionsArgString, homepath
+        import configuration
+        from executor.packer import Packer
+        
+        jobs = []
+        for (test, build, hpctoolkit, profile), resumeDir in plan:
+            job = OrderedDict()
+            job["manifest"]    = Run._writeManifest(test, build, hpctoolkit, profile, numrepeats, study, resumeDir)
+            job["ranks"]       = test.numRanks()
+            job["threads"]     = test.numThreads()
+            job["description"] = test.description(build, hpctoolkit, profile)
+            jobs.append(job)
+        
+        packPath = Packer.writePackList(jobs, numNodes, study)
+        cmd = "{}/hpctest _pack {} '{}'; exit 0".format(homepath, optionsArgString(), packPath)
+        prelude = configuration.get("config.batch.prelude", [])
+        desc = "{} runs packed on {} node{}".format(len(jobs), numNodes, "s" if numNodes > 1 else "")
+        jobID, out, err = Run.executor.submitAllocation(cmd, prelude, numNodes, "hpctest-pack", desc)
         
         return jobID, out, err
     
     
+    @classmethod
+    def useStudy(cls, study):
+        
+        Run.executor.useStudy(study)
+    
+    
     @classmethod
     def descriptionForJob(cls, jobID):
     
@@ -564,50 +804,114 @@ class Run(object):
     
     
     @classmethod
-    def _encodeInitArgs(cls, test, build, hpctoolkit, profile, numrepeats, study):
+    def readManifest(cls, path):     # returns (Run init args, resolved facts)
         
-        from os.path import basename
-        import common
+        # set up this process as the driver that wrote the manifest was, then
+        # return what is needed to make the Run it describes
         
-        verb = "build" if common.args["build"] else \
-               "run"   if common.args["run"]   else \
-               "debug" if common.args["debug"] else None
-        encodedArgs = "!".join([verb, test.path(), build, hpctoolkit,
-                                profile.hpcrun, profile.hpcstruct, profile.hpcprof,
-                                str(numrepeats), study.path])
-        encodedArgs = encodedArgs.replace(" ", "#")
-        
-        return common.magic_cookie + encodedArgs
-    
-    
-    @classmethod
-    def decodeInitArgs(cls, encodedArgs):
-        
-        import common
+        import os
+        import common, configuration
         from common import magic_cookie
         from sys import exit
         from dimension.profileDim import ProfileArgs
         from study import Study
         from test import Test
+        from util.yaml import readJsonFile
         
-        if encodedArgs.startswith(magic_cookie):
-            
-            encodedArgs = encodedArgs.replace(magic_cookie, "")
+        try:
+            manifest = readJsonFile(path)
+            if manifest.get("cookie") != magic_cookie: raise ValueError
+        except (IOError, OSError, ValueError, AttributeError):
+            print "The _runOne command is for internal use only."
+            exit()
+        
+        configuration.thaw(manifest["config"])
+        os.environ.update(manifest["environment"])
+        common.args[manifest["verb"]] = True
+        common.testspath = manifest["tests path"]
+        
+        runArgs = ( Test.thaw(manifest["test"]), manifest["build"], manifest["hpctoolkit"],
+                    ProfileArgs(**manifest["profile"]), manifest["num repeats"],
+                    Study(manifest["study"]), manifest["resume dir"] )
+        resolved = manifest["resolved"]
+        resolved["submitted"] = manifest["submitted"]     # for run's batch queue wait
+        return runArgs, resolved
+    
+    
+    @classmethod
+    def _writeManifest(cls, test, build, hpctoolkit, profile, numrepeats, study, resumeDir=None):     # returns path
+        
+        # A batch job's run is described by a frozen manifest of everything the driver
+        # knows about it, so that the job needn't set up Spack, re-read the tests tree,
+        # or ask Spack again what the driver already found out.
+        
+        import os, tempfile, time
+        from collections import OrderedDict
+        import common, configuration
+        from util.yaml import writeJsonFile
+        
+        verb = "build" if common.args["build"] else \
+               "debug" if common.args["debug"] else \
+               "run"     # selftest or benchmark => run
+        
+        manifest = OrderedDict()
+        manifest["cookie"]      = common.magic_cookie
+        manifest["verb"]        = verb
+        manifest["test"]        = test.freeze()
+        manifest["build"]       = build
+        manifest["hpctoolkit"]  = hpctoolkit
+        manifest["profile"]     = profile._asdict()
+        manifest["num repeats"] = numrepeats
+        manifest["study"]       = study.path
+        manifest["tests path"]  = common.testspath
+        manifest["submitted"]   = time.time()
+        manifest["resume dir"]  = resumeDir
+        manifest["resolved"]    = Run._resolveForManifest(test, build, hpctoolkit)
+        manifest["environment"] = { name: os.environ[name] for name in Run._frozenEnvironment if name in os.environ }
+        manifest["config"]      = configuration.freeze()
+        
+        # hidden file in study dir b/c every subdir there is taken to be a run dir
+        fd, path = tempfile.mkstemp(prefix=".manifest-" + test.description(build, hpctoolkit, profile, forName=True) + "-",
+                                    suffix=".json", dir=study.path)
+        os.close(fd)
+        writeJsonFile(path, manifest)
+        return path
+    
+    
+    @classmethod
+    def _resolveForManifest(cls, test, build, hpctoolkit):     # returns dict
+        
+        # Spack's answers are remembered per spec, b/c many runs share a build
+        
+        from collections import OrderedDict
+        import fingerprint
+        import spackle
+        
+        spec = test.spackSpec(build)
+        if test.prebuilt():
             
-            encodedArgs = encodedArgs.replace("#", " ")
-            argStrings = encodedArgs.split("!")
+            Run._resolvedSpecs[spec] = ( spec, None, None )
+        
+        elif spec not in Run._resolvedSpecs:
             
-            verb, testdir, build, hpctoolkit = argStrings[0:4]
-            profile = ProfileArgs(*argStrings[4:7])
-            numrepeats = int(argStrings[7])
-            study = Study(argStrings[8])
+            prefix = mpiPrefix = None
+            try:
+                if not test.buildAlways() and spackle.isSpecInstalled(spec):
+                    prefix = spackle.specPrefix(spec)
+                    if test.numRanks() > 0:
+                        mpiPrefix = spackle.mpiPrefix(spec)
+            except Exception:
+                pass    # job will ask Spack itself, and report any failure
             
-            common.args[verb] = True
-            return (Test(testdir), build, hpctoolkit, profile, numrepeats, study)
+            Run._resolvedSpecs[spec] = ( fingerprint.concreteSpec(spec), prefix, mpiPrefix )
         
-        else:
-            print "The _runOne command is for internal use only."
-            exit()
+        concrete, prefix, mpiPrefix = Run._resolvedSpecs[spec]
+        resolved = OrderedDict()
+        resolved["concrete spec"]          = concrete
+        resolved["prefix"]                 = prefix
+        resolved["mpi prefix"]             = mpiPrefix
+        resolved["hpctoolkit fingerprint"] = fingerprint.hpctoolkit(hpctoolkit)
+        return resolved
 
 
 
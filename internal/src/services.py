@@ -0,0 +1,150 @@
+################################################################################
+#                                                                              #
+#  services.py                                                                 #
+#  lazily started services shared by subcommands: config, Spack, etc           #
+#                                                                              #
+#  $HeadURL$                                                                   #
+#  $Id$                                                                        #
+#                                                                              #
+#  --------------------------------------------------------------------------- #
+#  Part of HPCToolkit (hpctoolkit.org)                                         #
+#                                                                              #
+#  Information about sources of support for research and development of        #
+#  HPCToolkit is at 'hpctoolkit.org' and in 'README.Acknowledgments'.          #
+#  --------------------------------------------------------------------------- #
+#                                                                              #
+#  Copyright ((c)) 2002-2017, Rice University                                  #
+#  All rights reserved.                                                        #
+#                                                                              #
+#  Redistribution and use in source and binary forms, with or without          #
+#  modification, are permitted provided that the following conditions are      #
+#  met:                                                                        #
+#                                                                              #
+#  * Redistributions of source code must retain the above copyright            #
+#    notice, this list of conditions and the following disclaimer.             #
+#                                                                              #
+#  * Redistributions in binary form must reproduce the above copyright         #
+#    notice, this list of conditions and the following disclaimer in the       #
+#    documentation and/or other materials provided with the distribution.      #
+#                                                                              #
+#  * Neither the name of Rice University (RICE) nor the names of its           #
+#    contributors may be used to endorse or promote products derived from      #
+#    this software without specific prior written permission.                  #
+#                                                                              #
+#  This software is provided by RICE and contributors "as is" and any          #
+#  express or implied warranties, including, but not limited to, the           #
+#  implied warranties of merchantability and fitness for a particular          #
+#  purpose are disclaimed. In no event shall RICE or contributors be           #
+#  liable for any direct, indirect, incidental, special, exemplary, or         #
+#  consequential damages (including, but not limited to, procurement of        #
+#  substitute goods or services; loss of use, data, or profits; or             #
+#  business interruption) however caused and on any theory of liability,       #
+#  whether in contract, strict liability, or tort (including negligence        #
+#  or otherwise) arising in any way out of the use of this software, even      #
+#  if advised of the possibility of such damage.                               #
+#                                                                              #
+################################################################################
+
+
+
+
+# Startup work that not every subcommand needs is done here, at most once per process
+# and only when first requested: eg 'hpctest report' needs the configuration but not
+# Spack, and '--help' needs neither. Each service requests the services it depends on.
+
+
+_started = set()
+
+
+def workArea():
+    
+    # make hpctest/work for studies and hpctest/.hpctest for hpctest's own files
+    
+    from os import makedirs
+    from os.path import isdir, join
+    import common
+    
+    if _begin("workArea"):
+        for path in common.workpath, join(common.homepath, ".hpctest"):
+            if not isdir(path): makedirs(path)
+
+
+def config():
+    
+    # load the layered configuration; 'configuration.get' requests this itself
+    
+    import configuration
+    
+    if _begin("config"):
+        configuration.initConfig()
+
+
+def hpctoolkit():
+    
+    # determine default hpctoolkit instance to use, from config settings or $PATH
+    
+    from os.path import dirname, expanduser
+    import common, configuration
+    from common import warnmsg
+    
+    if _begin("hpctoolkit"):
+        config()
+        whichHpcrun = common.whichDir("hpcrun")
+        hpctkLocal  = dirname(whichHpcrun) if whichHpcrun else None  # 'dirname' to get hpctoolkit install dir from 'bin' dir
+        common.hpctk_default = configuration.get("profile.hpctoolkit.path", hpctkLocal)
+        common.hpctk_default = expanduser(common.hpctk_default) if common.hpctk_default else None
+        
+        if not common.hpctk_default:
+            warnmsg("no default HPCToolkit specified for profiling.\n"
+                    "\n"
+                    "To run profiling tests, specify '--hpctookit <path to install directory>' on each 'hpctest run' command line.\n"
+                    "To avoid specifying '--hpctoolkit' every time, do one of the following:\n"
+                    "- edit hpctest/config.yaml and set profile.hpctoolkit.path to desired default HPCToolkit install directory\n"
+                    "- or ensure that an HPCToolkit bin directory is on your $PATH.\n"
+                    "\n"
+                    )
+
+
+def spack():
+    
+    # set up internal Spack, bringing its repo of test packages up to date with the tests
+    
+    import spackle
+    
+    if _begin("spack"):
+        workArea()
+        _installConfig()
+        config()
+        spackle.initSpack()
+
+
+#-------------------#
+# Private functions #
+#-------------------#
+
+def _installConfig():
+    
+    # make hpctest/config.yaml from defaults if missing, reloading configuration if already loaded
+    
+    from os.path import isfile, join
+    from shutil import copyfile
+    import common, configuration
+    from common import errormsg
+    
+    configpath = join(common.homepath, "config.yaml")
+    if not isfile(configpath):
+        defaultpath = join(common.internalpath, "src", "config-data", "config-default.yaml")
+        try:
+            copyfile(defaultpath, configpath)
+        except Exception as e:
+            errormsg("config.yaml is missing and can't be created with defaults: {}".format(str(e)))
+        if "config" in _started:
+            configuration.initConfig()
+
+
+def _begin(name):     # returns True if service 'name' is to be started now
+    
+    if name in _started:
+        return False
+    _started.add(name)
+    return True
@@ -180,25 +180,41 @@ def _assertSpackDir(dir):
               "purported local Spack directoryu has no 'bin/spack': {}".format(own_spack_home))
 
 
+def _subcommand(cmdstring):     # returns name of Spack subcommand in 'cmdstring', eg 'install'
+
+    # skip Spack's own options, and the values of those that take one, eg '-C SCOPE'
+
+    withValue = {"-C", "--config-scope", "-c", "--config", "-e", "--env", "-D", "--env-dir"}
+
+    words = cmdstring.split()
+    i = 0
+    while i < len(words) and words[i].startswith("-"):
+        i += 2 if words[i] in withValue else 1
+    return words[i] if i < len(words) else ""
+
+
 #------------#
 #  Commands  #
 #------------#
 
-def do(cmdstring, echo=False, stdout="/dev/stdout", stderr="/dev/stderr"):
+def do(cmdstring, echo=False, stdout="/dev/stdout", stderr="/dev/stderr", environment=None):
 
-    # cmdstring contents must be shell-escaped by caller, including the 'stdout' & 'stderr' args
+    # cmdstring contents must be shell-escaped by caller, including the 'stdout' & 'stderr' args;
+    # 'environment' is a dict of environment variables to set for Spack
         
     import os, subprocess, common
+    import spans
     from common import verboseOption
     from tempfile import mktemp
     
     out = stdout if echo else mktemp()
     err = stderr if echo else mktemp()
 
-    with open(out, "a") as outf, open(err, "a") as errf:
+    with open(out, "a") as outf, open(err, "a") as errf, spans.span("spack " + _subcommand(cmdstring)):
         shellcmd = common.own_spack_home + "/bin/spack " + verboseOption() + cmdstring
         env = os.environ.copy()
         env.update(PYTHONPATH = "")   # PYTHONPATH breaks python in subprocess if set
+        env.update(environment or {})
         status = subprocess.call(shellcmd, shell=True, env=env, stdout=outf, stderr=errf)
         
     if echo:
@@ -243,9 +259,12 @@ def isSpecInstalled(spec):
     return "No package matches the query" not in out
 
 
-def installSpec(spec, srcDir = None, buildOnly = False):
+def installSpec(spec, srcDir = None, buildOnly = False, cacheEnvironment = None):
+
+    # 'cacheEnvironment' => compilations are cached with these ccache settings, see 'compilerCache'
 
     import spackle
+    import compilerCache
     from common import options, verboseOption, BuildFailed
     verbose = verboseOption()
     
@@ -260,8 +279,10 @@ def installSpec(spec, srcDir = None, buildOnly = False):
         spackCmd =  \
             "install --keep-stage --dirty --show-log-on-error {0} {1} '{2}'" \
                 .format(verbose, before, spec)
+    if cacheEnvironment:
+        spackCmd = "-C {} {}".format(compilerCache.spackScope(), spackCmd)
 
-    out, err = spackle.do(spackCmd, echo = verbose)
+    out, err = spackle.do(spackCmd, echo = verbose, environment = cacheEnvironment)
     
     if "Error" in err:  # could just be warnings
         lines = err.split("\n")
@@ -0,0 +1,154 @@
+################################################################################
+#                                                                              #
+#  spans.py                                                                    #
+#  timed spans of a run's work, for finding where a study's time goes          #
+#                                                                              #
+#  $HeadURL$                                                                   #
+#  $Id$                                                                        #
+#                                                                              #
+#  --------------------------------------------------------------------------- #
+#  Part of HPCToolkit (hpctoolkit.org)                                         #
+#                                                                              #
+#  Information about sources of support for research and development of        #
+#  HPCToolkit is at 'hpctoolkit.org' and in 'README.Acknowledgments'.          #
+#  --------------------------------------------------------------------------- #
+#                                                                              #
+#  Copyright ((c)) 2002-2017, Rice University                                  #
+#  All rights reserved.                                                        #
+#                                                                              #
+#  Redistribution and use in source and binary forms, with or without          #
+#  modification, are permitted provided that the following conditions are      #
+#  met:                                                                        #
+#                                                                              #
+#  * Redistributions of source code must retain the above copyright            #
+#    notice, this list of conditions and the following disclaimer.             #
+#                                                                              #
+#  * Redistributions in binary form must reproduce the above copyright         #
+#    notice, this list of conditions and the following disclaimer in the       #
+#    documentation and/or other materials provided with the distribution.      #
+#                                                                              #
+#  * Neither the name of Rice University (RICE) nor the names of its           #
+#    contributors may be used to endorse or promote products derived from      #
+#    this software without specific prior written permission.                  #
+#                                                                              #
+#  This software is provided by RICE and contributors "as is" and any          #
+#  express or implied warranties, including, but not limited to, the           #
+#  implied warranties of merchantability and fitness for a particular          #
+#  purpose are disclaimed. In no event shall RICE or contributors be           #
+#  liable for any direct, indirect, incidental, special, exemplary, or         #
+#  consequential damages (including, but not limited to, procurement of        #
+#  substitute goods or services; loss of use, data, or profits; or             #
+#  business interruption) however caused and on any theory of liability,       #
+#  whether in contract, strict liability, or tort (including negligence        #
+#  or otherwise) arising in any way out of the use of this software, even      #
+#  if advised of the possibility of such damage.                               #
+#                                                                              #
+################################################################################
+
+
+# A span is a named stretch of work in a run, eg a phase or a Spack command, timed by
+# wall clock and by CPU. Spans nest, and a span's name in the results is its path from
+# the outermost open span, eg 'build/spack find'. Spans are recorded only between 'begin'
+# and 'end', so code that also runs outside of runs can be instrumented at no cost.
+# Recordings nest: the driver records its own spans, eg Spack setup, around the runs it
+# does in-process, and each run's 'begin' and 'end' set the driver's aside meanwhile.
+#
+# CPU time is split into this process's own, which is hpctest's overhead, and that of its
+# finished child processes, eg the test itself or Spack.
+
+
+from contextlib import contextmanager
+
+
+_recorded = None     # OrderedDict: span path => totals, while recording
+_open     = []       # names of spans now open, outermost first
+_outer    = []       # (recorded, open) of recordings set aside by 'begin', innermost last
+
+
+def begin():
+    
+    # start a new recording in this process, setting aside any recording in progress
+    
+    from collections import OrderedDict
+    global _recorded, _open
+    
+    if _recorded is not None:
+        _outer.append( (_recorded, _open) )
+    _recorded, _open = OrderedDict(), []
+
+
+def end():     # returns OrderedDict of recorded spans, for a run's results
+    
+    # stop recording and resume any set aside; values are rounded to the ms, and 'start' is
+    # seconds since the epoch
+    
+    from collections import OrderedDict
+    global _recorded, _open
+    
+    recorded = _recorded or OrderedDict()
+    _recorded, _open = _outer.pop() if _outer else (None, [])
+    for totals in recorded.values():
+        for key in "start", "wall", "cpu", "child cpu":
+            totals[key] = round(totals[key], 3)
+    return recorded
+
+
+@contextmanager
+def span(name):
+    
+    # time the body of a 'with' statement as span 'name' within any spans already open
+    
+    import os, time
+    from collections import OrderedDict
+    
+    if _recorded is None:
+        yield
+        return
+    
+    _open.append(name)
+    path   = "/".join(_open)
+    totals = _recorded.setdefault(path, OrderedDict([ ("start", time.time()), ("wall", 0.0), ("cpu", 0.0),
+                                                      ("child cpu", 0.0), ("count", 0) ]))
+    start, times = time.time(), os.times()
+    try:
+        yield
+    finally:
+        after = os.times()
+        totals["wall"]      += time.time() - start
+        totals["cpu"]       += (after[0] + after[1]) - (times[0] + times[1])
+        totals["child cpu"] += (after[2] + after[3]) - (times[2] + times[3])
+        totals["count"]     += 1
+        _open.pop()
+
+
+def breakdown(spansList):     # returns list of (path, depth, totals) in display order
+    
+    # Sum the spans of many runs. Children follow their parent, longest first, and a parent
+    # with children gets an '(other)' child for its time not covered by them.
+    
+    from collections import OrderedDict, defaultdict
+    
+    totals = OrderedDict()
+    for spans in spansList:
+        for path, values in spans.items():
+            sums = totals.setdefault(path, OrderedDict([ ("wall", 0.0), ("cpu", 0.0), ("child cpu", 0.0), ("count", 0) ]))
+            for key in sums:
+                sums[key] += values.get(key) or 0
+    
+    children = defaultdict(list)
+    for path in totals:
+        children[path.rpartition("/")[0]].append(path)
+    
+    rows = []
+    def visit(parent, depth):
+        kids = sorted(children[parent], key=lambda p: -totals[p]["wall"])
+        for path in kids:
+            rows.append( (path, depth, totals[path]) )
+            visit(path, depth + 1)
+        if parent and kids:
+            other = totals[parent]["wall"] - sum(totals[p]["wall"] for p in kids)
+            if other > 0.0005:
+                rows.append( (parent + "/(other)", depth, OrderedDict([ ("wall", other), ("cpu", None),
+                                                                        ("child cpu", None), ("count", None) ])) )
+    visit("", 0)
+    return rows
@@ -0,0 +1,200 @@
+################################################################################
+#                                                                              #
+#  staging.py                                                                  #
+#  stage a test's directory into a run directory by one of several methods     #
+#                                                                              #
+#  $HeadURL$                                                                   #
+#  $Id$                                                                        #
+#                                                                              #
+#  --------------------------------------------------------------------------- #
+#  Part of HPCToolkit (hpctoolkit.org)                                         #
+#                                                                              #
+#  Information about sources of support for research and development of        #
+#  HPCToolkit is at 'hpctoolkit.org' and in 'README.Acknowledgments'.          #
+#  --------------------------------------------------------------------------- #
+#                                                                              #
+#  Copyright ((c)) 2002-2017, Rice University                                  #
+#  All rights reserved.                                                        #
+#                                                                              #
+#  Redistribution and use in source and binary forms, with or without          #
+#  modification, are permitted provided that the following conditions are      #
+#  met:                                                                        #
+#                                                                              #
+#  * Redistributions of source code must retain the above copyright            #
+#    notice, this list of conditions and the following disclaimer.             #
+#                                                                              #
+#  * Redistributions in binary form must reproduce the above copyright         #
+#    notice, this list of conditions and the following disclaimer in the       #
+#    documentation and/or other materials provided with the distribution.      #
+#                                                                              #
+#  * Neither the name of Rice University (RICE) nor the names of its           #
+#    contributors may be used to endorse or promote products derived from      #
+#    this software without specific prior written permission.                  #
+#                                                                              #
+#  This software is provided by RICE and contributors "as is" and any          #
+#  express or implied warranties, including, but not limited to, the           #
+#  implied warranties of merchantability and fitness for a particular          #
+#  purpose are disclaimed. In no event shall RICE or contributors be           #
+#  liable for any direct, indirect, incidental, special, exemplary, or         #
+#  consequential damages (including, but not limited to, procurement of        #
+#  substitute goods or services; loss of use, data, or profits; or             #
+#  business interruption) however caused and on any theory of liability,       #
+#  whether in contract, strict liability, or tort (including negligence        #
+#  or otherwise) arising in any way out of the use of this software, even      #
+#  if advised of the possibility of such damage.                               #
+#                                                                              #
+################################################################################
+
+
+
+
+# Staging modes, from most to least expensive:
+#   copy      private copy of every file (needed when a build writes into the tree)
+#   reflink   copy-on-write clone of every file, if the filesystem supports it
+#   hardlink  private directories, hard links to source files (same filesystem only)
+#   symlink   private directories, symbolic links to source files (read-only inputs)
+# In 'hardlink' and 'symlink' modes the directories are a private writable overlay:
+# runs can create files freely but must not modify staged inputs in place.
+# Symlinked subdirectories of the test are staged as links to their targets.
+# Mode 'auto' never picks 'hardlink', because writing a hard-linked file changes
+# the test's own copy; it picks reflink where supported, else 'symlink' for
+# already-built tests on parallel filesystems, else 'copy'.
+
+modes = ["copy", "reflink", "hardlink", "symlink"]
+
+# filesystems where creating many small files is expensive
+_parallelFilesystems = {"lustre", "gpfs", "nfs", "nfs4", "beegfs", "panfs", "cifs"}
+
+# cache of reflink support by mount point
+_reflinkSupport = dict()
+
+
+def stageTree(srcdir, dstdir, mode):     # returns mode used
+
+    import os
+    from os.path import islink, join, relpath, realpath
+    from shutil import copytree, rmtree
+    from subprocess import call
+    from common import options, fatalmsg, verbosemsg
+
+    # cloning fails across filesystems or where unsupported, so copy instead
+    if mode == "reflink":
+        with open(os.devnull, "w") as null:
+            status = call(["cp", "-R", "--reflink=always", srcdir, dstdir], stdout=null, stderr=null)
+        if status != 0:
+            verbosemsg("can't reflink {} into {}, copying instead".format(srcdir, dstdir))
+            rmtree(dstdir, ignore_errors=True)
+            mode = "copy"
+
+    if mode == "copy":
+        copytree(srcdir, dstdir)
+    elif mode in ("hardlink", "symlink"):
+        link = os.link if mode == "hardlink" else os.symlink
+        for dir, subdirs, files in os.walk(srcdir):
+            target = join(dstdir, relpath(dir, srcdir))
+            os.makedirs(target)
+            for f in files:
+                link(realpath(join(dir, f)), join(target, f))
+            for d in subdirs:   # os.walk doesn't descend into symlinked dirs, so link them whole
+                if islink(join(dir, d)):
+                    os.symlink(realpath(join(dir, d)), join(target, d))
+        if "debug" in options:
+            _checkStaged(srcdir, dstdir)
+    elif mode != "reflink":
+        fatalmsg("unknown staging mode: {}".format(mode))
+
+    return mode
+
+
+def defaultMode(srcdir, dstdir, forBuild):
+
+    # choose the cheapest mode that is safe for 'dstdir''s filesystem
+    # ... hard links share inodes with the test's files, so they are used only if configured explicitly
+    # ... files can be cloned only within one filesystem
+
+    import os
+    from os.path import dirname
+
+    if os.stat(srcdir).st_dev == os.stat(dirname(dstdir)).st_dev and _supportsReflink(dstdir):
+        mode = "reflink"
+    elif forBuild:
+        mode = "copy"
+    elif isParallelFilesystem(dstdir):
+        mode = "symlink"
+    else:
+        mode = "copy"
+
+    return mode
+
+
+def filesystemType(path):     # returns None if unknown
+
+    from os.path import realpath
+
+    path = realpath(path)
+    best, fstype = "", None
+    try:
+        with open("/proc/mounts") as mounts:
+            for line in mounts:
+                fields = line.split()
+                mountpoint = fields[1].replace("\\040", " ")
+                if (path == mountpoint or path.startswith(mountpoint.rstrip("/") + "/")) \
+                   and len(mountpoint) > len(best):
+                    best, fstype = mountpoint, fields[2]
+    except IOError:
+        pass    # not Linux
+
+    return fstype
+
+
+def isParallelFilesystem(path):
+
+    return filesystemType(path) in _parallelFilesystems
+
+
+def _supportsReflink(dstdir):
+
+    # try to clone a small file within 'dstdir''s parent, once per filesystem
+
+    import os
+    from os.path import dirname
+    from subprocess import call
+    from tempfile import mkstemp
+
+    parent = dirname(dstdir)
+    key = os.stat(parent).st_dev
+    if key not in _reflinkSupport:
+        fd, probe = mkstemp(dir=parent, prefix=".reflink-probe-")
+        os.close(fd)
+        with open(os.devnull, "w") as null:
+            status = call(["cp", "--reflink=always", probe, probe + ".clone"], stdout=null, stderr=null)
+        for path in probe, probe + ".clone":
+            if os.path.exists(path): os.remove(path)
+        _reflinkSupport[key] = (status == 0)
+
+    return _reflinkSupport[key]
+
+
+def _checkStaged(srcdir, dstdir):
+
+    # a link-mode tree must list the same names as 'copytree(srcdir)' would
+
+    expected, actual = _treeNames(srcdir), _treeNames(dstdir)
+    if expected != actual:
+        missing, extra = sorted(expected - actual), sorted(actual - expected)
+        raise Exception("staged tree {} differs from {}: missing {}, extra {}".format(dstdir, srcdir, missing[:5], extra[:5]))
+
+
+def _treeNames(path):     # returns set of relative paths a copy of 'path' would contain
+
+    import os
+    from os.path import join, relpath
+
+    names = set()
+    for dir, subdirs, files in os.walk(path, followlinks=True):
+        for name in subdirs + files:
+            names.add(relpath(join(dir, name), path))
+
+    return names
+
+
@@ -0,0 +1,161 @@
+################################################################################
+#                                                                              #
+#  stats.py                                                                    #
+#  small statistics helpers for comparing sets of measurements                 #
+#                                                                              #
+#  $HeadURL$                                                                   #
+#  $Id$                                                                        #
+#                                                                              #
+#  --------------------------------------------------------------------------- #
+#  Part of HPCToolkit (hpctoolkit.org)                                         #
+#                                                                              #
+#  Information about sources of support for research and development of        #
+#  HPCToolkit is at 'hpctoolkit.org' and in 'README.Acknowledgments'.          #
+#  --------------------------------------------------------------------------- #
+#                                                                              #
+#  Copyright ((c)) 2002-2017, Rice University                                  #
+#  All rights reserved.                                                        #
+#                                                                              #
+#  Redistribution and use in source and binary forms, with or without          #
+#  modification, are permitted provided that the following conditions are      #
+#  met:                                                                        #
+#                                                                              #
+#  * Redistributions of source code must retain the above copyright            #
+#    notice, this list of conditions and the following disclaimer.             #
+#                                                                              #
+#  * Redistributions in binary form must reproduce the above copyright         #
+#    notice, this list of conditions and the following disclaimer in the       #
+#    documentation and/or other materials provided with the distribution.      #
+#                                                                              #
+#  * Neither the name of Rice University (RICE) nor the names of its           #
+#    contributors may be used to endorse or promote products derived from      #
+#    this software without specific prior written permission.                  #
+#                                                                              #
+#  This software is provided by RICE and contributors "as is" and any          #
+#  express or implied warranties, including, but not limited to, the           #
+#  implied warranties of merchantability and fitness for a particular          #
+#  purpose are disclaimed. In no event shall RICE or contributors be           #
+#  liable for any direct, indirect, incidental, special, exemplary, or         #
+#  consequential damages (including, but not limited to, procurement of        #
+#  substitute goods or services; loss of use, data, or profits; or             #
+#  business interruption) however caused and on any theory of liability,       #
+#  whether in contract, strict liability, or tort (including negligence        #
+#  or otherwise) arising in any way out of the use of this software, even      #
+#  if advised of the possibility of such damage.                               #
+#                                                                              #
+################################################################################
+
+
+# Pure Python so it works wherever hpctest does; sample sizes here are small.
+
+
+def mean(xs):
+    
+    return sum(xs) / float(len(xs)) if xs else None
+
+
+def stdev(xs):     # sample standard deviation
+    
+    from math import sqrt
+    
+    if len(xs) < 2: return None
+    m = mean(xs)
+    return sqrt( sum((x - m) ** 2 for x in xs) / (len(xs) - 1) )
+
+
+def median(xs):
+    
+    if not xs: return None
+    s = sorted(xs)
+    n = len(s)
+    return s[n // 2] if n % 2 else (s[n // 2 - 1] + s[n // 2]) / 2.0
+
+
+def welch(xs, ys):     # returns (t, degrees of freedom, two-sided p value), or None if too few samples
+    
+    # Welch's unequal-variances t-test of the hypothesis that 'xs' and 'ys' have equal means
+    
+    from math import sqrt
+    
+    nx, ny = len(xs), len(ys)
+    if nx < 2 or ny < 2: return None
+    
+    vx, vy = stdev(xs) ** 2 / nx, stdev(ys) ** 2 / ny
+    if vx + vy == 0:
+        same = mean(xs) == mean(ys)
+        return (0.0 if same else float("inf"), nx + ny - 2, 1.0 if same else 0.0)
+    
+    t  = (mean(ys) - mean(xs)) / sqrt(vx + vy)
+    df = (vx + vy) ** 2 / ( vx ** 2 / (nx - 1) + vy ** 2 / (ny - 1) )
+    p  = _betai(df / 2.0, 0.5, df / (df + t * t))
+    
+    return (t, df, p)
+
+
+def oneSample(x, ys):     # returns (t, degrees of freedom, two-sided p value), or None if too few samples
+    
+    # t-test of the hypothesis that the single value 'x' is one more sample from the distribution
+    # of 'ys', ie lies within its prediction interval, for when one side has only one run
+    
+    from math import sqrt
+    
+    ny = len(ys)
+    if ny < 2: return None
+    
+    s = stdev(ys)
+    if s == 0:
+        same = x == mean(ys)
+        return (0.0 if same else float("inf"), ny - 1, 1.0 if same else 0.0)
+    
+    t  = (x - mean(ys)) / (s * sqrt(1.0 + 1.0 / ny))
+    df = ny - 1
+    p  = _betai(df / 2.0, 0.5, df / (df + t * t))
+    
+    return (t, df, p)
+
+
+#-------------------#
+# Private functions #
+#-------------------#
+
+def _betai(a, b, x):
+    
+    # regularized incomplete beta function I_x(a,b), after Numerical Recipes 6.4
+    
+    from math import exp, lgamma, log
+    
+    if x <= 0.0: return 0.0
+    if x >= 1.0: return 1.0
+    front = exp( lgamma(a + b) - lgamma(a) - lgamma(b) + a * log(x) + b * log(1.0 - x) )
+    if x < (a + 1.0) / (a + b + 2.0):
+        return front * _betacf(a, b, x) / a
+    else:
+        return 1.0 - front * _betacf(b, a, 1.0 - x) / b
+
+
+def _betacf(a, b, x):
+    
+    # continued fraction for incomplete beta function, by modified Lentz's method
+    
+    tiny = 1.0e-30
+    qab, qap, qam = a + b, a + 1.0, a - 1.0
+    c, d = 1.0, 1.0 - qab * x / qap
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    h = d
+    for m in range(1, 201):
+        m2 = 2 * m
+        aa = m * (b - m) * x / ((qam + m2) * (a + m2))
+        d = 1.0 + aa * d
+        d = 1.0 / (d if abs(d) > tiny else tiny)
+        c = 1.0 + aa / c
+        c = c if abs(c) > tiny else tiny
+        h *= d * c
+        aa = -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))
+        d = 1.0 + aa * d
+        d = 1.0 / (d if abs(d) > tiny else tiny)
+        c = 1.0 + aa / c
+        c = c if abs(c) > tiny else tiny
+        delta = d * c
+        h *= delta
+        if abs(delta - 1.0) < 3.0e-12: break
+    return h
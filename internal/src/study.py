@@ -52,6 +52,12 @@
 # Naming convention for study top-level directories
 _prefix = "study-"
 
+# File in study directory describing the study as a whole
+_metadataName = ".study.yaml"
+
+# Sections of a carried-forward run's OUT.yaml that describe only the earlier run
+_carriedOnlyKeys = ["execution", "spans"]
+
 
 class Study():   
     
@@ -77,6 +83,7 @@ class Study():
             raise BadStudyPath("bad path given for 'study'".format(path))
         
         self.resultDirs = dict()
+        self._index = None
 
 
     def __str__(self):
@@ -100,35 +107,289 @@ class Study():
     def addRunDir(self, description):
 
         import os
-        from os.path import join, isdir
 
-        # TODO: ensure uniqueness
-        rundir = join(self.path, description.replace(" ", "_"))
-        if isdir(rundir):
-            n = 2
-            while( isdir(rundir + "-" + str(n))): n += 1
-            rundir = rundir + "-" + str(n)
+        rundir = self._newRunDirPath(description)
         os.makedirs(rundir)
         
         return rundir
 
 
-    def addResultDir(self, rundir, name):
+    def copyRun(self, rundir):     # returns new run dir
+
+        # add a copy of 'rundir' from another study, eg a shard of this one (see 'hpctest merge')
+
+        from os.path import basename
+        from shutil import copytree
+
+        newdir = self._newRunDirPath(basename(rundir))
+        copytree(rundir, newdir, symlinks=True)
+
+        return newdir
+
+
+    def runDirsFor(self, description):     # returns list of run dirs, oldest first
+
+        # the run dirs that 'addRunDir' made for 'description'
+
+        from os.path import join, isdir
+
+        rundir = join(self.path, description.replace(" ", "_"))
+        rundirs = [rundir] if isdir(rundir) else []
+        n = 2
+        while( isdir(rundir + "-" + str(n))):
+            rundirs.append(rundir + "-" + str(n))
+            n += 1
+        return rundirs
+
+
+    def addResultDir(self, rundir, name, resume=False):
         
         from resultdir import ResultDir
         
-        rd = ResultDir(rundir, name)
+        rd = ResultDir(rundir, name, self, resume)
         self.resultDirs[rundir] = rd
         return rd
+
+
+    def carryForward(self, description, fromRundir, point):     # returns new run dir, or None if earlier results unreadable
+
+        # Add a run of 'point' = (test, build spec, hpctoolkit, profile params) whose results are
+        # those of an earlier run with the same input fingerprint, in another study. Only OUT.yaml
+        # is copied; its products stay where they are. The input section describes 'point' in
+        # this study, as a fresh run's would, so '--resume' recognizes the run as done. The
+        # earlier run's inputs, and its execution and spans, which happened in its own study,
+        # are kept under 'carried forward'.
+
+        import time
+        from copy import deepcopy
+        from os.path import join
+        from util.yaml import readYamlFile
+
+        result, msg = readYamlFile(join(fromRundir, "OUT", "OUT.yaml"), jsonSidecar=True)
+        if msg: return None
+
+        earlierInput = result.get("input") or {}
+        test, build, hpctoolkit, profile = point
+        rundir = self.addRunDir(description)
+        output = self.addResultDir(rundir, "OUT")
+        for key, value in result.items():
+            if key in _carriedOnlyKeys:
+                output.add("carried forward", key, value)
+            else:
+                output.add(key, deepcopy(value) if key == "input" else value)
+        output.add("input", "date",              time.strftime("%Y-%m-%d %H:%M"))
+        output.add("input", "test",              test.relpath())
+        output.add("input", "build spec",        str(build))
+        output.add("input", "hpctoolkit",        join(hpctoolkit, "bin"))
+        output.add("input", "hpctoolkit params", profile._asdict())
+        output.add("input", "study dir",         self.path)
+        output.add("carried forward", "from", fromRundir)
+        output.add("carried forward", "date", time.strftime("%Y-%m-%d %H:%M"))
+        output.add("carried forward", "input", earlierInput)
+        output.completePhase("inputs", state={"input": output.get("input")})
+        output.write()
+
+        return rundir
+
+
+    def writeMetadata(self, points, started=None, extra=None):
+        
+        # 'points' is a list of (test, build spec, hpcrun params) to be run, for progress reports;
+        # 'extra' is a dict of further items to record, eg which shard of a matrix this study is
+        
+        import time
+        from collections import OrderedDict
+        from os.path import join
+        from util.yaml import writeYamlFile
+        
+        metadata = OrderedDict()
+        metadata["started"] = started if started else time.time()
+        metadata["expected runs"] = [ list(point) for point in points ]
+        metadata.update(extra if extra else {})
+        if "driver spans" in self.metadata():     # from before a '--resume'
+            metadata["driver spans"] = self.metadata()["driver spans"]
+        writeYamlFile(join(self.path, _metadataName), metadata)
+
+
+    def addDriverSpans(self, recorded):
+        
+        # record where one invocation of the driver on this study spent its own time, see 'spans'
+        
+        from collections import OrderedDict
+        from os.path import join
+        from util.yaml import writeYamlFile
+        
+        metadata = OrderedDict(self.metadata())
+        metadata["driver spans"] = list(metadata.get("driver spans") or []) + [ recorded ]
+        writeYamlFile(join(self.path, _metadataName), metadata)
+
+
+    def metadata(self):     # returns dict, empty if study has no metadata
+        
+        from os.path import isfile, join
+        from util.yaml import readYamlFile
+        
+        path = join(self.path, _metadataName)
+        if isfile(path):
+            metadata, error = readYamlFile(path)
+            if not error and isinstance(metadata, dict):
+                return metadata
+        return dict()
+
+
+    def index(self):
+        
+        from studyIndex import StudyIndex
+        
+        if not self._index:
+            self._index = StudyIndex(self.path)
+        return self._index
+
+
+    def indexResult(self, rundir, resultdict, yamlPath):
+        
+        # failure here is not fatal b/c index is rebuilt from OUT.yaml files when stale
+        
+        from os.path import getmtime
+        from common import warnmsg
+        
+        try:
+            self.index().upsert(rundir, resultdict, getmtime(yamlPath))
+        except Exception as e:
+            warnmsg("study index not updated for {}: {}".format(rundir, e))
     
         
-    def clean(self):
+    def clean(self, keepFailed=False):
         
         from shutil import rmtree
-        rmtree(self.path, ignore_errors=True)
+
+        if keepFailed:
+            for rundir in self.runDirs():
+                if Study.runPassed(rundir):
+                    rmtree(rundir, ignore_errors=True)
+            if not self.runDirs():
+                rmtree(self.path, ignore_errors=True)
+        else:
+            rmtree(self.path, ignore_errors=True)
+
+
+    def cleanRaw(self, keepFailed=False):     # returns number of runs cleaned
+
+        # remove bulky raw products of each run but keep its OUT.yaml & other small outputs
+
+        from os import listdir, remove
+        from os.path import isdir, join
+        from shutil import rmtree
+        import archiving
+
+        count = 0
+        for rundir in self.runDirs():
+            outdir = join(rundir, "OUT")
+            if not isdir(outdir) or (keepFailed and not Study.runPassed(rundir)):
+                continue
+            names = archiving.rawItems(outdir) + [ n for n in listdir(outdir) if archiving.isArchive(n) ]
+            for name in names:
+                path = join(outdir, name)
+                if isdir(path):
+                    rmtree(path, ignore_errors=True)
+                else:
+                    remove(path)
+            count += 1 if names else 0
+
+        return count
+
+
+    def runDirs(self):
+        
+        from os import listdir
+        from os.path import isdir, join
+        
+        # hidden subdirs hold study's own files, eg its batch queue
+        return [ join(self.path, name) for name in sorted(listdir(self.path))
+                                       if isdir(join(self.path, name)) and not name.startswith(".") ]
+
+
+    def carriedFromStudies(self):     # returns set of real paths of studies
+
+        # the studies holding products of this study's carried-forward runs (see 'carryForward')
+
+        from os.path import dirname, join, realpath
+        from util.yaml import readYamlFile
+
+        paths = set()
+        for rundir in self.runDirs():
+            result, msg = readYamlFile(join(rundir, "OUT", "OUT.yaml"), jsonSidecar=True)
+            fromRundir = (result.get("carried forward") or {}).get("from") if not msg and isinstance(result, dict) else None
+            if fromRundir:
+                paths.add(realpath(dirname(fromRundir.rstrip("/"))))
+
+        return paths
+
+
+    def age(self):    # in days
+        
+        from os.path import basename, getmtime
+        from datetime import datetime
+        import time
+        
+        try:
+            created = datetime.strptime(basename(self.path)[len(_prefix):], "%Y-%m-%d--%H-%M-%S")
+            created = time.mktime(created.timetuple())
+        except ValueError:
+            created = getmtime(self.path)   # study dir not named by timestamp
+        
+        return (time.time() - created) / (24 * 60 * 60)
+
+
+    @classmethod
+    def runPassed(cls, rundir):
+        
+        return Study.runStatus(rundir) == "OK"
+
+
+    @classmethod
+    def runInputs(cls, rundir):     # returns run's input section, or None if not known
+        
+        # read from journal b/c an interrupted run has no OUT.yaml
+        
+        from os.path import join
+        from resultdir import ResultDir
+        
+        state = ResultDir.journaledState(join(rundir, "OUT"), "inputs")
+        return state.get("input") if state else None
+
+
+    @classmethod
+    def runStatus(cls, rundir):     # returns None if run has no results, eg was interrupted
+        
+        from os.path import join
+        from util.yaml import readYamlFile
+        
+        result, msg = readYamlFile(join(rundir, "OUT", "OUT.yaml"), jsonSidecar=True)
+        try:
+            return result["summary"]["status"] if not msg else None
+        except:
+            return None
 
 
     def pathToRunDir(self, testName, build, profile):
         
         pass
+
+
+    #-----------------#
+    # Private methods #
+    #-----------------#
+
+    def _newRunDirPath(self, description):     # returns path not yet used in study
+
+        from os.path import join, isdir
+
+        rundir = join(self.path, description.replace(" ", "_"))
+        if isdir(rundir):
+            n = 2
+            while( isdir(rundir + "-" + str(n))): n += 1
+            rundir = rundir + "-" + str(n)
+
+        return rundir
     
\ No newline at end of file
@@ -0,0 +1,288 @@
+################################################################################
+#                                                                              #
+#  studyIndex.py                                                               #
+#  per-study SQLite index of flattened run results, for fast reporting         #
+#                                                                              #
+#  $HeadURL$                                                                   #
+#  $Id$                                                                        #
+#                                                                              #
+#  --------------------------------------------------------------------------- #
+#  Part of HPCToolkit (hpctoolkit.org)                                         #
+#                                                                              #
+#  Information about sources of support for research and development of        #
+#  HPCToolkit is at 'hpctoolkit.org' and in 'README.Acknowledgments'.          #
+#  --------------------------------------------------------------------------- #
+#                                                                              #
+#  Copyright ((c)) 2002-2017, Rice University                                  #
+#  All rights reserved.                                                        #
+#                                                                              #
+#  Redistribution and use in source and binary forms, with or without          #
+#  modification, are permitted provided that the following conditions are      #
+#  met:                                                                        #
+#                                                                              #
+#  * Redistributions of source code must retain the above copyright            #
+#    notice, this list of conditions and the following disclaimer.             #
+#                                                                              #
+#  * Redistributions in binary form must reproduce the above copyright         #
+#    notice, this list of conditions and the following disclaimer in the       #
+#    documentation and/or other materials provided with the distribution.      #
+#                                                                              #
+#  * Neither the name of Rice University (RICE) nor the names of its           #
+#    contributors may be used to endorse or promote products derived from      #
+#    this software without specific prior written permission.                  #
+#                                                                              #
+#  This software is provided by RICE and contributors "as is" and any          #
+#  express or implied warranties, including, but not limited to, the           #
+#  implied warranties of merchantability and fitness for a particular          #
+#  purpose are disclaimed. In no event shall RICE or contributors be           #
+#  liable for any direct, indirect, incidental, special, exemplary, or         #
+#  consequential damages (including, but not limited to, procurement of        #
+#  substitute goods or services; loss of use, data, or profits; or             #
+#  business interruption) however caused and on any theory of liability,       #
+#  whether in contract, strict liability, or tort (including negligence        #
+#  or otherwise) arising in any way out of the use of this software, even      #
+#  if advised of the possibility of such damage.                               #
+#                                                                              #
+################################################################################
+
+
+
+
+class StudyIndex(object):
+
+    # The index is a cache: each run's OUT.yaml remains the authoritative record,
+    # and the index is brought up to date from those files whenever it is found stale.
+    # Rows are upserted by each run as it finishes, possibly by many batch jobs at once.
+
+    _filename      = ".index.sqlite"
+    _schemaVersion = 5
+
+    # column name, SQL type, keypath in OUT.yaml (None => computed)
+    _columns = [
+        ("run",             "TEXT PRIMARY KEY", None),
+        ("yamlMtime",       "REAL",     None),
+        ("date",            "TEXT",     "input.date"),
+        ("test",            "TEXT",     "input.test"),
+        ("buildSpec",       "TEXT",     "input.build spec"),
+        ("hpctoolkit",      "TEXT",     "input.hpctoolkit"),
+        ("hpctkFingerprint","TEXT",     "input.hpctoolkit fingerprint"),
+        ("hostFingerprint", "TEXT",     "input.host fingerprint"),
+        ("host",            "TEXT",     "input.host.name"),
+        ("inputFingerprint","TEXT",     "input.input fingerprint"),
+        ("carriedFrom",     "TEXT",     "carried forward.from"),
+        ("hpcrunParams",    "TEXT",     "input.hpctoolkit params.hpcrun"),
+        ("hpcstructParams", "TEXT",     "input.hpctoolkit params.hpcstruct"),
+        ("hpcprofParams",   "TEXT",     "input.hpctoolkit params.hpcprof"),
+        ("wantProfiling",   "INTEGER",  None),
+        ("status",          "TEXT",     "summary.status"),
+        ("statusMsg",       "TEXT",     "summary.status msg"),
+        ("elapsedTime",     "REAL",     "summary.elapsed time"),
+        ("buildStatus",     "TEXT",     "build.status"),
+        ("buildTime",       "REAL",     "build.cpu time"),
+        ("normalTime",      "REAL",     "run.normal.cpu time"),
+        ("profiledTime",    "REAL",     "run.profiled.cpu time"),
+        ("hpcstructTime",   "REAL",     "run.profiled.hpcstruct.cpu time"),
+        ("hpcprofTime",     "REAL",     "run.profiled.hpcprof.cpu time"),
+        ("overhead",        "TEXT",     "run.profiled.hpcrun.overhead %"),
+        ("overheadPercent", "REAL",     None),
+        ("samples",         "INTEGER",  "run.profiled.hpcrun.summary.samples"),
+        ("recorded",        "INTEGER",  "run.profiled.hpcrun.summary.recorded"),
+        ("blocked",         "INTEGER",  "run.profiled.hpcrun.summary.blocked"),
+        ("errant",          "INTEGER",  "run.profiled.hpcrun.summary.errant"),
+        ("trolled",         "INTEGER",  "run.profiled.hpcrun.summary.trolled"),
+        ("yielded",         "INTEGER",  "run.profiled.hpcrun.summary.yielded"),
+        ("frames",          "INTEGER",  "run.profiled.hpcrun.summary.frames"),
+        ("intervals",       "INTEGER",  "run.profiled.hpcrun.summary.intervals"),
+        ("spans",           "TEXT",     None),     # JSON of OUT.yaml's 'spans'
+        ("execHost",        "TEXT",     "execution.host"),
+        ("worker",          "TEXT",     "execution.worker"),
+        ("allocation",      "TEXT",     "execution.allocation"),
+        ("submitted",       "REAL",     "execution.submitted"),
+        ("started",         "REAL",     "execution.started"),
+        ("reportMsg",       "TEXT",     None),
+    ]
+
+    columnNames = [ name for name, _, _ in _columns ]
+
+    # report's sort keys (dimension names) => columns
+    dimColumns = { "tests":      "test",
+                   "build":      "buildSpec",
+                   "hpctoolkit": "hpctoolkit",
+                   "profile":    "hpcrunParams",
+                 }
+
+
+    def __init__(self, studyPath):
+
+        from os.path import join
+
+        self.studyPath = studyPath
+        self.path      = join(studyPath, StudyIndex._filename)
+        self.conn      = None
+
+
+    def upsert(self, rundir, resultdict, yamlMtime):
+
+        # record one run's results, replacing any previous row for the run
+
+        row = StudyIndex.flatten(resultdict)
+        row["run"] = self._runName(rundir)
+        row["yamlMtime"] = yamlMtime
+
+        names = StudyIndex.columnNames
+        sql = "INSERT OR REPLACE INTO runs ({}) VALUES ({})".format(
+                    ", ".join(names), ", ".join("?" * len(names)))
+        with self._connection() as conn:
+            conn.execute(sql, [ row.get(name) for name in names ])
+
+
+    def refresh(self):     # returns list of run dirs that have no OUT.yaml
+
+        # bring index up to date with the study's OUT.yaml files, reading only changed ones
+
+        from os import listdir
+        from os.path import getmtime, isdir, isfile, join
+        from common import errormsg
+        from util.yaml import readYamlFile
+
+        conn = self._connection()
+        indexed = { r[0]: r[1] for r in conn.execute("SELECT run, yamlMtime FROM runs") }
+
+        missing = []
+        present = set()
+        for name in sorted(listdir(self.studyPath)):
+            rundir = join(self.studyPath, name)
+            if not isdir(rundir) or name.startswith("."): continue
+            outPath = join(rundir, "OUT", "OUT.yaml")
+            if not isfile(outPath):
+                missing.append(rundir)
+                continue
+            present.add(name)
+            mtime = getmtime(outPath)
+            if indexed.get(name) != mtime:
+                resultdict, error = readYamlFile(outPath, jsonSidecar=True)
+                if error:
+                    errormsg("results file OUT.yaml can't be read for run {}, ignored".format(rundir))
+                    present.discard(name)
+                else:
+                    self.upsert(rundir, resultdict, mtime)
+
+        with conn:
+            for name in set(indexed) - present:
+                conn.execute("DELETE FROM runs WHERE run = ?", (name,))
+
+        return missing
+
+
+    def select(self, whichspec="all", sortKeys=[], where=None):     # returns list of rows (dict-like)
+
+        # 'sortKeys' are dimension or column names; unknown ones are ignored
+
+        clauses = []
+        if whichspec == "pass":
+            clauses.append("status = 'OK'")
+        elif whichspec == "fail":
+            clauses.append("(status IS NULL OR status != 'OK')")
+        if where:
+            clauses.append(where)
+
+        order = []
+        for key in sortKeys:
+            if key in StudyIndex.dimColumns:
+                order.append(StudyIndex.dimColumns[key])
+            elif key in StudyIndex.columnNames:
+                order.append(key)
+        order.append("run")
+
+        sql = "SELECT * FROM runs"
+        if clauses: sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY " + ", ".join(order)
+
+        return self._connection().execute(sql).fetchall()
+
+
+    def close(self):
+
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+
+
+    @classmethod
+    def unknownSortKeys(cls, sortKeys):
+
+        return [ key for key in sortKeys if key not in cls.dimColumns and key not in cls.columnNames ]
+
+
+    @classmethod
+    def flatten(cls, result):     # returns dict: column name => value
+
+        import json
+        from ast import literal_eval
+        from common import getValueAtKeypath
+
+        def number(x):
+            return x if isinstance(x, (int, long, float)) and not isinstance(x, bool) else None
+
+        row = dict()
+        for name, _, keypath in cls._columns:
+            if keypath:
+                value = getValueAtKeypath(result, keypath)
+                row[name] = None if value == "NA" or isinstance(value, (dict, list)) else value
+
+        try:
+            row["wantProfiling"] = 1 if literal_eval(result["input"]["wantProfiling"]) else 0
+            if row["test"] is None: raise KeyError("test")
+        except Exception as e:
+            row["wantProfiling"] = 0
+            row["reportMsg"] = "results incomplete: {} ({})".format(e, type(e).__name__)
+
+        spans = result.get("spans") if isinstance(result, dict) else None
+        row["spans"] = json.dumps(spans) if isinstance(spans, dict) else None
+
+        normal, profiled = number(row["normalTime"]), number(row["profiledTime"])
+        if normal and profiled is not None and row["overhead"] is not None:
+            row["overheadPercent"] = (profiled - normal) / float(normal) * 100.0
+
+        return row
+
+
+    #-----------------#
+    # Private methods #
+    #-----------------#
+
+    def _connection(self):
+
+        import sqlite3
+        import staging
+
+        if not self.conn:
+
+            # WAL lets readers proceed during writes, but needs shared memory among
+            # writers so isn't safe on network filesystems; use locking journal there
+            journal = "DELETE" if staging.isParallelFilesystem(self.studyPath) else "WAL"
+
+            self.conn = sqlite3.connect(self.path, timeout=120)
+            self.conn.row_factory = sqlite3.Row
+            self.conn.execute("PRAGMA journal_mode={}".format(journal))
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+
+            # make table if new index, or remake if index is from another hpctest version
+            version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+            if version != StudyIndex._schemaVersion:
+                with self.conn:
+                    if version != 0:
+                        self.conn.execute("DROP TABLE IF EXISTS runs")
+                    self.conn.execute("CREATE TABLE IF NOT EXISTS runs ({})".format(
+                        ", ".join("{} {}".format(name, type) for name, type, _ in StudyIndex._columns)))
+                    self.conn.execute("PRAGMA user_version = {}".format(StudyIndex._schemaVersion))
+
+        return self.conn
+
+
+    def _runName(self, rundir):
+
+        from os.path import basename
+        return basename(rundir.rstrip("/"))
+
+
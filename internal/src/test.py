@@ -52,6 +52,7 @@ class Test():
     
     _checksumFilename = ".checksum"
     _yamlFilename     = "hpctest.yaml"
+    _instances        = dict()      # path => Test, so each test is examined once per process
 
 
     @classmethod
@@ -64,23 +65,44 @@ class Test():
     @classmethod
     def forEachDo(cls, action):
         
-        import os
-        from os.path import join
-        from common import homepath
+        from testIndex import TestIndex
         
-        testsRoot = join(homepath, "tests")
-        for dir, _, _ in os.walk(testsRoot, topdown=False):
-            if Test.isTestDir(dir):
-                action(Test(dir))
+        for dir in TestIndex.shared().testDirs():
+            action(Test.forPath(dir))
+
+
+    @classmethod
+    def thaw(cls, frozen):
+        
+        # the Test described by 'frozen', made without reading the test's files
+        
+        test = Test(frozen["dir"], (frozen["yaml"], frozen["yaml msg"]))
+        test._checksum = frozen["checksum"]
+        Test._instances[test.dir] = test
+        return test
+
+
+    @classmethod
+    def forPath(cls, dir):
+        
+        # the Test for test directory 'dir', made at most once per process
+        
+        if dir not in Test._instances:
+            Test._instances[dir] = Test(dir)
+        return Test._instances[dir]
 
     
-    def __init__(self, dir):
+    def __init__(self, dir, description=None):
+        
+        # 'description' is (yaml dict, error msg) if already known, eg from 'freeze'
         
         from common import fatalmsg
+        from testIndex import TestIndex
         
         if Test.isTestDir(dir):
             self.dir = dir
-            self.yamlDict, self.yamlMsg = self._readYaml()
+            self.yamlDict, self.yamlMsg = description if description else TestIndex.shared().description(dir, self._readYaml)
+            self._checksum = None
         else:
             fatalmsg("Test.__init__: dir must be a path to a valid test directory but is not ({})").format(dir)
 
@@ -90,11 +112,29 @@ class Test():
          return self._yaml("build") == "builtin" or self._yaml("build.kind") == "builtin"
 
 
+    def prebuilt(self):
+        
+         # test's files are run as they are, with no build and no Spack, eg synthetic tests of 'benchmark harness'
+         return self._yaml("build.kind") == "none"
+
+
     def buildAlways(self):
         
          return self._yaml("build.always", "no") == True
 
 
+    def checksum(self):
+        
+        # content hash of the test's directory, computed once per Test object,
+        # rehashing only files changed since an earlier process hashed them
+        
+        from testIndex import TestIndex
+        
+        if self._checksum is None:
+            self._checksum = TestIndex.shared().checksum(self.dir)
+        return self._checksum
+
+
     def cmd(self):
         
         return self._yaml("run.cmd")
@@ -114,13 +154,23 @@ class Test():
         return f.format(t, c, p)
 
 
+    def freeze(self):     # returns dict from which 'thaw' makes an equivalent Test
+        
+        from collections import OrderedDict
+        
+        return OrderedDict([ ("dir",      self.dir),
+                             ("yaml",     self.yamlDict),
+                             ("yaml msg", self.yamlMsg),
+                             ("checksum", self.checksum()),
+                           ])
+
+
     def hasChanged(self):
         
         from os.path import join, exists
-        from util.checksumdir import dirhash
 
         # get new checksum
-        newChecksum = self._computeChecksum()
+        newChecksum = self.checksum()
 
         # get old checksum
         checksumPath = join(self.dir, Test._checksumFilename)
@@ -145,7 +195,7 @@ class Test():
 
         checksumPath = join(self.dir, Test._checksumFilename)
         with open(checksumPath, 'w') as cs:
-            cs.write(self._computeChecksum())
+            cs.write(self.checksum())
     
 
     def name(self):
@@ -163,6 +213,12 @@ class Test():
         return self._yaml("run.threads", 0)
 
 
+    def memory(self):     # returns bytes per rank, or None if not given
+        
+        from common import sizeInBytes
+        return sizeInBytes(self._yaml("run.memory"))
+
+
     def path(self):
             
         return self.dir
@@ -174,9 +230,9 @@ class Test():
 
     def relpath(self):
         
-        from os.path import relpath, join
-        from common import homepath
-        return relpath(self.dir, join(homepath, "tests"))
+        from os.path import relpath
+        from common import testspath
+        return relpath(self.dir, testspath)
 
 
     def runSubdir(self):
@@ -184,6 +240,14 @@ class Test():
         return self._yaml("run.dir", ".")
 
 
+    def spackSpec(self, build):
+        
+        # Spack spec string for building this test with build settings 'build'
+        
+        namespace = "builtin" if self.builtin() else "tests"
+        return "{}@{}{}".format(namespace + "." + self.name(), self.version(), build)
+
+
     def valid(self):
         
         return self.yamlDict is not None;
@@ -208,12 +272,6 @@ class Test():
     # Private methods #
     #-----------------#
 
-    def _computeChecksum(self):
-        
-        from util.checksumdir import dirhash
-        return dirhash(self.dir, hashfunc='md5', excluded_files=[Test._checksumFilename])
-
-
     def _readYaml(self):
      
         from os.path import join, basename
@@ -0,0 +1,308 @@
+################################################################################
+#                                                                              #
+#  testIndex.py                                                                #
+#  cache of the tests tree: test dirs, parsed hpctest.yaml, and checksums      #
+#                                                                              #
+#  $HeadURL$                                                                   #
+#  $Id$                                                                        #
+#                                                                              #
+#  --------------------------------------------------------------------------- #
+#  Part of HPCToolkit (hpctoolkit.org)                                         #
+#                                                                              #
+#  Information about sources of support for research and development of        #
+#  HPCToolkit is at 'hpctoolkit.org' and in 'README.Acknowledgments'.          #
+#  --------------------------------------------------------------------------- #
+#                                                                              #
+#  Copyright ((c)) 2002-2017, Rice University                                  #
+#  All rights reserved.                                                        #
+#                                                                              #
+#  Redistribution and use in source and binary forms, with or without          #
+#  modification, are permitted provided that the following conditions are      #
+#  met:                                                                        #
+#                                                                              #
+#  * Redistributions of source code must retain the above copyright            #
+#    notice, this list of conditions and the following disclaimer.             #
+#                                                                              #
+#  * Redistributions in binary form must reproduce the above copyright         #
+#    notice, this list of conditions and the following disclaimer in the       #
+#    documentation and/or other materials provided with the distribution.      #
+#                                                                              #
+#  * Neither the name of Rice University (RICE) nor the names of its           #
+#    contributors may be used to endorse or promote products derived from      #
+#    this software without specific prior written permission.                  #
+#                                                                              #
+#  This software is provided by RICE and contributors "as is" and any          #
+#  express or implied warranties, including, but not limited to, the           #
+#  implied warranties of merchantability and fitness for a particular          #
+#  purpose are disclaimed. In no event shall RICE or contributors be           #
+#  liable for any direct, indirect, incidental, special, exemplary, or         #
+#  consequential damages (including, but not limited to, procurement of        #
+#  substitute goods or services; loss of use, data, or profits; or             #
+#  business interruption) however caused and on any theory of liability,       #
+#  whether in contract, strict liability, or tort (including negligence        #
+#  or otherwise) arising in any way out of the use of this software, even      #
+#  if advised of the possibility of such damage.                               #
+#                                                                              #
+################################################################################
+
+
+
+
+_shared = None
+
+_hashBlockSize  = 1 << 20
+_maxHashThreads = 8
+
+
+class TestIndex(object):
+
+    # A cache of what startup and test selection need to know about the tests tree:
+    # where the test directories are, each test's parsed hpctest.yaml, and a content
+    # hash of each file in each test. Entries are validated by file and directory
+    # stats, so only changed tests or files are re-read. The tests tree remains the
+    # authoritative record; a lost or unreadable index is just rebuilt.
+
+    _filename = "tests.json"
+    _version  = 2
+
+
+    @classmethod
+    def shared(cls):     # returns this process's index of 'common.testspath', saved at exit if changed
+
+        import atexit
+        import common
+        global _shared
+
+        if not _shared or _shared.testsRoot != common.testspath:
+            if _shared: _shared.save()
+            _shared = TestIndex()
+            atexit.register(_shared.save)
+        return _shared
+
+
+    def __init__(self, path=None, testsRoot=None):
+
+        from os.path import join
+        import common
+
+        # a tests tree other than hpctest/tests, eg a synthetic one, keeps its own index
+        self.testsRoot = testsRoot if testsRoot else common.testspath
+        if path:
+            self.path = path
+        elif self.testsRoot == join(common.homepath, "tests"):
+            self.path = join(common.homepath, ".hpctest", TestIndex._filename)
+        else:
+            self.path = join(self.testsRoot, "." + TestIndex._filename)
+        self.data      = None
+        self.dirty     = False
+        self.checked   = False      # => test dirs have been validated in this process
+
+
+    def testDirs(self):     # returns sorted list of paths to test directories
+
+        # A directory whose mtime is unchanged has the same entries as when last listed,
+        # so only changed directories are listed again; the rest cost one 'stat' each.
+
+        import os
+        from collections import OrderedDict
+        from os.path import isdir, islink, join
+        from test import Test
+
+        data = self._data()
+        if not self.checked:
+
+            known = data["dirs"]
+            dirs  = OrderedDict()     # relpath => [mtime, subdir names, is test dir]
+            todo  = [""]
+            while todo:
+                rel  = todo.pop()
+                path = join(self.testsRoot, rel)
+                try:
+                    mtime = os.stat(path).st_mtime
+                except OSError:
+                    continue
+                entry = known.get(rel)
+                if not entry or entry[0] != mtime:
+                    names   = sorted(os.listdir(path))
+                    subdirs = [ n for n in names if isdir(join(path, n)) and not islink(join(path, n)) ]
+                    entry   = [ mtime, subdirs, Test._yamlFilename in names ]
+                    self.dirty = True
+                dirs[rel] = entry
+                todo.extend( join(rel, n) for n in reversed(entry[1]) )
+
+            if set(dirs) != set(known):
+                self.dirty = True
+            data["dirs"] = dirs
+            for rel in list(data["tests"]):
+                if rel not in dirs or not dirs[rel][2]:
+                    del data["tests"][rel]
+            self.checked = True
+
+        return sorted( join(self.testsRoot, rel) for rel, entry in data["dirs"].items() if entry[2] )
+
+
+    def description(self, testDir, read):     # returns (yaml dict, error msg) from 'read()', or as cached
+
+        import json
+        from os.path import join
+        from test import Test
+
+        entry = self._testEntry(testDir)
+        if entry is None:
+            return read()
+
+        signature = self._fileSignature(join(testDir, Test._yamlFilename))
+        if entry.get("yaml signature") != signature:
+            yaml, msg = read()
+            try:
+                json.dumps(yaml)
+            except (TypeError, ValueError):
+                return yaml, msg     # can't be cached, eg has dates
+            entry["yaml signature"] = signature
+            entry["yaml"]           = yaml
+            entry["yaml msg"]       = msg
+            self.dirty = True
+
+        return entry["yaml"], entry["yaml msg"]
+
+
+    def checksum(self, testDir):     # returns hex digest of contents of test's files
+
+        # Two levels: a file whose (size, mtime, inode) is unchanged keeps its saved content
+        # hash, and only the rest are read and hashed, in parallel. The checksum combines
+        # the files' relative paths and content hashes.
+
+        import hashlib
+        from collections import OrderedDict
+
+        entry = self._testEntry(testDir)
+        known = entry.get("files", {}) if entry is not None else {}
+
+        files = self._statFiles(testDir)
+        stale = [ path for rel, path, signature in files if known.get(rel, [])[:3] != signature ]
+        fresh = dict( zip(stale, _hashFiles(stale)) )
+
+        hashes = OrderedDict()
+        for rel, path, signature in files:
+            hashes[rel] = signature + [ fresh[path] if path in fresh else known[rel][3] ]
+        if entry is not None and hashes != known:
+            entry["files"] = hashes
+            self.dirty = True
+
+        digest = hashlib.sha1()
+        for rel, value in hashes.items():
+            digest.update("{}\0{}\n".format(rel, value[3]))
+        return digest.hexdigest()
+
+
+    def save(self):
+
+        # best effort: if concurrent processes race here, the last one wins
+
+        from common import debugmsg
+        from util.yaml import writeJsonFile
+
+        if self.dirty and self.data is not None:
+            try:
+                writeJsonFile(self.path, self.data)
+                self.dirty = False
+            except (IOError, OSError, TypeError, ValueError) as e:
+                debugmsg("test index not saved: {}".format(e))
+
+
+    #-----------------#
+    # Private methods #
+    #-----------------#
+
+    def _data(self):
+
+        from collections import OrderedDict
+        from util.yaml import readJsonFile
+
+        if self.data is None:
+            try:
+                data = readJsonFile(self.path)
+                if data.get("version") != TestIndex._version or data.get("tests root") != self.testsRoot:
+                    data = None
+            except (IOError, OSError, ValueError, AttributeError):
+                data = None
+            if data is None:
+                data = OrderedDict([ ("version", TestIndex._version), ("tests root", self.testsRoot),
+                                     ("dirs", OrderedDict()), ("tests", OrderedDict()) ])
+                self.dirty = True
+            self.data = data
+
+        return self.data
+
+
+    def _testEntry(self, testDir):     # returns cache entry for test, or None if not under tests root
+
+        from collections import OrderedDict
+        from os.path import relpath
+
+        rel = relpath(testDir, self.testsRoot)
+        if rel.startswith(".."):
+            return None
+        return self._data()["tests"].setdefault(rel, OrderedDict())
+
+
+    def _fileSignature(self, path):     # returns [mtime, size], or None if no such file
+
+        import os
+
+        try:
+            st = os.stat(path)
+            return [ st.st_mtime, st.st_size ]
+        except OSError:
+            return None
+
+
+    def _statFiles(self, dir):     # returns sorted list of (relpath, path, [size, mtime, inode])
+
+        # Python 2 has no 'st_mtime_ns', but a float mtime keeps microseconds
+
+        import os
+        from os.path import isfile, join, relpath
+        from test import Test
+
+        files = []
+        for path, dirnames, filenames in os.walk(dir):
+            dirnames.sort()
+            for name in sorted(filenames):
+                filepath = join(path, name)
+                if name == Test._checksumFilename or not isfile(filepath): continue
+                st = os.stat(filepath)
+                files.append( (relpath(filepath, dir), filepath, [st.st_size, st.st_mtime, st.st_ino]) )
+
+        return files
+
+
+#-------------------#
+# Private functions #
+#-------------------#
+
+def _hashFiles(paths):     # returns list of hex digests of files' contents
+
+    # hashlib releases the GIL while hashing large blocks, so threads hash in parallel
+
+    from multiprocessing.pool import ThreadPool
+
+    if len(paths) < 2:
+        return map(_hashFile, paths)
+
+    pool = ThreadPool( min(len(paths), _maxHashThreads) )
+    try:
+        return pool.map(_hashFile, paths)
+    finally:
+        pool.close()
+
+
+def _hashFile(path):
+
+    import hashlib
+
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_hashBlockSize), b""):
+            digest.update(block)
+    return digest.hexdigest()
@@ -0,0 +1,152 @@
+################################################################################
+#                                                                              #
+#  timeline.py                                                                 #
+#  a study's runs over time, as a Chrome trace-event timeline                  #
+#                                                                              #
+#  $HeadURL$                                                                   #
+#  $Id$                                                                        #
+#                                                                              #
+#  --------------------------------------------------------------------------- #
+#  Part of HPCToolkit (hpctoolkit.org)                                         #
+#                                                                              #
+#  Information about sources of support for research and development of        #
+#  HPCToolkit is at 'hpctoolkit.org' and in 'README.Acknowledgments'.          #
+#  --------------------------------------------------------------------------- #
+#                                                                              #
+#  Copyright ((c)) 2002-2017, Rice University                                  #
+#  All rights reserved.                                                        #
+#                                                                              #
+#  Redistribution and use in source and binary forms, with or without          #
+#  modification, are permitted provided that the following conditions are      #
+#  met:                                                                        #
+#                                                                              #
+#  * Redistributions of source code must retain the above copyright            #
+#    notice, this list of conditions and the following disclaimer.             #
+#                                                                              #
+#  * Redistributions in binary form must reproduce the above copyright         #
+#    notice, this list of conditions and the following disclaimer in the       #
+#    documentation and/or other materials provided with the distribution.      #
+#                                                                              #
+#  * Neither the name of Rice University (RICE) nor the names of its           #
+#    contributors may be used to endorse or promote products derived from      #
+#    this software without specific prior written permission.                  #
+#                                                                              #
+#  This software is provided by RICE and contributors "as is" and any          #
+#  express or implied warranties, including, but not limited to, the           #
+#  implied warranties of merchantability and fitness for a particular          #
+#  purpose are disclaimed. In no event shall RICE or contributors be           #
+#  liable for any direct, indirect, incidental, special, exemplary, or         #
+#  consequential damages (including, but not limited to, procurement of        #
+#  substitute goods or services; loss of use, data, or profits; or             #
+#  business interruption) however caused and on any theory of liability,       #
+#  whether in contract, strict liability, or tort (including negligence        #
+#  or otherwise) arising in any way out of the use of this software, even      #
+#  if advised of the possibility of such damage.                               #
+#                                                                              #
+################################################################################
+
+
+class Timeline(object):
+
+    # The runs of a study laid out over time in Chrome's trace-event format, for viewing in
+    # Perfetto (ui.perfetto.dev) or chrome://tracing. Each host, or each queue worker on a
+    # host, is a process whose threads are its slots: a run goes in the first slot free when
+    # it started, so the number of slots is the most runs that overlapped there, and gaps are
+    # idle slots. Within a run, each span that happened once (see 'spans') is an event nested
+    # by time. Batch queue waits, from submission to start, are in a process of their own.
+
+    def __init__(self, rows):
+
+        # 'rows' are study index rows; runs without timing results, eg from older hpctest
+        # versions, are left out, and so are runs carried forward, which ran in an earlier study
+
+        import json
+
+        self.runs    = []
+        self.skipped = 0
+        for row in rows:
+            if row["spans"] and row["started"] and not row["carriedFrom"]:
+                self.runs.append( (row, json.loads(row["spans"])) )
+            else:
+                self.skipped += 1
+
+
+    def traceEvents(self):     # returns list of trace event dicts, times in microseconds from study start
+
+        from collections import OrderedDict
+
+        def end(row, spans):
+            return max([ row["started"] ] + [ s["start"] + s["wall"] for s in spans.values() ])
+
+        origin = min([ row["started"] for row, _ in self.runs ] +
+                     [ row["submitted"] for row, _ in self.runs if row["submitted"] ])
+        def micros(t):
+            return int(round((t - origin) * 1e6))
+
+        events    = []
+        processes = OrderedDict()     # process name => (pid, end times of its slots)
+        def slotFor(process, start, finish):     # returns (pid, tid)
+            if process not in processes:
+                pid = len(processes) + 1
+                processes[process] = (pid, [])
+                events.append(Timeline._metadata("process_name", pid, 0, process))
+            pid, slots = processes[process]
+            for tid, busyUntil in enumerate(slots):
+                if busyUntil <= start: break
+            else:
+                tid = len(slots)
+                slots.append(None)
+                events.append(Timeline._metadata("thread_name", pid, tid, "slot {}".format(tid + 1)))
+            slots[tid] = max(finish, slots[tid])
+            return pid, tid
+
+        # slots are filled in order of start times, each pass in its own processes
+        waiting = [ row for row, _ in self.runs if row["submitted"] and row["submitted"] < row["started"] ]
+        for row in sorted(waiting, key=lambda row: row["submitted"]):
+            pid, tid = slotFor("batch queue", row["submitted"], row["started"])
+            events.append(Timeline._event("queue wait", "queue", pid, tid, micros(row["submitted"]),
+                                          micros(row["started"]) - micros(row["submitted"]), {"run": row["run"]}))
+
+        for row, spans in sorted(self.runs, key=lambda run: run[0]["started"]):
+
+            name     = "{} {}".format(row["test"], row["buildSpec"])
+            start    = row["started"]
+            process  = row["execHost"] or row["host"] or "unknown host"
+            process += " worker {}".format(row["worker"]) if row["worker"] else ""
+            pid, tid = slotFor(process, start, end(row, spans))
+            args = OrderedDict([ ("run", row["run"]), ("status", row["status"]), ("profile", row["hpcrunParams"]),
+                                 ("allocation", row["allocation"]) ])
+            events.append(Timeline._event(name, "run", pid, tid, micros(start), micros(end(row, spans)) - micros(start), args))
+            for path, span in spans.items():
+                if span["count"] == 1:
+                    events.append(Timeline._event(path.rpartition("/")[2], "phase", pid, tid, micros(span["start"]),
+                                                  max(int(round(span["wall"] * 1e6)), 1), {"span": path}))
+
+        return events
+
+
+    def write(self, path, studyPath):
+
+        import json
+        from collections import OrderedDict
+
+        trace = OrderedDict([ ("traceEvents", self.traceEvents()), ("displayTimeUnit", "ms"),
+                              ("otherData", {"study": studyPath}) ])
+        with open(path, "w") as f:
+            json.dump(trace, f)
+
+
+    #-----------------#
+    # Private methods #
+    #-----------------#
+
+    @classmethod
+    def _event(cls, name, category, pid, tid, ts, dur, args):     # returns 'complete' event
+
+        return { "name": name, "cat": category, "ph": "X", "pid": pid, "tid": tid, "ts": ts, "dur": dur, "args": args }
+
+
+    @classmethod
+    def _metadata(cls, kind, pid, tid, name):     # returns metadata event naming a process or thread
+
+        return { "name": kind, "ph": "M", "pid": pid, "tid": tid, "args": {"name": name} }
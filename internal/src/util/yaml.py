@@ -46,19 +46,68 @@
 ################################################################################
 
 
+from __future__ import absolute_import      # so 'import yaml' finds PyYAML, not this module
+
 # 'import ruamel' comes from Spack distro
 
 
+# The YAML implementation is chosen once, on first use: a C-accelerated (libyaml)
+# loader and dumper from PyYAML or ruamel if either is built with one, otherwise
+# the vendored pure-Python ruamel. See 'implementation()'.
+_impl = None
+
+
+# JSON sidecars: machine-written files such as OUT.yaml may be written with a JSON
+# copy beside them (OUT.json), which loads much faster. Readers asking for the
+# sidecar use it if it is at least as new as the YAML file, and fall back to the
+# YAML file otherwise, so hand edits to the YAML file still take effect.
+
+
+def implementation():     # returns (module, Loader class, Dumper class, name)
+    
+    global _impl
+    
+    if _impl is None:
+        
+        from collections import OrderedDict
+        
+        module, loader, dumper, name = None, None, None, None
+        try:
+            import yaml as pyyaml
+            if getattr(pyyaml, "__with_libyaml__", False):
+                module, loader, dumper, name = pyyaml, pyyaml.CSafeLoader, pyyaml.CSafeDumper, "PyYAML with libyaml"
+        except ImportError:
+            pass
+        if not module:
+            import ruamel.yaml as ryaml
+            if ryaml.__with_libyaml__:
+                module, loader, dumper, name = ryaml, ryaml.CSafeLoader, ryaml.CSafeDumper, "ruamel with libyaml"
+            else:
+                module, loader, dumper, name = ryaml, ryaml.Loader, ryaml.SafeDumper, "ruamel"
+        
+        # adaptor to let the dumper write OrderedDicts as plain mappings, in order
+        class OrderedDumper(dumper):
+            pass
+        def _dict_representer(dumper, data):
+            return dumper.represent_mapping(module.resolver.BaseResolver.DEFAULT_MAPPING_TAG, data.items())
+        OrderedDumper.add_representer(OrderedDict, _dict_representer)
+        
+        _impl = (module, loader, OrderedDumper, name)
+    
+    return _impl
+
+
 def readYamlString(s):
     
-    import ruamel.yaml as yaml
     from common import options, debugmsg
 
+    yaml, loader, _, _ = implementation()
+    
     if "verbose" in options:
         debugmsg("reading yaml string at {}".format(s[:20]+"..."))
         
     try:
-        object, msg = yaml.load(s), None
+        object, msg = yaml.load(s, Loader=loader), None
     except:
         object, msg = None, "yaml string has syntax errors and cannot be used"
     
@@ -68,22 +117,29 @@ def readYamlString(s):
     return object, msg
 
 
-def readYamlFile(path):
+def readYamlFile(path, jsonSidecar=False):
     
-    import ruamel.yaml as yaml
+    import errno
     from common import options, debugmsg
 
+    yaml, loader, _, _ = implementation()
+    
+    if jsonSidecar:
+        object = _readSidecar(path)
+        if object is not None:
+            return object, None
+    
     if "verbose" in options:
         debugmsg("reading yaml file at {}".format(path))
         
     try:
         with open(path, 'r') as f:
             try:
-                object, msg = yaml.load(f), None
+                object, msg = yaml.load(f, Loader=loader), None
             except:
                 object, msg = None, "yaml file has syntax errors and cannot be used"
     except Exception as e:
-        if isinstance(e, OSError) and e.errno == errno.EEXIST:
+        if isinstance(e, (IOError, OSError)) and e.errno == errno.ENOENT:
             object, msg = None, "yaml file to be read is missing"
         else:
             object, msg = None, "yaml file cannot be opened: (error {0}, {1})".format(e.errno, e.strerror)
@@ -94,21 +150,12 @@ def readYamlFile(path):
     return object, msg
 
 
-def writeYamlFile(path, object):
+def writeYamlFile(path, object, jsonSidecar=False):
     
-    from collections import OrderedDict     # to make output text file will have fields in order of insertion
     import sys
-    import ruamel.yaml as yaml
     from common import options, debugmsg, fatalmsg
 
-    def ordered_dump(data, stream=None, Dumper=yaml.Dumper, **kwds):    # adaptor to let PyYAML use OrderedDict
-        class OrderedDumper(Dumper):
-            pass
-        def _dict_representer(dumper, data):
-            return dumper.represent_mapping(yaml.resolver.BaseResolver.DEFAULT_MAPPING_TAG, data.items())
-        OrderedDumper.add_representer(OrderedDict, _dict_representer)
-        return yaml.dump(data, stream, OrderedDumper, **kwds)
-        
+    yaml, _, dumper, _ = implementation()
 
     if "verbose" in options: debugmsg("writing yaml file at {}".format(path))
     msg = None
@@ -117,12 +164,14 @@ def writeYamlFile(path, object):
         if path:
             with open(path, 'w') as f:
                 try:
-                    ordered_dump(object, stream=f, Dumper=yaml.SafeDumper, default_flow_style=False)
+                    yaml.dump(object, f, Dumper=dumper, default_flow_style=False)
                 except Exception as e:
                     fatalmsg("can't write given object as YAML (error {})\nobject: {}".format(e.message, object))
+            if jsonSidecar:
+                _writeSidecar(path, object)
         else:
             try:
-                ordered_dump(object, stream=sys.stdout, Dumper=yaml.SafeDumper, default_flow_style=False)
+                yaml.dump(object, sys.stdout, Dumper=dumper, default_flow_style=False)
             except Exception as e:
                 fatalmsg("can't write given object as YAML (error {})\nobject: {}".format(e.message, object))
             
@@ -133,5 +182,67 @@ def writeYamlFile(path, object):
         debugmsg("...finished writing yaml file with msg {}".format(repr(msg)))
 
 
+def sidecarPath(path):
+    
+    from os.path import splitext
+    return splitext(path)[0] + ".json"
+
+
+def readJsonFile(path):     # returns object; raises IOError, OSError, ValueError
+    
+    # JSON counterpart of readYamlFile for machine-only files,
+    # giving str rather than unicode strings and OrderedDicts for mappings, as yaml does
+    
+    import json
+    from collections import OrderedDict
+    
+    def native(x):
+        if isinstance(x, unicode):
+            return x.encode("utf-8")
+        elif isinstance(x, list):
+            return [ native(y) for y in x ]
+        else:
+            return x
+    
+    with open(path) as f:
+        return json.load(f, object_pairs_hook=lambda pairs: OrderedDict( (native(k), native(v)) for k, v in pairs ))
 
 
+def writeJsonFile(path, object):     # raises TypeError, ValueError, IOError, OSError
+    
+    import json
+    from os import getpid, rename
+    
+    # rename so readers never see a partly written file, even with concurrent writers
+    tmpPath = "{}.{}.tmp".format(path, getpid())
+    with open(tmpPath, "w") as f:
+        json.dump(object, f, separators=(",", ":"))
+    rename(tmpPath, path)
+
+
+#-------------------#
+# Private functions #
+#-------------------#
+
+def _readSidecar(path):     # returns object, or None if no usable sidecar
+    
+    from os.path import getmtime
+    
+    jsonPath = sidecarPath(path)
+    try:
+        if getmtime(jsonPath) < getmtime(path):
+            return None     # stale, eg yaml file was edited
+        return readJsonFile(jsonPath)
+    except (IOError, OSError, ValueError):
+        return None         # missing, or unreadable
+
+
+def _writeSidecar(path, object):
+    
+    from common import debugmsg
+    
+    # no sidecar is not an error b/c readers fall back to yaml file
+    try:
+        writeJsonFile(sidecarPath(path), object)
+    except (TypeError, ValueError, IOError, OSError) as e:
+        debugmsg("no json sidecar written for {}: {}".format(path, e))
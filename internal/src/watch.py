@@ -0,0 +1,174 @@
+################################################################################
+#                                                                              #
+#  watch.py                                                                    #
+#  live progress summary of a study while its runs finish                      #
+#                                                                              #
+#  $HeadURL$                                                                   #
+#  $Id$                                                                        #
+#                                                                              #
+#  --------------------------------------------------------------------------- #
+#  Part of HPCToolkit (hpctoolkit.org)                                         #
+#                                                                              #
+#  Information about sources of support for research and development of        #
+#  HPCToolkit is at 'hpctoolkit.org' and in 'README.Acknowledgments'.          #
+#  --------------------------------------------------------------------------- #
+#                                                                              #
+#  Copyright ((c)) 2002-2017, Rice University                                  #
+#  All rights reserved.                                                        #
+#                                                                              #
+#  Redistribution and use in source and binary forms, with or without          #
+#  modification, are permitted provided that the following conditions are      #
+#  met:                                                                        #
+#                                                                              #
+#  * Redistributions of source code must retain the above copyright            #
+#    notice, this list of conditions and the following disclaimer.             #
+#                                                                              #
+#  * Redistributions in binary form must reproduce the above copyright         #
+#    notice, this list of conditions and the following disclaimer in the       #
+#    documentation and/or other materials provided with the distribution.      #
+#                                                                              #
+#  * Neither the name of Rice University (RICE) nor the names of its           #
+#    contributors may be used to endorse or promote products derived from      #
+#    this software without specific prior written permission.                  #
+#                                                                              #
+#  This software is provided by RICE and contributors "as is" and any          #
+#  express or implied warranties, including, but not limited to, the           #
+#  implied warranties of merchantability and fitness for a particular          #
+#  purpose are disclaimed. In no event shall RICE or contributors be           #
+#  liable for any direct, indirect, incidental, special, exemplary, or         #
+#  consequential damages (including, but not limited to, procurement of        #
+#  substitute goods or services; loss of use, data, or profits; or             #
+#  business interruption) however caused and on any theory of liability,       #
+#  whether in contract, strict liability, or tort (including negligence        #
+#  or otherwise) arising in any way out of the use of this software, even      #
+#  if advised of the possibility of such damage.                               #
+#                                                                              #
+################################################################################
+
+
+class Watch(object):
+
+    # Progress of a study is read from its index, which is refreshed from OUT.yaml files
+    # as they appear. A run dir with no OUT.yaml yet is running; matrix points with no
+    # run dir yet are pending (known only if the study has metadata; see Study.writeMetadata).
+    # The ETA is the remaining points' historical mean durations, less the time already
+    # spent by running ones, divided among the runs currently in flight.
+
+    def __init__(self, study):
+
+        self.study      = study
+        self.index      = study.index()
+        self.expected   = study.metadata().get("expected runs")
+        self.durations  = self._historicalDurations()
+        self.seenFailed = set()
+
+
+    def watch(self, interval):
+
+        # print updates until study is finished or user interrupts
+
+        import time
+
+        try:
+            while True:
+                snapshot = self.update()
+                if snapshot.done: break
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            print
+
+
+    def update(self):     # returns snapshot
+
+        snapshot = self.snapshot()
+        self.printSnapshot(snapshot)
+        return snapshot
+
+
+    def snapshot(self):     # returns Namespace of progress counts and estimates
+
+        import configuration
+        from argparse import Namespace
+        from collections import Counter
+        from os.path import getmtime
+        import time
+        from stats import mean
+
+        snap = Namespace()
+        now  = time.time()
+
+        runningDirs = self.index.refresh()
+        rows        = self.index.select("all")
+
+        snap.passed   = sum(1 for r in rows if r["status"] == "OK")
+        snap.failed   = len(rows) - snap.passed
+        snap.running  = len(runningDirs)
+        snap.expected = len(self.expected) if self.expected else None
+        snap.pending  = max(0, snap.expected - len(rows) - snap.running) if self.expected else None
+        snap.done     = snap.running == 0 and not snap.pending and (snap.expected is None or len(rows) > 0)
+
+        # newly failed runs, so a bad configuration is noticed early
+        snap.newFailures = [ r for r in rows if r["status"] != "OK" and r["run"] not in self.seenFailed ]
+        self.seenFailed.update(r["run"] for r in snap.newFailures)
+
+        # worst overheads so far
+        numWorst   = int(configuration.get("report.watch worst", 5))
+        withOH     = [ r for r in rows if r["status"] == "OK" and r["overheadPercent"] is not None ]
+        snap.worst = sorted(withOH, key=lambda r: -r["overheadPercent"])[:numWorst]
+
+        # ETA from historical durations, falling back on this study's durations so far
+        snap.eta = None
+        if self.expected:
+            studyMean = mean([ r["elapsedTime"] for r in rows if r["elapsedTime"] is not None ])
+            remaining = Counter( tuple(point) for point in self.expected )
+            remaining.subtract( (r["test"], r["buildSpec"], r["hpcrunParams"]) for r in rows )
+            work = []
+            for point, count in remaining.items():
+                duration = self.durations.get(point, self.durations.get(point[0], studyMean))
+                work += [ duration ] * max(0, count)
+            if work and None not in work:
+                # run dir's entries are made as its run starts, so dir mtime approximates start time
+                spent = sum( now - getmtime(dir) for dir in runningDirs )
+                snap.eta = max(0.0, sum(work) - spent) / max(1, snap.running)
+            elif not work:
+                snap.eta = 0.0
+
+        return snap
+
+
+    def printSnapshot(self, snap):
+
+        import time
+        from datetime import timedelta
+        from common import infomsg
+        from report import Report
+
+        label = Report().labelForTest
+        eta   = str(timedelta(seconds=int(snap.eta))) if snap.eta is not None else "unknown"
+        of    = " of {}".format(snap.expected) if snap.expected is not None else ""
+        pending = "  pending {}".format(snap.pending) if snap.pending is not None else ""
+
+        infomsg("[{}]  passed {}  failed {}  running {}{}{}   ETA {}".format(
+                    time.strftime("%H:%M:%S"), snap.passed, snap.failed, snap.running, pending, of, eta))
+        for r in snap.newFailures:
+            infomsg("    FAILED: {}: {}".format(label(r), r["statusMsg"]))
+        if snap.worst:
+            infomsg("    worst overheads:")
+            for r in snap.worst:
+                infomsg("    {:>8.1f}%  {}".format(r["overheadPercent"], label(r)))
+
+
+    #-----------------#
+    # Private methods #
+    #-----------------#
+
+    def _historicalDurations(self):     # returns dict: point or test name => mean elapsed time
+
+        from common import debugmsg
+        from history import History
+
+        try:
+            return History().meanDurations()
+        except Exception as e:
+            debugmsg("no historical durations for ETA: {}".format(e))
+            return dict()